@@ -0,0 +1,80 @@
+"""
+Benchmark of inference engines on the same CPU: OpenVINO vs ONNX Runtime
+
+Runs the Dense8 models of `dense8.model_list` and the landscape DBNet model
+of `dbnet.model_path` on every engine and reports the time per chip and per
+page, and how many chips are decoded to the same codes as on OpenVINO, or
+as on the first ONNX Runtime run when OpenVINO is not installed.
+ONNX models are read from the same path as the IR, with the .onnx suffix.
+Run from the repository root so that config/model_server_config.yaml is found:
+  python -m benchmarks.backends --chips 40 --threads 0 4
+"""
+import argparse
+import logging
+from pathlib import Path
+import numpy as np
+
+from model_serving import models
+from model_serving.utils import load_conf
+from benchmarks.dense8_batch import make_chips, bench
+
+
+def engines(args, num_requests):
+  """Model constructors by engine name, each taking the class names of both engines, a model path and a logger"""
+  runs = {}
+  try:
+    from openvino.inference_engine import IECore
+  except ModuleNotFoundError:
+    print('OpenVINO not installed, only ONNX Runtime is run')
+  else:
+    ie_core = IECore()
+    runs['openvino'] = lambda cls, path, logger: getattr(models, cls[0])(path, ie_core, 'CPU', logger,
+                                                                         num_requests=num_requests)
+  for threads in args.threads:
+    for io_binding in (True, False):
+      name = f'onnxruntime threads={threads}{" binding" if io_binding else ""}'
+      runs[name] = lambda cls, path, logger, t=threads, b=io_binding: getattr(models, cls[1])(
+        path, logger, num_requests=num_requests, intra_op_threads=t, io_binding=b)
+  return runs
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('--chips', type=int, default=40, help='chips per width bucket')
+  parser.add_argument('--threads', type=int, nargs='+', default=[0], help='intra-op threads of ONNX Runtime, 0 for all cores')
+  parser.add_argument('--repeat', type=int, default=5)
+  args = parser.parse_args()
+
+  logging.basicConfig(level=logging.WARNING)
+  logger = logging.getLogger()
+  config = load_conf('config/model_server_config.yaml')
+  rng = np.random.default_rng(0)
+  runs = engines(args, config['dense8']['usb_batch_size'])
+
+  folder = Path(config['model_folder']) / config['dense8'].get('precision', 'FP32')
+  print(f'{"key":>6} {"engine":<32} {"ms/chip":>8} {"same codes":>11}')
+  for key, path in config['dense8']['model_list'].items():
+    path = str(folder / path)
+    chips = make_chips(key, args.chips, rng)
+    num_onlys = [False] * len(chips)
+    ref = None
+    for name, load in runs.items():
+      model = load(('Dense8OpenVINO', 'Dense8ONNXRuntime'), path, logger)
+      t = bench(lambda: model.infer_batch(chips, num_onlys), args.repeat)
+      codes = [res[0] for res in model.infer_batch(chips, num_onlys)]
+      if ref is None: ref = codes
+      same = sum(np.array_equal(a, b) for a, b in zip(ref, codes))
+      print(f'{key:>6} {name:<32} {t / len(chips) * 1000:>8.2f} {same:>5}/{len(chips):<5}')
+
+  dbnet = config['dbnet']
+  path = str(Path(config['model_folder']) / dbnet.get('precision', 'FP32') / dbnet['model_path']['landscape'])
+  page = rng.integers(0, 256, size=(1080, 1920, 3), dtype=np.uint8)
+  print(f'\n{"engine":<32} {"ms/page":>8} {"boxes":>6}')
+  for name, load in runs.items():
+    model = load(('DBNetOpenVINO', 'DBNetONNXRuntime'), path, logger)
+    t = bench(lambda: model.infer_sync(page), args.repeat)
+    print(f'{name:<32} {t * 1000:>8.2f} {len(model.infer_sync(page)[0]):>6}')
+
+
+if __name__ == '__main__':
+  main()
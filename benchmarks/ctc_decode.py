@@ -0,0 +1,157 @@
+"""
+Benchmark of the CTC greedy decoder: per-step Python loop vs vectorized batch
+
+Checks that `greedy_decode_batch` gives the same codes, probs and positions as
+the previous loop decoder (kept below as `greedy_decode_loop`), with and
+without the number-only class subset, then reports decode time per chip.
+Exits with status 1 on any mismatch.
+
+Logits are synthetic unless recorded ones are given. Record them from the
+Dense8 models in config/model_server_config.yaml (OpenVINO required):
+  python -m benchmarks.ctc_decode --record logits.npz --images chip0.png chip1.png
+then compare on them:
+  python -m benchmarks.ctc_decode --logits logits.npz
+"""
+import argparse
+import sys
+import time
+import numpy as np
+
+from model_serving.models.dense8_base import NUM_CLASSES
+from model_serving.models.utils.general import greedy_decode_batch
+
+
+def greedy_decode_loop(x, length):
+  """The decoder before vectorization"""
+  lb_void = x.shape[1] - 1
+  encodes = x.argmax(axis=1)
+  probs = [x[r][i] for r, i in enumerate(encodes)]
+  decodes = []
+  dec_prob = []
+  positions = []
+  prev = -1
+  for i, code in enumerate(encodes[:length]):
+    if code != lb_void:
+      if prev == lb_void or code != prev:
+        decodes.append(code)
+        dec_prob.append(probs[i])
+        positions.append(i)
+      else:
+        if probs[i] > dec_prob[-1]:
+          dec_prob[-1] = probs[i]
+    prev = code
+  return np.array(decodes), np.array(dec_prob), np.array(positions)
+
+
+def num_only_loop(x, length):
+  """Number-only decoding as done before, on a masked copy"""
+  x_num = np.zeros_like(x)
+  indices = NUM_CLASSES + [x.shape[-1] - 1]
+  x_num[:, indices] = x[:, indices]
+  return greedy_decode_loop(x_num, length)
+
+
+def synthetic(n, steps, n_classes, rng):
+  """Peaky CTC-like softmax outputs with repeated labels and voids"""
+  logits = rng.normal(0, 1, size=(n, steps, n_classes)).astype(np.float32)
+  labels = rng.integers(0, n_classes, size=(n, steps))
+  labels[rng.random((n, steps)) < 0.5] = n_classes - 1
+  # repeat labels so that runs longer than one step occur
+  labels[:, 1::2] = np.where(rng.random((n, steps // 2)) < 0.5, labels[:, 0:-1:2], labels[:, 1::2])
+  np.put_along_axis(logits, labels[..., np.newaxis], 12, axis=2)
+  probs = np.exp(logits - logits.max(axis=2, keepdims=True))
+  probs /= probs.sum(axis=2, keepdims=True)
+  lengths = rng.integers(steps // 4, steps + 1, size=n)
+  return probs, lengths
+
+
+def record(path, images):
+  import cv2
+  import logging
+  from openvino.inference_engine import IECore
+  from model_serving.server import ModelServer
+  from model_serving.utils import load_conf, get_dense_key
+
+  logging.basicConfig(level=logging.WARNING)
+  server = ModelServer(load_conf('config/model_server_config.yaml'), IECore())
+  arrays = {}
+  for idx, image in enumerate(images):
+    chip = cv2.imread(image)[..., ::-1].copy()
+    model = server.recog[get_dense_key(chip)]
+    ctx = model.infer_async(chip)
+    arrays[f'probs{idx}'] = model.backend.wait(ctx.req).copy()
+    arrays[f'length{idx}'] = ctx.length
+    model.req_ids.release(ctx.req_id)
+  np.savez(path, **arrays)
+  print(f'Recorded logits of {len(images)} chips to {path}')
+
+
+def load(path):
+  """Recorded logits, one [T, C] array and one length per chip"""
+  data = np.load(path)
+  n = len([k for k in data.files if k.startswith('probs')])
+  probs = [data[f'probs{idx}'].reshape(data[f'probs{idx}'].shape[1], -1) for idx in range(n)]
+  lengths = [int(data[f'length{idx}']) for idx in range(n)]
+  return probs, lengths
+
+
+def same(a, b):
+  return all(np.array_equal(x, y) for x, y in zip(a, b))
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('--logits', help='recorded logits (.npz)')
+  parser.add_argument('--record', help='record logits of --images to this .npz file and exit')
+  parser.add_argument('--images', nargs='*', default=[])
+  parser.add_argument('--chips', type=int, default=64)
+  parser.add_argument('--steps', type=int, default=256)
+  parser.add_argument('--classes', type=int, default=7550)
+  parser.add_argument('--repeat', type=int, default=5)
+  args = parser.parse_args()
+
+  if args.record:
+    record(args.record, args.images)
+    return
+  if args.logits:
+    chips, lengths = load(args.logits)
+  else:
+    probs, lengths = synthetic(args.chips, args.steps, args.classes, np.random.default_rng(0))
+    chips = list(probs)
+
+  mismatches = 0
+  num_classes = NUM_CLASSES + [chips[0].shape[-1] - 1]
+  for idx, (x, length) in enumerate(zip(chips, lengths)):
+    if not same(greedy_decode_loop(x, length), greedy_decode_batch(x[np.newaxis], [length])[0]):
+      mismatches += 1
+      print(f'Mismatch on chip {idx}')
+    if not same(num_only_loop(x, length), greedy_decode_batch(x[np.newaxis], [length], classes=num_classes)[0]):
+      mismatches += 1
+      print(f'Number-only mismatch on chip {idx}')
+  print(f'{len(chips)} chips compared, {mismatches} mismatches')
+
+  def timed(fn):
+    fn()
+    t0 = time.perf_counter()
+    for _ in range(args.repeat):
+      fn()
+    return (time.perf_counter() - t0) / args.repeat / len(chips) * 1000
+
+  t_loop = timed(lambda: [greedy_decode_loop(x, n) for x, n in zip(chips, lengths)])
+  t_single = timed(lambda: [greedy_decode_batch(x[np.newaxis], [n]) for x, n in zip(chips, lengths)])
+  t_num_loop = timed(lambda: [num_only_loop(x, n) for x, n in zip(chips, lengths)])
+  t_num = timed(lambda: [greedy_decode_batch(x[np.newaxis], [n], classes=num_classes) for x, n in zip(chips, lengths)])
+  print(f'{"decoder":>24} {"ms/chip":>8}')
+  print(f'{"loop":>24} {t_loop:>8.3f}')
+  print(f'{"vectorized, 1 chip":>24} {t_single:>8.3f}')
+  if len({x.shape for x in chips}) == 1:
+    batch = np.stack(chips)
+    t_batch = timed(lambda: greedy_decode_batch(batch, lengths))
+    print(f'{f"vectorized, {len(chips)} chips":>24} {t_batch:>8.3f}')
+  print(f'{"loop, numbers":>24} {t_num_loop:>8.3f}')
+  print(f'{"vectorized, numbers":>24} {t_num:>8.3f}')
+  sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+  main()
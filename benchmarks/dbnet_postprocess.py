@@ -0,0 +1,245 @@
+"""
+Regression check and benchmark of DBNet post-processing
+
+Runs `DBNet.parse_result` and the previous per-contour post-processor (kept
+below as `parse_reference`) on the same detection maps, checks that both find
+the same boxes within `--tol` pixels and the same angle within `--angle-tol`
+degrees, then reports the time of each. Boxes are rounded to integers and
+the skew angle is the mean over wide boxes, so a 1px difference on a short
+box moves the angle; boxes are compared after undoing each page rotation. Exits with status 1 on any mismatch.
+
+Maps are synthetic text lines unless recorded ones are given. Record them
+with the detection models in config/model_server_config.yaml (OpenVINO required):
+  python -m benchmarks.dbnet_postprocess --record maps.npz --images card0.jpg card1.jpg
+then check on them:
+  python -m benchmarks.dbnet_postprocess --maps maps.npz
+"""
+import argparse
+import logging
+import sys
+import time
+import cv2
+import numpy as np
+import pyclipper
+from shapely.geometry import Polygon
+
+from model_serving.models.context import InferContext
+from model_serving.models.dbnet_base import DBNet
+from model_serving.models.utils.geometry import rotate_lines
+
+
+def _min_box(contour):
+  bbox = cv2.minAreaRect(contour)
+  pts = sorted(list(cv2.boxPoints(bbox)), key=lambda x: x[0])
+  idx1, idx4 = (0, 1) if pts[1][1] > pts[0][1] else (1, 0)
+  idx2, idx3 = (2, 3) if pts[3][1] > pts[2][1] else (3, 2)
+  return np.array(pts)[[idx1, idx2, idx3, idx4], ...], min(bbox[1])
+
+
+def _score(pred, contour):
+  h, w = pred.shape
+  c = contour.copy()
+  xmin = np.clip(np.floor(c[:, 0].min()).astype(int), 0, w - 1)
+  xmax = np.clip(np.ceil(c[:, 0].max()).astype(int), 0, w - 1)
+  ymin = np.clip(np.floor(c[:, 1].min()).astype(int), 0, h - 1)
+  ymax = np.clip(np.ceil(c[:, 1].max()).astype(int), 0, h - 1)
+  mask = np.zeros((ymax - ymin + 1, xmax - xmin + 1), dtype=np.uint8)
+  c[:, 0] -= xmin
+  c[:, 1] -= ymin
+  cv2.fillPoly(mask, c.reshape(1, -1, 2).astype(np.int32), 1)
+  return cv2.mean(pred[ymin: ymax + 1, xmin: xmax + 1], mask)[0]
+
+
+def _unclip(box, unclip_ratio):
+  poly = Polygon(box)
+  distance = poly.area * unclip_ratio / poly.length
+  offset = pyclipper.PyclipperOffset()
+  offset.AddPath(box, pyclipper.JT_ROUND, pyclipper.ET_CLOSEDPOLYGON)
+  return np.array(offset.Execute(distance))
+
+
+def _angle(lines):
+  angles = []
+  for line in lines.reshape(-1, 8):
+    hori_len = np.linalg.norm(line[:2] - line[2:4])
+    vert_len = np.linalg.norm(line[2:4] - line[4:6])
+    if hori_len > vert_len * 2:
+      dx, dy = (line[2:4] + line[4:6]) / 2 - (line[:2] + line[6:8]) / 2
+      angles.append(np.arctan(dy / dx) / np.pi * 180)
+  return np.mean(angles)
+
+
+def _rotate_lines(lines, angle, w, h):
+  coords = lines[:, :8].reshape(-1, 2)
+  coords = np.concatenate([coords, np.ones((coords.shape[0], 1))], axis=1)
+  m = cv2.getRotationMatrix2D((w//2, h//2), angle, 1)
+  return np.dot(m, coords.transpose()).transpose()
+
+
+def parse_reference(model, result, scale):
+  """Post-processing before single-pass scoring"""
+  result = result[0, ..., 0]
+  res_exp = np.exp(result)
+  result = res_exp / (res_exp + 1)
+  mask = result > model.threshold
+  h, w = mask.shape
+  contours, _ = cv2.findContours((mask * 255).astype(np.uint8), cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+  boxes = []
+  for contour in contours[:model.max_candidates]:
+    c = contour.squeeze(1)
+    pts, sside = _min_box(c)
+    if sside < model.min_size:
+      continue
+    if model.box_th > _score(result, c):
+      continue
+    c = _unclip(pts, unclip_ratio=model.unclip_ratio).reshape(-1, 1, 2)
+    pts, sside = _min_box(c)
+    if sside < model.min_size + 2:
+      continue
+    pts[:, 0] = np.clip(np.round(pts[:, 0]), 0, w)
+    pts[:, 1] = np.clip(np.round(pts[:, 1]), 0, h)
+    boxes.append(pts.astype(np.float32))
+  boxes = np.array(boxes)
+  boxes /= scale
+  angle = _angle(boxes)
+  if np.abs(angle) > 0.2: boxes = _rotate_lines(boxes, w=w / scale, h=h / scale, angle=angle)
+  return boxes, angle
+
+
+def synthetic(n, h, w, words, rng, band=120):
+  """Logit maps of slightly rotated, separate words laid out in rows on a noisy background
+
+  Below the rows, within `band` pixels, a frame encloses a word and another
+  one nothing: a region nested in the hole of another, and rings whose own
+  pixels score high although their outline is mostly background.
+  """
+  maps = []
+  for _ in range(n):
+    prob = np.clip(rng.normal(0.05, 0.05, size=(h, w)), 0.001, 0.999).astype(np.float32)
+    skew = rng.uniform(-2, 2)
+    pitch = rng.uniform(20, 48)
+    n_words = int(rng.integers(*words))
+    rows = np.arange(pitch, h - band - pitch, pitch)
+    per_row = max(n_words // len(rows), 1)
+    for cy in rows:
+      edges = np.sort(rng.uniform(pitch, w - pitch, size=per_row * 2))
+      for x0, x1 in edges.reshape(-1, 2):
+        if x1 - x0 < pitch: continue
+        pts = cv2.boxPoints((((x0 + x1) / 2, cy), (x1 - x0, pitch * 0.5), skew)).astype(np.int32)
+        cv2.fillPoly(prob, [pts], float(rng.uniform(0.55, 0.95)))
+    y0, y1 = h - band + 10, h - 20
+    for x0, nested in ((0.1, True), (0.55, False)):
+      x0, x1 = int(w * x0), int(w * (x0 + 0.35))
+      cv2.rectangle(prob, (x0, y0), (x1, y1), float(rng.uniform(0.7, 0.95)), thickness=4)
+      if nested:
+        yc = (y0 + y1) // 2
+        cv2.rectangle(prob, (x0 + 40, yc - 8), (x0 + 40 + int(w * 0.15), yc + 8), float(rng.uniform(0.55, 0.95)), -1)
+    maps.append(np.log(prob / (1 - prob))[np.newaxis, ..., np.newaxis])
+  return maps
+
+
+def record(path, images):
+  from openvino.inference_engine import IECore
+  from model_serving.server import ModelServer
+  from model_serving.utils import load_conf, get_layout
+
+  server = ModelServer(load_conf('config/model_server_config.yaml'), IECore())
+  arrays = {}
+  for idx, image in enumerate(images):
+    img = cv2.imread(image)[..., ::-1].copy()
+    model = server.det[get_layout(img)]
+    req_id = model.req_ids.acquire()
+    feed, ctx = model.preprocess(img, out=model.backend.input_buffer(req_id))
+    arrays[f'map{idx}'] = model.backend.wait(model.backend.start(req_id, feed)).copy()
+    arrays[f'scale{idx}'] = ctx.scale
+    model.req_ids.release(req_id)
+  np.savez(path, **arrays)
+  print(f'Recorded detection maps of {len(images)} images to {path}')
+
+
+def load(path):
+  data = np.load(path)
+  n = len([k for k in data.files if k.startswith('map')])
+  return [data[f'map{idx}'] for idx in range(n)], [float(data[f'scale{idx}']) for idx in range(n)]
+
+
+def compare(ref, new, size, tol, angle_tol):
+  """Matches boxes by nearest center, returns a reason if they differ and the largest corner distance
+
+  Pages are rotated back by their own angle first, so that the angle
+  difference is only checked once and does not move far corners.
+  """
+  (ref_boxes, ref_angle), (new_boxes, new_angle) = ref, new
+  ref_boxes = np.asarray(ref_boxes).reshape(-1, 4, 2)
+  new_boxes = np.asarray(new_boxes).reshape(-1, 4, 2)
+  if ref_boxes.shape != new_boxes.shape:
+    return f'{len(ref_boxes)} boxes expected, {len(new_boxes)} found', np.inf
+  if not (np.isnan(ref_angle) and np.isnan(new_angle)) and abs(ref_angle - new_angle) > angle_tol:
+    return f'angle {ref_angle:.3f} expected, {new_angle:.3f} found', np.inf
+  w, h = size
+  if np.abs(ref_angle) > 0.2: ref_boxes = rotate_lines(ref_boxes, -ref_angle, w, h)
+  if np.abs(new_angle) > 0.2: new_boxes = rotate_lines(new_boxes, -new_angle, w, h)
+  if len(ref_boxes) == 0:
+    return None, 0.
+  centers = np.linalg.norm(ref_boxes.mean(axis=1)[:, np.newaxis] - new_boxes.mean(axis=1)[np.newaxis], axis=2)
+  match = centers.argmin(axis=1)
+  if len(set(match)) != len(match):
+    return 'boxes cannot be matched one to one', np.inf
+  diff = np.linalg.norm(ref_boxes - new_boxes[match], axis=2).max()
+  if diff > tol:
+    return f'box corners differ by {diff:.1f}px', diff
+  return None, diff
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('--maps', help='recorded detection maps (.npz)')
+  parser.add_argument('--record', help='record maps of --images to this .npz file and exit')
+  parser.add_argument('--images', nargs='*', default=[])
+  parser.add_argument('--n', type=int, default=20, help='synthetic maps')
+  parser.add_argument('--size', type=int, nargs=2, default=[1024, 1344], help='synthetic map height and width')
+  parser.add_argument('--words', type=int, nargs=2, default=[20, 200], help='range of synthetic words per map')
+  parser.add_argument('--tol', type=float, default=3., help='box corner tolerance in pixels')
+  parser.add_argument('--angle-tol', type=float, default=0.5, help='angle tolerance in degrees')
+  parser.add_argument('--repeat', type=int, default=3)
+  args = parser.parse_args()
+
+  if args.record:
+    record(args.record, args.images)
+    return
+  if args.maps:
+    maps, scales = load(args.maps)
+  else:
+    maps = synthetic(args.n, *args.size, args.words, np.random.default_rng(0))
+    scales = [1.] * len(maps)
+
+  model = DBNet(logging.getLogger())
+  mismatches = 0
+  max_diff = 0.
+  for idx, (result, scale) in enumerate(zip(maps, scales)):
+    size = (result.shape[2] / scale, result.shape[1] / scale)
+    reason, diff = compare(parse_reference(model, result, scale), model.parse_result(result, InferContext(scale=scale)),
+                           size, args.tol, args.angle_tol)
+    if reason is not None:
+      mismatches += 1
+      print(f'Mismatch on map {idx}: {reason}')
+    else:
+      max_diff = max(max_diff, diff)
+  print(f'{len(maps)} maps compared, {mismatches} mismatches, '
+        f'largest corner distance among matches {max_diff:.1f}px')
+
+  def timed(fn):
+    t0 = time.perf_counter()
+    for _ in range(args.repeat):
+      for result, scale in zip(maps, scales):
+        fn(result, scale)
+    return (time.perf_counter() - t0) / args.repeat / len(maps) * 1000
+
+  t_ref = timed(lambda result, scale: parse_reference(model, result, scale))
+  t_new = timed(lambda result, scale: model.parse_result(result, InferContext(scale=scale)))
+  print(f'per-contour masks {t_ref:.2f}ms/map, single pass {t_new:.2f}ms/map, speedup {t_ref / t_new:.2f}')
+  sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+  main()
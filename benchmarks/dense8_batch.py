@@ -0,0 +1,70 @@
+"""
+Benchmark of Dense8 recognition: in-flight infer requests vs batched tensors
+
+Run from the repository root so that config/model_server_config.yaml is found:
+  python -m benchmarks.dense8_batch --chips 40 --batch-sizes 4 8 16
+"""
+import argparse
+import logging
+import time
+from pathlib import Path
+import numpy as np
+
+from model_serving import models
+from model_serving.utils import load_conf, get_dense_key
+
+
+def make_chips(key, n, rng):
+  """Random chips whose width falls into the bucket of `key`"""
+  lower = {192: 32, 1024: 192, 1408: 1024}[key]
+  chips = []
+  while len(chips) < n:
+    h = int(rng.integers(32, 96))
+    w = int(rng.integers(lower, key) * h / 64) + 1
+    chip = rng.integers(0, 256, size=(h, w, 3), dtype=np.uint8)
+    if get_dense_key(chip) == key:
+      chips.append(chip)
+  return chips
+
+
+def bench(fn, repeat):
+  fn()
+  t0 = time.perf_counter()
+  for _ in range(repeat):
+    fn()
+  return (time.perf_counter() - t0) / repeat
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('--chips', type=int, default=40, help='chips per card')
+  parser.add_argument('--batch-sizes', type=int, nargs='+', default=[4, 8, 16])
+  parser.add_argument('--repeat', type=int, default=5)
+  args = parser.parse_args()
+  # imported here so that `make_chips` and `bench` can be used without OpenVINO
+  from openvino.inference_engine import IECore
+
+  logging.basicConfig(level=logging.WARNING)
+  logger = logging.getLogger()
+  config = load_conf('config/model_server_config.yaml')
+  precision = config['dense8'].get('precision', 'FP32')
+  folder = Path(config['model_folder']) / precision
+  ie_core = IECore()
+  rng = np.random.default_rng(0)
+
+  print(f'{"key":>6} {"batch":>6} {"requests ms/chip":>18} {"tensor ms/chip":>16} {"speedup":>8}')
+  for key, path in config['dense8']['model_list'].items():
+    path = str(folder / path)
+    chips = make_chips(key, args.chips, rng)
+    num_onlys = [False] * len(chips)
+    single = models.Dense8OpenVINO(path, ie_core, 'CPU', logger, num_requests=config['dense8']['usb_batch_size'])
+    t_single = bench(lambda: single.infer_batch(chips, num_onlys), args.repeat)
+    for batch_size in args.batch_sizes:
+      batched = models.Dense8OpenVINO(path, ie_core, 'CPU', logger, num_requests=1, tensor_batch_size=batch_size)
+      t_batch = bench(lambda: batched.infer_batch(chips, num_onlys), args.repeat)
+      print(f'{key:>6} {batch_size:>6} {t_single / len(chips) * 1000:>18.2f} '
+            f'{t_batch / len(chips) * 1000:>16.2f} {t_single / t_batch:>8.2f}')
+
+
+if __name__ == '__main__':
+  main()
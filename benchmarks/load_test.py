@@ -0,0 +1,265 @@
+"""
+Load generator and latency benchmark of a running model server
+
+Drives `DetInferSync`, `DenseInferSync`, `DenseBatchInferSync` and `Check`
+from `--concurrency` client threads for `--duration` seconds, each thread
+sending its next request as soon as the previous one returns. Requests are
+drawn from `--mix`, pages from `--page-sizes` and the chips of a batch from
+`--chips` with widths from `--chip-widths`. Every image is stamped with a
+request counter so that the result cache of the server never answers.
+Throughput, p50/p95/p99 latency and error rates of each method are printed
+and written as JSON to `--report`:
+  python -m benchmarks.load_test --concurrency 8 --duration 30 --mix det=1 dense=4 batch=1 check=0.1 \\
+    --report baseline.json
+Later runs are compared to a stored report, the exit status is 1 when the
+p95 latency, the throughput or the error rate of a method is worse by more
+than `--tolerance`:
+  python -m benchmarks.load_test --concurrency 8 --duration 30 --baseline baseline.json --report run.json
+Run from the repository root so that config/model_server_config.yaml is found.
+Without OpenVINO or devices, serve stub models (`grpc.det_model: DBNetStub`,
+`grpc.recog_model: Dense8Stub`, `check_model.stub: true`) whose latency is
+set in the `stub` section of each model.
+"""
+import argparse
+import collections
+import json
+import platform
+import sys
+import threading
+import time
+import grpc
+import numpy as np
+
+from model_serving import model_serving_pb2
+from model_serving import model_serving_pb2_grpc
+from model_serving.utils import load_conf, get_dense_key, get_layout
+
+
+METHODS = {
+  'det': 'DetInferSync',
+  'dense': 'DenseInferSync',
+  'batch': 'DenseBatchInferSync',
+  'check': 'Check',
+}
+
+
+def parse_range(text):
+  lower, _, upper = text.partition(':')
+  return int(lower), int(upper or lower)
+
+
+def parse_mix(items):
+  """Weights by method from name=weight pairs"""
+  mix = {}
+  for item in items:
+    name, _, weight = item.partition('=')
+    if name not in METHODS:
+      raise ValueError(f'Unknown method {name}, expected one of {", ".join(METHODS)}')
+    mix[name] = float(weight or 1)
+  return mix
+
+
+class Images:
+  """Random pages and chips, stamped with a counter to make every request unique"""
+  def __init__(self, page_sizes, chip_widths, chip_height, seed):
+    rng = np.random.default_rng(seed)
+    self.pages = [rng.integers(0, 256, size=(h, w, 3), dtype=np.uint8) for h, w in page_sizes]
+    lower, upper = chip_widths
+    self.chips = [rng.integers(0, 256, size=(chip_height, w, 3), dtype=np.uint8)
+                  for w in np.linspace(lower, upper, 8).astype(int)]
+    self.counter = 0
+    self.lock = threading.Lock()
+
+  def stamp(self, img):
+    with self.lock:
+      self.counter += 1
+      count = self.counter
+    data = bytearray(img.tobytes())
+    data[:8] = count.to_bytes(8, 'little')
+    h, w, c = img.shape
+    return model_serving_pb2.Image(data=bytes(data), h=h, w=w, c=c, encoding='raw')
+
+
+class LoadTest:
+  """Closed-loop load of client threads sharing one channel
+
+  Args:
+    stub: A `ModelServerStub`
+    mix: Weights of the methods in `METHODS`
+    images: The `Images` to send
+    chips: Range of the number of chips of a batch
+    timeouts: Timeout of each method in seconds
+  """
+  def __init__(self, stub, mix, images, chips, timeouts):
+    self.stub = stub
+    self.names = list(mix)
+    weights = np.array([mix[n] for n in self.names], dtype=np.float64)
+    self.p = weights / weights.sum()
+    self.images = images
+    self.chips = chips
+    self.timeouts = timeouts
+    # (method, start, seconds, status) of every request
+    self.samples = []
+    self.lock = threading.Lock()
+
+  def _det(self, rng):
+    page = self.images.pages[rng.integers(len(self.images.pages))]
+    req = model_serving_pb2.DetRequest(sess_id='load', img=self.images.stamp(page), layout=get_layout(page))
+    return lambda: self.stub.DetInferSync(req, timeout=self.timeouts['det'])
+
+  def _dense_req(self, chip):
+    return model_serving_pb2.DenseRequest(sess_id='load', img=self.images.stamp(chip), key=get_dense_key(chip),
+                                          num_only=False, ragged=True)
+
+  def _dense(self, rng):
+    req = self._dense_req(self.images.chips[rng.integers(len(self.images.chips))])
+    return lambda: self.stub.DenseInferSync(req, timeout=self.timeouts['dense'])
+
+  def _batch(self, rng):
+    n = rng.integers(self.chips[0], self.chips[1] + 1)
+    reqs = [self._dense_req(self.images.chips[i]) for i in rng.integers(len(self.images.chips), size=n)]
+    return lambda: self.stub.DenseBatchInferSync(iter(reqs), timeout=self.timeouts['batch'])
+
+  def _check(self, rng):
+    req = model_serving_pb2.CheckRequest(sess_id='load')
+    return lambda: self.stub.Check(req, timeout=self.timeouts['check'])
+
+  def worker(self, seed, t_warm, t_end):
+    rng = np.random.default_rng(seed)
+    samples = []
+    while True:
+      name = self.names[rng.choice(len(self.names), p=self.p)]
+      call = getattr(self, f'_{name}')(rng)
+      t0 = time.perf_counter()
+      if t0 >= t_end: break
+      try:
+        call()
+        status = 'OK'
+      except grpc.RpcError as e:
+        status = e.code().name
+      t1 = time.perf_counter()
+      if t0 >= t_warm: samples.append((name, t0, t1 - t0, status))
+    with self.lock:
+      self.samples += samples
+
+  def run(self, concurrency, duration, warm_up, seed):
+    t_warm = time.perf_counter() + warm_up
+    t_end = t_warm + duration
+    threads = [threading.Thread(target=self.worker, args=(seed + idx, t_warm, t_end), daemon=True)
+               for idx in range(concurrency)]
+    for thread in threads: thread.start()
+    for thread in threads: thread.join()
+    return self.samples
+
+
+def summarize(samples, duration):
+  """Throughput, error rates and latency percentiles in ms of each method and of all of them"""
+  by_method = collections.defaultdict(list)
+  for sample in samples:
+    by_method[sample[0]].append(sample)
+  by_method['all'] = samples
+  summary = {}
+  for name, group in by_method.items():
+    if not group: continue
+    errors = collections.Counter(status for *_, status in group if status != 'OK')
+    latency = np.array([seconds for _, _, seconds, status in group if status == 'OK']) * 1000
+    stats = {
+      'requests': len(group),
+      'errors': sum(errors.values()),
+      'error_rate': sum(errors.values()) / len(group),
+      'errors_by_code': dict(errors),
+      'throughput': (len(group) - sum(errors.values())) / duration,
+    }
+    if latency.size:
+      p50, p95, p99 = np.percentile(latency, [50, 95, 99])
+      stats['latency_ms'] = {'mean': latency.mean(), 'p50': p50, 'p95': p95, 'p99': p99, 'max': latency.max()}
+    summary[METHODS.get(name, name)] = stats
+  return summary
+
+
+def compare(report, baseline, tolerance):
+  """Prints the change of each method against `baseline`, returns the regressions"""
+  regressions = []
+  # as read back from JSON, tuples become lists
+  options = json.loads(json.dumps(report['options']))
+  differ = [k for k, v in options.items() if k != 'tolerance' and baseline['options'].get(k) != v]
+  if differ: print(f'\nWarning: the baseline ran with other {", ".join(differ)}')
+  print(f'\n{"method":<20} {"p50":>8} {"p95":>8} {"p99":>8} {"req/s":>8} {"errors":>8}   vs baseline')
+  for method, stats in report['methods'].items():
+    ref = baseline['methods'].get(method)
+    if ref is None or 'latency_ms' not in stats or 'latency_ms' not in ref: continue
+    change = {p: stats['latency_ms'][p] / ref['latency_ms'][p] - 1 for p in ('p50', 'p95', 'p99')}
+    change['throughput'] = stats['throughput'] / ref['throughput'] - 1 if ref['throughput'] else 0.
+    change['errors'] = stats['error_rate'] - ref['error_rate']
+    print(f'{method:<20} {change["p50"]:>+8.1%} {change["p95"]:>+8.1%} {change["p99"]:>+8.1%} '
+          f'{change["throughput"]:>+8.1%} {change["errors"]:>+8.1%}')
+    if change['p95'] > tolerance: regressions.append(f'{method} p95 latency {change["p95"]:+.1%}')
+    if change['throughput'] < -tolerance: regressions.append(f'{method} throughput {change["throughput"]:+.1%}')
+    if change['errors'] > tolerance: regressions.append(f'{method} error rate {change["errors"]:+.1%}')
+  return regressions
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('--target', help='ip:port of the server, the local server in the config by default')
+  parser.add_argument('--concurrency', type=int, default=4, help='client threads')
+  parser.add_argument('--duration', type=float, default=30, help='seconds measured')
+  parser.add_argument('--warm-up', type=float, default=3, help='seconds of load before measuring')
+  parser.add_argument('--mix', nargs='+', default=['det=1', 'dense=4', 'batch=1', 'check=0.1'],
+                      help=f'weights of the requests, name=weight with names {", ".join(METHODS)}')
+  parser.add_argument('--page-sizes', nargs='+', default=['1080x1920', '1920x1080'], help='HxW of detection pages')
+  parser.add_argument('--chips', type=parse_range, default=(5, 40), help='MIN:MAX chips of a batch, uniform')
+  parser.add_argument('--chip-widths', type=parse_range, default=(40, 900), help='MIN:MAX width of chips')
+  parser.add_argument('--chip-height', type=int, default=48)
+  parser.add_argument('--seed', type=int, default=0)
+  parser.add_argument('--report', help='JSON file to write the report to')
+  parser.add_argument('--baseline', help='JSON report of an earlier run to compare with')
+  parser.add_argument('--tolerance', type=float, default=0.1, help='relative change counted as a regression')
+  args = parser.parse_args()
+
+  config = load_conf('config/model_server_config.yaml')
+  target = args.target or f'{config["grpc"]["ip"]}:{config["grpc"]["port"]}'
+  timeout_config = config['grpc']['timeout']
+  timeouts = {'det': timeout_config['det'], 'dense': timeout_config['dense'],
+              'batch': timeout_config['dense_batch'], 'check': timeout_config['check']}
+  page_sizes = [tuple(int(v) for v in size.split('x')) for size in args.page_sizes]
+  images = Images(page_sizes, args.chip_widths, args.chip_height, args.seed)
+  options = None
+  max_msg_len = config['grpc'].get('max_msg_len', None)
+  if max_msg_len is not None:
+    options = [
+      ('grpc.max_send_message_length', int(max_msg_len * 1024 * 1024)),
+      ('grpc.max_receive_message_length', int(max_msg_len * 1024 * 1024)),
+    ]
+  with grpc.insecure_channel(target, options=options) as channel:
+    grpc.channel_ready_future(channel).result(timeout=10)
+    test = LoadTest(model_serving_pb2_grpc.ModelServerStub(channel), parse_mix(args.mix), images, args.chips, timeouts)
+    samples = test.run(args.concurrency, args.duration, args.warm_up, args.seed)
+
+  report = {
+    'target': target,
+    'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    'host': platform.node(),
+    'options': {k: v for k, v in vars(args).items() if k not in ('report', 'baseline')},
+    'methods': summarize(samples, args.duration),
+  }
+  print(f'{"method":<20} {"requests":>8} {"req/s":>8} {"errors":>7} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8}')
+  for method, stats in report['methods'].items():
+    latency = stats.get('latency_ms', {})
+    print(f'{method:<20} {stats["requests"]:>8} {stats["throughput"]:>8.1f} {stats["error_rate"]:>7.1%} '
+          + ' '.join(f'{latency.get(p, float("nan")):>8.1f}' for p in ('p50', 'p95', 'p99')))
+  for method, stats in report['methods'].items():
+    if stats['errors_by_code']: print(f'{method} errors: {stats["errors_by_code"]}')
+  if args.report:
+    with open(args.report, 'w') as f:
+      json.dump(report, f, indent=2)
+  if args.baseline:
+    with open(args.baseline) as f:
+      regressions = compare(report, json.load(f), args.tolerance)
+    if regressions:
+      print('Regressions: ' + ', '.join(regressions))
+      sys.exit(1)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,95 @@
+"""
+Overhead of the metrics subsystem per request
+
+Times unary RPCs against an in-process gRPC server without interceptors,
+with an interceptor that does nothing and with `MetricsInterceptor`, then
+the work of the interceptor alone on an in-process handler and the time
+to render a scrape. The
+RPC is `Health`, which only returns a cached verdict, so that the
+difference is not hidden behind inference. Runs are interleaved and the
+fastest of each is reported, loopback timings are noisy.
+  python -m benchmarks.metrics_overhead --n 5000
+"""
+import argparse
+import collections
+import logging
+import time
+from concurrent import futures
+import grpc
+
+from model_serving import model_serving_pb2
+from model_serving import model_serving_pb2_grpc
+from model_serving.health import HealthProber, HealthServicer
+from model_serving.metrics import Registry, RpcMetrics, MetricsInterceptor
+
+
+CallDetails = collections.namedtuple('CallDetails', ['method', 'invocation_metadata'])
+
+
+class NoopInterceptor(grpc.ServerInterceptor):
+  def intercept_service(self, continuation, handler_call_details):
+    return continuation(handler_call_details)
+
+
+def rpc_time(n, port, interceptors):
+  """Mean seconds per `Health` call"""
+  health = HealthProber(lambda: 'OK', interval=10, logger=logging.getLogger())
+  health.update('OK')
+  server = grpc.server(futures.ThreadPoolExecutor(max_workers=1), interceptors=interceptors)
+  model_serving_pb2_grpc.add_ModelServerServicer_to_server(HealthServicer(health), server)
+  server.add_insecure_port(f'127.0.0.1:{port}')
+  server.start()
+  try:
+    with grpc.insecure_channel(f'127.0.0.1:{port}') as channel:
+      stub = model_serving_pb2_grpc.ModelServerStub(channel)
+      req = model_serving_pb2.HealthRequest(sess_id='bench')
+      for _ in range(100):
+        stub.Health(req)
+      t0 = time.perf_counter()
+      for _ in range(n):
+        stub.Health(req)
+      return (time.perf_counter() - t0) / n
+  finally:
+    server.stop(0)
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('--n', type=int, default=5000, help='requests per run')
+  parser.add_argument('--repeat', type=int, default=5, help='runs, the fastest one is reported')
+  parser.add_argument('--port', type=int, default=50990)
+  args = parser.parse_args()
+
+  registry = Registry()
+  metrics = RpcMetrics('bench', registry)
+  interceptor = MetricsInterceptor(metrics)
+  res = model_serving_pb2.HealthResponse(sess_id='bench', status='OK', age=1.)
+  handler = grpc.unary_unary_rpc_method_handler(lambda request, context: res)
+  details = CallDetails('/model_serving.ModelServer/Health', ())
+  req = model_serving_pb2.HealthRequest(sess_id='bench')
+  t0 = time.perf_counter()
+  for _ in range(args.n * 10):
+    interceptor.intercept_service(lambda _: handler, details).unary_unary(req, None)
+  t_intercept = (time.perf_counter() - t0) / args.n / 10
+
+  runs = {'plain': None, 'noop': [NoopInterceptor()], 'metrics': [interceptor]}
+  times = {k: [] for k in runs}
+  for _ in range(args.repeat):
+    for k, interceptors in runs.items():
+      times[k].append(rpc_time(args.n, args.port, interceptors))
+  t_plain, t_noop, t_metrics = (min(times[k]) for k in runs)
+
+  t0 = time.perf_counter()
+  text = registry.expose()
+  t_scrape = time.perf_counter() - t0
+
+  print(f'Interceptor work per request: {t_intercept * 1e6:.2f}us')
+  print(f'Health RPC without interceptors: {t_plain * 1e6:.1f}us, with a no-op interceptor: {t_noop * 1e6:.1f}us, '
+        f'with metrics: {t_metrics * 1e6:.1f}us')
+  print(f'Overhead of metrics: {(t_metrics - t_plain) * 1e6:.1f}us/request, '
+        f'{(t_metrics - t_noop) * 1e6:.1f}us of it beyond the interceptor hook')
+  print(f'Scrape of {len(text.splitlines())} lines: {t_scrape * 1e3:.2f}ms')
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,91 @@
+"""
+Benchmark of preprocessing: new arrays per request vs the input buffers of the infer requests
+
+Before, every request resized into a new padded image, converted it to a new
+float32 tensor and let the engine copy it into its input. Now the wrappers
+resize straight into the input buffer their infer request owns
+(`Backend.input_buffer`). For DBNet and each Dense8 width bucket, this
+reports the time, the memory allocated and the peak memory per request of
+both ways, measured with tracemalloc, and checks that the inputs are equal.
+The models are stubs, only their input shapes matter:
+  python -m benchmarks.preprocess_alloc --repeat 200
+"""
+import argparse
+import logging
+import time
+import tracemalloc
+import numpy as np
+
+from model_serving.models import DBNetStub, Dense8Stub
+from model_serving.models.utils.image import resize_ar, resize_h
+from benchmarks.dense8_batch import make_chips
+
+
+def dbnet_copy(model, img, buf):
+  """Preprocessing before input buffers, copied into the buffer as the engine did"""
+  img, _ = resize_ar(img, model.input_w, model.input_h)
+  np.copyto(buf, img[np.newaxis])
+
+
+def dense8_copy(model, img, buf):
+  img_pad, _ = resize_h(img, h=model.input_shape[2], w=model.input_shape[3], logger=model.logger)
+  feed = img_pad.transpose(2, 0, 1)[np.newaxis, ...].astype(np.float32)
+  np.copyto(buf, feed)
+
+
+def measure(fn, imgs, repeat):
+  """Seconds, bytes allocated and peak bytes above the start, per request"""
+  for img in imgs: fn(img)
+  t0 = time.perf_counter()
+  for idx in range(repeat):
+    fn(imgs[idx % len(imgs)])
+  seconds = (time.perf_counter() - t0) / repeat
+  tracemalloc.start()
+  allocated = 0
+  peak = 0
+  for idx in range(repeat):
+    tracemalloc.reset_peak()
+    start, _ = tracemalloc.get_traced_memory()
+    fn(imgs[idx % len(imgs)])
+    # allocations freed by the end of the request still raise its peak
+    _, top = tracemalloc.get_traced_memory()
+    peak = max(peak, top - start)
+    allocated += top - start
+  tracemalloc.stop()
+  return seconds, allocated / repeat, peak
+
+
+def compare(name, model, copy, imgs, repeat):
+  buf_copy = np.zeros(model.backend.input_shape, dtype=np.float32)
+  buf = model.backend.input_buffer(0)
+  same = 0
+  for img in imgs:
+    copy(model, img, buf_copy)
+    model.preprocess(img, out=buf)
+    same += np.array_equal(buf_copy, buf)
+  for mode, fn in (('copy', lambda img: copy(model, img, buf_copy)),
+                   ('in place', lambda img: model.preprocess(img, out=buf))):
+    seconds, allocated, peak = measure(fn, imgs, repeat)
+    print(f'{name:<14} {mode:<9} {seconds * 1000:>8.3f} {allocated / 1024:>12.1f} {peak / 1024:>10.1f} '
+          f'{same:>5}/{len(imgs):<5}')
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('--repeat', type=int, default=200, help='requests measured per model and mode')
+  parser.add_argument('--pages', type=int, default=4, help='distinct pages for DBNet')
+  parser.add_argument('--chips', type=int, default=16, help='distinct chips per width bucket')
+  args = parser.parse_args()
+
+  logging.basicConfig(level=logging.WARNING)
+  logger = logging.getLogger()
+  rng = np.random.default_rng(0)
+  print(f'{"model":<14} {"mode":<9} {"ms/req":>8} {"KiB alloc/req":>12} {"KiB peak":>10} {"same":>11}')
+  pages = [rng.integers(0, 256, size=(1080, 1920, 3), dtype=np.uint8) for _ in range(args.pages)]
+  compare('det', DBNetStub('1024_1344_logits', logger), dbnet_copy, pages, args.repeat)
+  for key in (192, 1024, 1408):
+    compare(f'recog/{key}', Dense8Stub(f'crnn{key}', logger), dense8_copy, make_chips(key, args.chips, rng), args.repeat)
+
+
+if __name__ == '__main__':
+  main()
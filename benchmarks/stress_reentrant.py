@@ -0,0 +1,87 @@
+"""
+Stress test of concurrent inference on shared model instances
+
+Runs detection and recognition serially, then again from many threads on the
+same model instances, and checks that every output matches the serial run bit
+for bit. Exits with status 1 on any mismatch.
+
+Run from the repository root so that config/model_server_config.yaml is found:
+  python -m benchmarks.stress_reentrant --threads 8 --rounds 4 --images a.jpg b.jpg
+"""
+import argparse
+import logging
+import random
+import sys
+from concurrent import futures
+import cv2
+import numpy as np
+
+from model_serving.server import ModelServer, get_ie_core
+from model_serving.utils import load_conf, get_dense_key, get_layout
+
+
+def load_images(paths, rng):
+  if paths:
+    return [cv2.imread(p)[..., ::-1].copy() for p in paths]
+  return [rng.integers(0, 256, size=shape, dtype=np.uint8) for shape in [(1024, 1600, 3), (1600, 1024, 3)]]
+
+
+def make_chips(imgs, n, rng):
+  chips = []
+  for idx in range(n):
+    img = imgs[idx % len(imgs)]
+    h = int(rng.integers(24, 96))
+    w = int(rng.integers(h, min(h * 20, img.shape[1])))
+    y = int(rng.integers(0, img.shape[0] - h))
+    x = int(rng.integers(0, img.shape[1] - w))
+    chips.append(img[y:y + h, x:x + w])
+  return chips
+
+
+def same(a, b):
+  if isinstance(a, (tuple, list)):
+    return len(a) == len(b) and all(same(x, y) for x, y in zip(a, b))
+  # a page without boxes has a nan angle
+  return np.array_equal(np.asarray(a), np.asarray(b), equal_nan=True)
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('--images', nargs='*', default=[])
+  parser.add_argument('--chips', type=int, default=60)
+  parser.add_argument('--threads', type=int, default=8)
+  parser.add_argument('--rounds', type=int, default=4)
+  args = parser.parse_args()
+
+  logging.basicConfig(level=logging.WARNING)
+  config = load_conf('config/model_server_config.yaml')
+  # no OpenVINO is needed with the stub models of the config
+  server = ModelServer(config, get_ie_core())
+  rng = np.random.default_rng(0)
+  imgs = load_images(args.images, rng)
+  chips = make_chips(imgs, args.chips, rng)
+
+  def det(img):
+    return server.det[get_layout(img)].infer_sync(img)
+
+  def dense(chip):
+    return server.recog[get_dense_key(chip)].infer_sync(chip)
+
+  jobs = [(det, img) for img in imgs] + [(dense, chip) for chip in chips]
+  expected = [fn(x) for fn, x in jobs]
+
+  order = list(range(len(jobs))) * args.rounds
+  random.Random(0).shuffle(order)
+  mismatches = 0
+  with futures.ThreadPoolExecutor(max_workers=args.threads) as executor:
+    outputs = executor.map(lambda idx: (idx, jobs[idx][0](jobs[idx][1])), order)
+    for idx, output in outputs:
+      if not same(output, expected[idx]):
+        mismatches += 1
+        print(f'Mismatch on job {idx} ({jobs[idx][0].__name__})')
+  print(f'{len(order)} concurrent calls on {args.threads} threads, {mismatches} mismatches')
+  sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,213 @@
+"""Admission control of inference RPCs
+
+Without it, requests beyond `maximum_concurrent_rpcs` fail and the others
+wait for a thread even after their deadline passed, so that the device runs
+work no client will read. Here a request is rejected with
+RESOURCE_EXHAUSTED, which the client takes as a cue to fail over instead of
+restarting the server, when the queue in front of the device is full or
+when the time left before its deadline is shorter than the usual latency of
+its method. Only admitted requests measure the latency, so the estimate
+decays while requests are shed and a slow spell cannot shed them for good.
+"""
+from concurrent import futures
+import threading
+import time
+import grpc
+
+from .metrics import REGISTRY, cached_wrap
+
+
+# cheap or liveness RPCs, shedding them would get an overloaded server restarted
+EXEMPT = ('Check', 'Health', 'Ready')
+BEHAVIORS = ('unary_unary', 'unary_stream', 'stream_unary', 'stream_stream')
+
+
+class AdmissionControl:
+  """Queue bound and latency estimates of the methods of a server
+
+  Args:
+    max_queue: Requests allowed to wait for a thread or an infer request, more are rejected. gRPC rejects
+      requests beyond `max_concurrent_rpcs` first, so it needs `max_concurrent_rpcs` raised to take effect
+    alpha: Weight of the latest request in the moving average of the latency of a method
+    half_life: Seconds after which the latency of a method without admitted requests counts half
+    exempt: Methods always admitted
+    registry: The metrics `Registry`
+  """
+  def __init__(self, max_queue, alpha=0.2, half_life=10., exempt=EXEMPT, registry=REGISTRY):
+    self.max_queue = max_queue
+    self.alpha = alpha
+    self.half_life = half_life
+    self.exempt = set(exempt)
+    # moving average of the latency and time of the last admitted request by method
+    self.latency = {}
+    self.lock = threading.Lock()
+    self.shed = registry.counter('model_server_shed_total', 'Requests rejected before inference', ['method', 'reason'])
+
+  def expected(self, method):
+    """Expected latency of a method, decayed since its last admitted request, `None` before the first one"""
+    with self.lock:
+      latency = self.latency.get(method)
+    if latency is None: return None
+    latency, t_observed = latency
+    return latency * 0.5 ** ((time.monotonic() - t_observed) / self.half_life)
+
+  def observe(self, method, elapsed):
+    latency = self.expected(method)
+    with self.lock:
+      latency = elapsed if latency is None else (1 - self.alpha) * latency + self.alpha * elapsed
+      self.latency[method] = latency, time.monotonic()
+
+  def late(self, method, context):
+    """Why a request cannot finish before its deadline, `None` if it can or has no deadline"""
+    remaining = context.time_remaining()
+    if remaining is None: return None
+    if remaining <= 0: return 'deadline passed while queued'
+    latency = self.expected(method)
+    if latency is not None and remaining < latency:
+      return f'{remaining * 1000:.0f}ms left before the deadline, {latency * 1000:.0f}ms expected'
+    return None
+
+  def reject(self, method, reason, detail):
+    self.shed.labels(method, reason).inc()
+    return f'Model server overloaded: {detail}'
+
+
+class CountingThreadPool(futures.ThreadPoolExecutor):
+  """Thread pool of a `grpc.server` counting the RPCs waiting for a thread in `queued`"""
+  def __init__(self, *args, **kwargs):
+    super().__init__(*args, **kwargs)
+    self.queued = 0
+    self.lock = threading.Lock()
+
+  def _started(self, fn, *args, **kwargs):
+    with self.lock:
+      self.queued -= 1
+    return fn(*args, **kwargs)
+
+  def submit(self, fn, *args, **kwargs):
+    with self.lock:
+      self.queued += 1
+    try:
+      return super().submit(self._started, fn, *args, **kwargs)
+    except Exception:
+      with self.lock:
+        self.queued -= 1
+      raise
+
+
+class AdmissionInterceptor(grpc.ServerInterceptor):
+  """Applies `AdmissionControl` to a `grpc.server`
+
+  Args:
+    control: An `AdmissionControl`
+    queue_depth: A callable returning the requests waiting for a thread, e.g. of a `CountingThreadPool`
+  """
+  def __init__(self, control, queue_depth):
+    self.control = control
+    self.queue_depth = queue_depth
+    # wrapped handlers by method, servers return the same handler for every call
+    self.handlers = {}
+
+  def _rejected(self, handler, detail):
+    def reject(request, context):
+      context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, detail)
+    behavior = next(b for b in BEHAVIORS if getattr(handler, b) is not None)
+    return handler._replace(**{behavior: reject})
+
+  def _admitted(self, method, context):
+    late = self.control.late(method, context)
+    if late is not None:
+      context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, self.control.reject(method, 'deadline', late))
+
+  def _unary(self, method, behavior):
+    def wrapper(request, context):
+      self._admitted(method, context)
+      t0 = time.perf_counter()
+      res = behavior(request, context)
+      self.control.observe(method, time.perf_counter() - t0)
+      return res
+    return wrapper
+
+  def _stream_stream(self, method, behavior):
+    def wrapper(request_iterator, context):
+      self._admitted(method, context)
+      t0 = time.perf_counter()
+      yield from behavior(request_iterator, context)
+      self.control.observe(method, time.perf_counter() - t0)
+    return wrapper
+
+  def _wrap(self, method, handler):
+    if handler.unary_unary is not None:
+      return handler._replace(unary_unary=self._unary(method, handler.unary_unary))
+    if handler.stream_unary is not None:
+      return handler._replace(stream_unary=self._unary(method, handler.stream_unary))
+    if handler.stream_stream is not None:
+      return handler._replace(stream_stream=self._stream_stream(method, handler.stream_stream))
+    return handler
+
+  def intercept_service(self, continuation, handler_call_details):
+    handler = continuation(handler_call_details)
+    if handler is None: return None
+    return _admit(self, handler_call_details.method, handler)
+
+
+class AsyncAdmissionInterceptor(grpc.aio.ServerInterceptor):
+  """Same as `AdmissionInterceptor` for `grpc.aio` servers, whose queue is of requests waiting for an infer request"""
+  def __init__(self, control, queue_depth):
+    self.control = control
+    self.queue_depth = queue_depth
+    self.handlers = {}
+
+  def _rejected(self, handler, detail):
+    async def reject(request, context):
+      await context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, detail)
+    behavior = next(b for b in BEHAVIORS if getattr(handler, b) is not None)
+    return handler._replace(**{behavior: reject})
+
+  async def _admitted(self, method, context):
+    late = self.control.late(method, context)
+    if late is not None:
+      await context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, self.control.reject(method, 'deadline', late))
+
+  def _unary(self, method, behavior):
+    async def wrapper(request, context):
+      await self._admitted(method, context)
+      t0 = time.perf_counter()
+      res = await behavior(request, context)
+      self.control.observe(method, time.perf_counter() - t0)
+      return res
+    return wrapper
+
+  def _stream_stream(self, method, behavior):
+    async def wrapper(request_iterator, context):
+      await self._admitted(method, context)
+      t0 = time.perf_counter()
+      async for res in behavior(request_iterator, context):
+        yield res
+      self.control.observe(method, time.perf_counter() - t0)
+    return wrapper
+
+  _wrap = AdmissionInterceptor._wrap
+
+  async def intercept_service(self, continuation, handler_call_details):
+    handler = await continuation(handler_call_details)
+    if handler is None: return None
+    return _admit(self, handler_call_details.method, handler)
+
+
+def _admit(interceptor, full_method, handler):
+  """The wrapped handler of an admitted request, a handler rejecting it when the queue is full"""
+  method = full_method.rsplit('/', 1)[-1]
+  if method in interceptor.control.exempt: return handler
+  depth = interceptor.queue_depth()
+  if depth >= interceptor.control.max_queue:
+    return interceptor._rejected(handler, interceptor.control.reject(method, 'queue', f'{depth} requests queued'))
+  return cached_wrap(interceptor, full_method, handler)
+
+
+def get_admission(config):
+  """The admission control configured by `grpc.admission`, `None` if disabled"""
+  admission_config = config['grpc'].get('admission', {})
+  if not admission_config.get('enabled', False): return None
+  return AdmissionControl(max_queue=admission_config.get('max_queue', 16), alpha=admission_config.get('alpha', 0.2),
+                          half_life=admission_config.get('half_life', 10.))
@@ -0,0 +1,358 @@
+"""Asyncio (grpc.aio) implementation of the model server"""
+import asyncio
+import time
+import grpc
+import numpy as np
+
+from . import model_serving_pb2
+from . import model_serving_pb2_grpc
+from .server import ModelServer, get_server_options, get_ie_core
+from .health import health_response, start_health_server_aio
+from .metrics import RpcMetrics, AsyncMetricsInterceptor, start_metrics_server
+from .utils import get_dense_key, get_layout
+from .models.utils.image import crop_lines
+from .balancer import DeviceBalancer, replicas
+from .admission import AsyncAdmissionInterceptor, get_admission
+
+
+class InferRequestPool:
+  """Infer requests of a backend that coroutines can await.
+
+  Each request id is owned by at most one coroutine at a time. Waiting for an
+  idle request or for the device does not hold a thread: completion callbacks
+  from the backend resolve an asyncio future on the event loop. Inputs are
+  preprocessed into the input buffer of the request once it is taken. A
+  request is only idle again once its inference has finished, even if the
+  coroutine waiting on it was cancelled.
+
+  Args:
+    backend: A `Backend` of a model
+  """
+  def __init__(self, backend):
+    self.backend = backend
+    self.size = backend.num_requests
+    self.waiting = 0
+    self.idle = asyncio.Queue()
+    for req_id in range(self.size):
+      self.idle.put_nowait(req_id)
+
+  @property
+  def in_use(self):
+    return self.size - self.idle.qsize()
+
+  async def infer(self, prepare):
+    """Runs inference on an idle request
+
+    Args:
+      prepare: Called in a worker thread with the input buffer of the request,
+        returns the feed and a context, e.g. `lambda buf: model.preprocess(img, out=buf)`
+
+    Returns:
+      A copy of the output and the context
+    """
+    self.waiting += 1
+    try:
+      req_id = await self.idle.get()
+    finally:
+      self.waiting -= 1
+    # a cancelled caller leaves the request to finish on the device before it is handed out again
+    return await asyncio.shield(self._infer(req_id, prepare))
+
+  async def _infer(self, req_id, prepare):
+    loop = asyncio.get_running_loop()
+    try:
+      feed, ctx = await loop.run_in_executor(None, prepare, self.backend.input_buffer(req_id))
+      done = loop.create_future()
+      def callback():
+        loop.call_soon_threadsafe(lambda: done.done() or done.set_result(None))
+      handle = self.backend.start(req_id, feed, done=callback)
+      await done
+      return self.backend.wait(handle).copy(), ctx
+    finally:
+      self.idle.put_nowait(req_id)
+
+
+class AsyncModelServer(ModelServer):
+  """Model server whose RPCs are coroutines served by `grpc.aio`.
+
+  Models are loaded as in `ModelServer`, then the backend of every model
+  (`det['portrait']`, `det['landscape']`, each `recog[key]` and the check
+  model) gets its own `InferRequestPool` sized by `usb_batch_size`, one for
+  each device of a model balanced over several devices.
+  Pre- and post-processing run in the default executor so that the event loop
+  only waits on the device. Models must not be used through their own
+  `infer_*` methods at the same time, the pools own all infer requests.
+  With `dense8.scheduler` enabled, the scheduler owns the infer requests of
+  the recognition models instead and they get no pools.
+  """
+  def __init__(self, config, ie_core):
+    super().__init__(config, ie_core)
+    self.det_pools = {k: self._pools(m) for k, m in self.det.items()}
+    self.recog_pools = {} if self.scheduler is not None else {k: self._pools(m) for k, m in self.recog.items()}
+    self.test_pool = InferRequestPool(self.test_model)
+    self.loop = asyncio.get_running_loop()
+    self.logger.info('Infer request pools created.')
+
+  @staticmethod
+  def _pools(model):
+    """Infer request pools of a model by device"""
+    return {dev: InferRequestPool(m.backend) for dev, m in replicas(model).items()}
+
+  def _request_pools(self):
+    pools = {}
+    for tag, model_pools in (('det', self.det_pools), ('recog', self.recog_pools)):
+      for k, by_dev in model_pools.items():
+        pools.update({f'{tag}/{k}' if dev is None else f'{tag}/{k}@{dev}': p for dev, p in by_dev.items()})
+    pools['check_model'] = self.test_pool
+    return {k: (lambda p=p: p.size, lambda p=p: p.in_use, lambda p=p: p.waiting) for k, p in pools.items()}
+
+  def queue_depth(self):
+    """Requests waiting for an idle infer request"""
+    pools = [*self.det_pools.values(), *self.recog_pools.values()]
+    return sum(p.waiting for by_dev in pools for p in by_dev.values())
+
+  async def _run(self, fn, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, fn, *args)
+
+  async def _check(self):
+    results = await asyncio.gather(*[self.test_pool.infer(lambda _, x=test_in: (x, None)) for test_in in self.test_in])
+    return self._check_outputs([out for out, _ in results])
+
+  def _run_check(self):
+    """Runs the check on the event loop, for the health prober thread"""
+    return asyncio.run_coroutine_threadsafe(self._check(), self.loop).result()
+
+  async def Check(self, request, context):
+    sess_id = request.sess_id
+    self.logger.info('Tests started')
+    status = await self._check()
+    self.health.update(status)
+    res = model_serving_pb2.CheckResponse(sess_id=sess_id, status=status)
+    self.logger.info(f'Tests done. Result: {status}')
+    return res
+
+  async def Health(self, request, context):
+    return health_response(self.health, request)
+
+  def _warm_up_runs(self):
+    """Coroutine functions running each model once on every infer request of each of its pools"""
+    det_imgs, chips = self._warm_up_inputs()
+    async def run(model, pool, img):
+      await asyncio.gather(*[pool.infer(lambda buf: model.preprocess(img, out=buf)) for _ in range(pool.size)])
+    runs = []
+    for tag, models, pools, imgs in (('det', self.det, self.det_pools, det_imgs),
+                                     ('recog', self.recog, self.recog_pools, chips)):
+      for k, model in models.items():
+        if k not in pools:
+          # owned by the scheduler, warmed up through the models in the executor
+          runs += [(name, lambda m=m, img=imgs[k]: self._run(self._recog_warm_up, m, img))
+                   for name, m in self._replicas(f'{tag}/{k}', model).items()]
+          continue
+        for dev, pool in pools[k].items():
+          name = f'{tag}/{k}' if dev is None else f'{tag}/{k}@{dev}'
+          runs.append((name, lambda m=model, p=pool, img=imgs[k]: run(m, p, img)))
+    runs.append(('check_model', self._check))
+    return runs
+
+  async def warm_up(self):
+    """Same as `ModelServer.warm_up` through the infer request pools"""
+    if self.config['grpc'].get('warm_up', True):
+      t0 = time.perf_counter()
+      for name, run in self._warm_up_runs():
+        times = []
+        for _ in range(2):
+          t1 = time.perf_counter()
+          await run()
+          times.append(time.perf_counter() - t1)
+        self._record_warm_up(name, times)
+      self.logger.info(f'Warm-up done in {time.perf_counter() - t0:.2f}s')
+    self.ready.set()
+
+  async def Ready(self, request, context):
+    return super().Ready(request, context)
+
+  async def _infer(self, model, pools, img):
+    """Runs `img` on the pool of the device the balancer picks, on the only pool otherwise
+
+    Returns:
+      The output and the `InferContext` of the preprocessing
+    """
+    prepare = lambda buf: model.preprocess(img, out=buf)
+    if not isinstance(model, DeviceBalancer):
+      return await pools[None].infer(prepare)
+    return await model.run_async(lambda dev: pools[dev].infer(prepare))
+
+  async def _det_infer(self, img, layout):
+    model = self.det[layout]
+    logits, ctx = await self._infer(model, self.det_pools[layout], img)
+    lines, angle = await self._run(model.parse_result, logits, ctx)
+    return lines, angle
+
+  async def _det(self, img, layout):
+    if layout not in self.det:
+      self.logger.error(f"Layout {layout} is not supported")
+      return np.zeros((0, 8), dtype=np.float32), 0
+    lines, angle = await self._det_infer(img, layout)
+    return np.array(lines, dtype=np.float32), angle
+
+  async def DetInferSync(self, request, context):
+    sess_id = request.sess_id
+    self.logger.info(f'Started {request.layout} detection inference for sess {sess_id}')
+    key = await self._run(self._pb_key, 'det', request.img, request.layout, request.suppress_lines)
+    cached = self._cache_get(key)
+    if cached is None:
+      img = await self._run(self._decode_img, request.img)
+      cached = await self._det(img, request.layout)
+      self._cache_put(key, cached)
+    res = self._det_response(sess_id, *cached)
+    self.logger.info(f'Finished detection inference for sess {sess_id}')
+    return res
+
+  async def DetInferPathSync(self, request, context):
+    sess_id = request.sess_id
+    self.logger.info(f'Started {request.layout} detection inference from path for sess {sess_id}')
+    img = await self._run(self._path_img, request)
+    if img is None:
+      await context.abort(grpc.StatusCode.INVALID_ARGUMENT, f'Cannot read image from {request.path}')
+    key = await self._run(self._array_key, 'det', img, request.layout, request.suppress_lines)
+    cached = self._cache_get(key)
+    if cached is None:
+      cached = await self._det(img, request.layout)
+      self._cache_put(key, cached)
+    res = self._det_response(sess_id, *cached)
+    self.logger.info(f'Finished detection inference for sess {sess_id}')
+    return res
+
+  async def _dense_infer(self, img, key, num_only):
+    if self.scheduler is not None:
+      return await asyncio.wrap_future(self.scheduler.submit(img, key, num_only))
+    model = self.recog[key]
+    logits, ctx = await self._infer(model, self.recog_pools[key], img)
+    return await self._run(model.parse_result, logits, num_only, ctx)
+
+  def _dense_input(self, request):
+    """Decoded chip and cache key of a dense request, for the executor"""
+    return self._decode_img(request.img), self._pb_key('dense', request.img, request.key, request.num_only)
+
+  async def _cached_dense_infer(self, img, key, num_only, cache_key):
+    cached = self._cache_get(cache_key)
+    if cached is None:
+      cached = await self._dense_infer(img, key, num_only)
+      self._cache_put(cache_key, cached)
+    return cached
+
+  async def DenseInferSync(self, request, context):
+    img, cache_key = await self._run(self._dense_input, request)
+    code, prob, position = await self._cached_dense_infer(img, request.key, request.num_only, cache_key)
+    return self._dense_response(request.sess_id, code, prob, position)
+
+  async def DenseInferPathSync(self, request, context):
+    img = await self._run(self._path_img, request)
+    if img is None:
+      await context.abort(grpc.StatusCode.INVALID_ARGUMENT, f'Cannot read image from {request.path}')
+    cache_key = self._array_key('dense', img, request.key, request.num_only)
+    code, prob, position = await self._cached_dense_infer(img, request.key, request.num_only, cache_key)
+    return self._dense_response(request.sess_id, code, prob, position)
+
+  async def DenseBatchInferSync(self, request_iterator, context):
+    tasks = []
+    # an empty stream gets an empty response
+    sess_id = ''
+    ragged = False
+    async for request in request_iterator:
+      if not tasks:
+        sess_id = request.sess_id
+        ragged = request.ragged
+        self.logger.info(f'Started dense batch inference for sess {sess_id}')
+      img, cache_key = await self._run(self._dense_input, request)
+      tasks.append(asyncio.ensure_future(self._cached_dense_infer(img, request.key, request.num_only, cache_key)))
+    results = await asyncio.gather(*tasks)
+    res = self._dense_batch_response(sess_id, results, ragged=ragged)
+    self.logger.info(f'Finished dense batch inference for sess {sess_id}')
+    return res
+
+  async def DenseStreamInfer(self, request_iterator, context):
+    """Streams back the result of each chip in the order they are recognized"""
+    done = asyncio.Queue()
+    tasks = []
+    async def run(request):
+      try:
+        img, cache_key = await self._run(self._dense_input, request)
+        result = await self._cached_dense_infer(img, request.key, request.num_only, cache_key)
+      except Exception as e:
+        result = e
+      done.put_nowait((request, result))
+    async def read():
+      try:
+        async for request in request_iterator:
+          if not tasks: self.logger.info(f'Started dense stream inference for sess {request.sess_id}')
+          tasks.append(asyncio.ensure_future(run(request)))
+      except Exception as e:
+        done.put_nowait((None, e))
+        return
+      done.put_nowait((None, None))
+    reader = asyncio.ensure_future(read())
+    n = 0
+    total = None
+    try:
+      while total is None or n < total:
+        request, result = await done.get()
+        if request is None:
+          if result is not None: raise result
+          total = len(tasks)
+          continue
+        if isinstance(result, Exception): raise result
+        n += 1
+        yield self._chip_response(request, result)
+      self.logger.info(f'Finished dense stream inference of {n} chips')
+    finally:
+      # chips already started finish on their own, cancelling them could hand out a busy infer request
+      reader.cancel()
+
+  async def ReadPage(self, request, context):
+    sess_id = request.sess_id
+    img = await self._run(self._decode_img, request.img)
+    layout = request.layout or get_layout(img)
+    self.logger.info(f'Started {layout} page reading for sess {sess_id}')
+    if layout not in self.det:
+      self.logger.error(f"Layout {layout} is not supported")
+      return self._page_response(sess_id, np.zeros((0, 4)), 0, [])
+    lines, angle = await self._det_infer(img, layout)
+    lines = np.array(lines, dtype=np.float32).reshape(-1, 8)
+    boxes, chips = await self._run(crop_lines, img, lines, angle, request.min_wh_ratio)
+    self.logger.info(f'{lines.shape[0]} lines detected, {boxes.shape[0]} boxes to recognize for sess {sess_id}')
+    results = await asyncio.gather(*[self._dense_infer(chip, get_dense_key(chip), request.num_only) for chip in chips])
+    res = self._page_response(sess_id, boxes, angle, results, ragged=request.ragged)
+    self.logger.info(f'Finished page reading for sess {sess_id}')
+    return res
+
+
+async def serve_aio(config):
+  options = get_server_options(config)
+  max_concurrent_rpcs = config['grpc'].get('max_concurrent_rpcs', None)
+  metrics_port = config.get('metrics', {}).get('port', None)
+  model_servicer = AsyncModelServer(config, get_ie_core())
+  interceptors = []
+  if metrics_port is not None: interceptors.append(AsyncMetricsInterceptor(RpcMetrics('model_server')))
+  admission = get_admission(config)
+  if admission is not None: interceptors.append(AsyncAdmissionInterceptor(admission, model_servicer.queue_depth))
+  server = grpc.aio.server(options=options, interceptors=interceptors or None,
+                           maximum_concurrent_rpcs=max_concurrent_rpcs)
+  model_serving_pb2_grpc.add_ModelServerServicer_to_server(model_servicer, server)
+  ip = config['grpc'].get('ip', '127.0.0.1')
+  port = config['grpc'].get('port', 50052)
+  server.add_insecure_port(f'{ip}:{port}')
+  if metrics_port is not None:
+    model_servicer.register_metrics()
+    start_metrics_server(metrics_port, config['metrics'].get('ip', '127.0.0.1'))
+    model_servicer.logger.info(f"Start metrics server at {config['metrics'].get('ip', '127.0.0.1')}:{metrics_port}")
+  # no RPC may take infer requests before warm-up is done with them
+  await model_servicer.warm_up()
+  model_servicer.logger.info(f'Start asyncio server at {ip}:{port}')
+  await server.start()
+  model_servicer.health.start()
+  health_server = await start_health_server_aio(config, model_servicer.health)
+  if health_server is not None:
+    model_servicer.logger.info(f"Start health server at {ip}:{config['grpc']['health']['port']}")
+  await server.wait_for_termination()
@@ -0,0 +1,178 @@
+"""Load balancing of a model loaded on several devices
+
+A `DeviceBalancer` stands in for a model wrapper whose network is loaded
+on more than one device, e.g. two MYRIAD sticks and the CPU. Each call goes
+to the replica with the lowest expected completion time, estimated from
+its measured latency and the calls it is already running. A replica that
+raises is skipped for a while and the call is retried on the next one.
+"""
+import threading
+import time
+
+from .metrics import REGISTRY
+
+
+class DeviceBalancer:
+  """Routes calls of a model to its replicas on several devices
+
+  Pre- and post-processing, shapes and other attributes are shared by all
+  replicas and read from the first one.
+
+  Args:
+    replicas: A dict mapping device names to model wrappers of the same network
+    name: Name of the model in logs and metrics, e.g. det/portrait
+    logger: A logging.Logger
+    alpha: Weight of the latest call in the moving average of the latency
+    cooldown: Seconds a replica is skipped after an error
+    registry: The metrics `Registry`
+  """
+  def __init__(self, replicas, name, logger, alpha=0.2, cooldown=30., registry=REGISTRY):
+    self.replicas = dict(replicas)
+    self.primary = next(iter(self.replicas.values()))
+    self.name = name
+    self.logger = logger
+    self.alpha = alpha
+    self.cooldown = cooldown
+    self.lock = threading.Lock()
+    self.latency = {dev: None for dev in self.replicas}
+    self.in_flight = {dev: 0 for dev in self.replicas}
+    self.capacity = {dev: m.req_ids.size for dev, m in self.replicas.items()}
+    self.t_failed = {dev: None for dev in self.replicas}
+    self.calls = registry.counter('model_server_device_calls_total', 'Calls routed to a device', ['model', 'device'])
+    self.errors = registry.counter('model_server_device_errors_total', 'Calls that failed on a device', ['model', 'device'])
+    latency = registry.gauge('model_server_device_latency_seconds', 'Moving average of the call latency',
+                             ['model', 'device'])
+    for dev in self.replicas:
+      latency.labels(name, dev).set_function(lambda dev=dev: self.latency[dev] or 0.)
+
+  def __getattr__(self, name):
+    # only called for attributes not found on the balancer
+    return getattr(self.__dict__['primary'], name)
+
+  def _expected(self, dev):
+    """Expected completion time of a new call, unmeasured devices first"""
+    latency = self.latency[dev]
+    if latency is None: return 0.
+    return latency * (1 + self.in_flight[dev] / self.capacity[dev])
+
+  def _rank(self, dev):
+    # devices with an idle infer request first, then the fastest, then the least loaded
+    load = self.in_flight[dev] / self.capacity[dev]
+    return load >= 1, self._expected(dev), load
+
+  def acquire(self, exclude=()):
+    """Picks the device for a call and counts the call in flight
+
+    Devices in cooldown after an error are only used if no other one is left.
+
+    Raises:
+      RuntimeError: All devices are excluded
+    """
+    with self.lock:
+      now = time.monotonic()
+      candidates = [dev for dev in self.replicas if dev not in exclude]
+      if not candidates:
+        raise RuntimeError(f'No device left to run {self.name}')
+      healthy = [dev for dev in candidates
+                 if self.t_failed[dev] is None or now - self.t_failed[dev] > self.cooldown]
+      dev = min(healthy or candidates, key=self._rank)
+      self.in_flight[dev] += 1
+    self.calls.labels(self.name, dev).inc()
+    return dev
+
+  def release(self, dev, elapsed=None, ok=True):
+    """Ends a call, updates the latency of the device or starts its cooldown"""
+    with self.lock:
+      self.in_flight[dev] -= 1
+      if not ok:
+        self.t_failed[dev] = time.monotonic()
+      elif elapsed is not None:
+        self.t_failed[dev] = None
+        latency = self.latency[dev]
+        self.latency[dev] = elapsed if latency is None else (1 - self.alpha) * latency + self.alpha * elapsed
+    if not ok:
+      self.errors.labels(self.name, dev).inc()
+
+  def _failed(self, dev, tried, e):
+    """Ends a failed call, re-raises `e` if no device is left to retry on"""
+    self.release(dev, ok=False)
+    tried.append(dev)
+    if len(tried) == len(self.replicas): raise e
+    self.logger.error(f'{self.name} failed on {dev}, retry on another device: {e}')
+
+  def run(self, method, *args, **kwargs):
+    """Calls `method` of the best replica, falls back to the others on errors"""
+    tried = []
+    while True:
+      dev = self.acquire(exclude=tried)
+      t0 = time.perf_counter()
+      try:
+        res = getattr(self.replicas[dev], method)(*args, **kwargs)
+      except Exception as e:
+        self._failed(dev, tried, e)
+        continue
+      self.release(dev, time.perf_counter() - t0)
+      return res
+
+  async def run_async(self, infer):
+    """Same as `run` for a coroutine function taking the device to run on"""
+    tried = []
+    while True:
+      dev = self.acquire(exclude=tried)
+      t0 = time.perf_counter()
+      try:
+        res = await infer(dev)
+      except Exception as e:
+        self._failed(dev, tried, e)
+        continue
+      self.release(dev, time.perf_counter() - t0)
+      return res
+
+  def infer_sync(self, *args, **kwargs):
+    return self.run('infer_sync', *args, **kwargs)
+
+  def infer_batch(self, *args, **kwargs):
+    return self.run('infer_batch', *args, **kwargs)
+
+  def infer_async(self, img, block=True, done=None):
+    """Starts inference on the best replica with an idle request, the context remembers the device for `get_result`
+
+    Replicas are tried in order without waiting. Only when all of them are
+    busy, the best one is waited for if `block`, otherwise `None` is returned.
+    """
+    failed, busy = [], []
+    while True:
+      waiting = len(set(failed + busy)) == len(self.replicas)
+      if waiting and not block: return None
+      dev = self.acquire(exclude=failed if waiting else failed + busy)
+      t0 = time.perf_counter()
+      try:
+        ctx = self.replicas[dev].infer_async(img, block=waiting, done=done)
+      except Exception as e:
+        self._failed(dev, failed, e)
+        continue
+      if ctx is None:
+        # no idle request on this device
+        self.release(dev)
+        if waiting: return None
+        busy.append(dev)
+        continue
+      ctx.device = dev
+      ctx.t_start = t0
+      return ctx
+
+  def get_result(self, ctx, num_only=False):
+    try:
+      res = self.replicas[ctx.device].get_result(ctx, num_only)
+    except Exception:
+      self.release(ctx.device, ok=False)
+      raise
+    self.release(ctx.device, time.perf_counter() - ctx.t_start)
+    return res
+
+
+def replicas(model):
+  """Replicas of a model by device, a single model is its own replica"""
+  if isinstance(model, DeviceBalancer):
+    return model.replicas
+  return {None: model}
@@ -0,0 +1,101 @@
+"""Content-addressed cache of inference results
+
+The same scan is often read more than once, by client retries, by the
+websocket `Scan` path on a local image or by the orientation loop of
+`InsuranceReader`. Results are kept by a hash of the image bytes, the model
+and the options, so that a repeated request skips decoding and inference.
+"""
+from collections import OrderedDict
+import hashlib
+import threading
+import time
+import numpy as np
+
+from .metrics import REGISTRY
+
+
+# rough size of the key, the tuple and the dict slot of an entry
+ENTRY_OVERHEAD = 256
+
+
+def _nbytes(value):
+  if isinstance(value, np.ndarray): return value.nbytes
+  if isinstance(value, (tuple, list)): return sum(_nbytes(v) for v in value)
+  return 8
+
+
+class ResultCache:
+  """A thread-safe LRU cache bounded by memory and entry age
+
+  Args:
+    max_bytes: Memory bound of cached results, the least recently used ones are dropped beyond it
+    ttl: Seconds a result stays valid
+    registry: The metrics `Registry` for hit, miss and size metrics
+  """
+  def __init__(self, max_bytes, ttl, registry=REGISTRY):
+    self.max_bytes = max_bytes
+    self.ttl = ttl
+    self.entries = OrderedDict()
+    self.size = 0
+    self.lock = threading.Lock()
+    self.hits = registry.counter('model_server_cache_hits_total', 'Results served from the cache', ['kind'])
+    self.misses = registry.counter('model_server_cache_misses_total', 'Results not found in the cache', ['kind'])
+    registry.gauge('model_server_cache_bytes', 'Bytes of cached results').labels().set_function(lambda: self.size)
+    registry.gauge('model_server_cache_entries', 'Cached results').labels().set_function(lambda: len(self.entries))
+
+  @staticmethod
+  def key(kind, data, shape, encoding, *options):
+    """Cache key of an image and the options of a request
+
+    Args:
+      kind: Kind of result, e.g. det or dense
+      data: Image bytes, raw RGB or a compressed file
+      shape: (h, w, c) of the image
+      encoding: Encoding of `data`, raw for pixels
+      options: Model key and request options the result depends on
+    """
+    digest = hashlib.blake2b(data, digest_size=16).digest()
+    return (kind, digest, tuple(shape), encoding or 'raw', *options)
+
+  @staticmethod
+  def array_key(kind, img, *options):
+    """Same as `key` for a decoded RGB image, equal to the key of its raw `Image` message"""
+    img = np.ascontiguousarray(img, dtype=np.uint8)
+    return ResultCache.key(kind, memoryview(img).cast('B'), img.shape, 'raw', *options)
+
+  def _drop(self, key):
+    _, size, _ = self.entries.pop(key)
+    self.size -= size
+
+  def get(self, key):
+    """The cached result of `key`, `None` if missing or expired"""
+    with self.lock:
+      entry = self.entries.get(key)
+      if entry is not None and time.monotonic() - entry[2] > self.ttl:
+        self._drop(key)
+        entry = None
+      if entry is not None:
+        self.entries.move_to_end(key)
+    if entry is None:
+      self.misses.labels(key[0]).inc()
+      return None
+    self.hits.labels(key[0]).inc()
+    return entry[0]
+
+  def put(self, key, value):
+    """Caches a result, which must not be modified afterwards"""
+    size = _nbytes(value) + ENTRY_OVERHEAD
+    if size > self.max_bytes: return
+    with self.lock:
+      if key in self.entries: self._drop(key)
+      self.entries[key] = (value, size, time.monotonic())
+      self.size += size
+      while self.size > self.max_bytes:
+        self._drop(next(iter(self.entries)))
+
+
+def get_cache(config):
+  """The result cache configured by `grpc.cache`, `None` if disabled"""
+  cache_config = config['grpc'].get('cache', {})
+  if not cache_config.get('enabled', False): return None
+  return ResultCache(max_bytes=int(cache_config.get('max_mb', 64) * 1024 * 1024), ttl=cache_config.get('ttl', 300))
@@ -0,0 +1,119 @@
+"""Long-lived gRPC channels shared by the calls and threads of a client
+
+A channel opened per call pays TCP and HTTP/2 setup every time, several
+times per card with a check before each inference. A `ChannelPool` keeps
+one channel per target instead. Keepalive pings find a dead connection
+while it is idle, and the reconnect backoff is bounded so that a restarted
+server is found again within seconds. The connectivity state of every
+channel is followed and exported as a metric along with how often channels
+are reused.
+"""
+import threading
+import grpc
+
+from .metrics import REGISTRY
+
+
+# values of the state gauge
+STATES = {
+  grpc.ChannelConnectivity.IDLE: 0,
+  grpc.ChannelConnectivity.CONNECTING: 1,
+  grpc.ChannelConnectivity.READY: 2,
+  grpc.ChannelConnectivity.TRANSIENT_FAILURE: 3,
+  grpc.ChannelConnectivity.SHUTDOWN: 4,
+}
+
+
+def channel_options(channel_config):
+  """Keepalive and reconnect options of client channels from the `grpc.channel` section of a config"""
+  keepalive_time = channel_config.get('keepalive_time', 30)
+  return [
+    ('grpc.keepalive_time_ms', int(keepalive_time * 1000)),
+    ('grpc.keepalive_timeout_ms', int(channel_config.get('keepalive_timeout', 10) * 1000)),
+    ('grpc.keepalive_permit_without_calls', 1),
+    ('grpc.http2.max_pings_without_data', 0),
+    ('grpc.initial_reconnect_backoff_ms', int(channel_config.get('initial_backoff', 0.5) * 1000)),
+    ('grpc.min_reconnect_backoff_ms', int(channel_config.get('initial_backoff', 0.5) * 1000)),
+    ('grpc.max_reconnect_backoff_ms', int(channel_config.get('max_backoff', 5) * 1000)),
+  ]
+
+
+def server_keepalive_options(channel_config):
+  """Options of a server accepting the keepalive pings of `channel_options` without closing the connection"""
+  keepalive_time = channel_config.get('keepalive_time', 30)
+  return [
+    ('grpc.keepalive_permit_without_calls', 1),
+    ('grpc.http2.min_recv_ping_interval_without_data_ms', int(keepalive_time * 1000)),
+    ('grpc.http2.max_ping_strikes', 0),
+  ]
+
+
+class ChannelPool:
+  """Channels and stubs by target, created on first use and kept until `close`
+
+  Channels are thread-safe, every thread of a client shares the pool.
+
+  Args:
+    prefix: Prefix of the metric names, e.g. model_client
+    options: Channel options, e.g. message sizes and `channel_options`
+    registry: The metrics `Registry`
+  """
+  def __init__(self, prefix, options=None, registry=REGISTRY):
+    self.options = options
+    self.channels = {}
+    self.stubs = {}
+    self.states = {}
+    self.lock = threading.Lock()
+    self.uses = registry.counter(f'{prefix}_channel_uses_total', 'Calls of a channel, new or reused',
+                                 ['target', 'channel'])
+    self.state_gauge = registry.gauge(f'{prefix}_channel_state',
+                                      'Connectivity of a channel, 0 idle, 1 connecting, 2 ready, 3 failure, 4 shut down',
+                                      ['target'])
+    self.changes = registry.counter(f'{prefix}_channel_state_changes_total', 'Connectivity changes of a channel',
+                                    ['target', 'state'])
+
+  def _watch(self, target):
+    def on_change(state):
+      self.states[target] = state
+      self.changes.labels(target, state.name).inc()
+    return on_change
+
+  def channel(self, target):
+    """The channel to `target` (ip:port), opened on the first call"""
+    channel = self.channels.get(target)
+    if channel is not None:
+      self.uses.labels(target, 'reused').inc()
+      return channel
+    with self.lock:
+      channel = self.channels.get(target)
+      if channel is None:
+        channel = self.channels[target] = grpc.insecure_channel(target, options=self.options)
+        self.states[target] = grpc.ChannelConnectivity.IDLE
+        self.state_gauge.labels(target).set_function(lambda: STATES[self.states[target]])
+        # connects at once, the first call usually finds the channel ready
+        channel.subscribe(self._watch(target), try_to_connect=True)
+        created = True
+      else:
+        created = False
+    self.uses.labels(target, 'new' if created else 'reused').inc()
+    return channel
+
+  def stub(self, target, stub_cls):
+    """A stub of class `stub_cls` on the channel to `target`"""
+    channel = self.channel(target)
+    stub = self.stubs.get((target, stub_cls))
+    if stub is None:
+      stub = self.stubs[(target, stub_cls)] = stub_cls(channel)
+    return stub
+
+  def state(self, target):
+    """Last connectivity state of the channel to `target`, `None` before its first use"""
+    return self.states.get(target)
+
+  def close(self):
+    with self.lock:
+      channels = list(self.channels.values())
+      self.channels.clear()
+      self.stubs.clear()
+    for channel in channels:
+      channel.close()
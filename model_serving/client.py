@@ -1,3 +1,5 @@
+import atexit
+from contextlib import contextmanager
 import time
 import grpc
 import yaml
@@ -5,7 +7,15 @@ import numpy as np
 import cv2
 from . import model_serving_pb2
 from . import model_serving_pb2_grpc
-from .utils import get_dense_key, get_layout, load_conf
+from .utils import get_dense_key, get_layout, load_conf, encode_img
+from .shm import SharedImagePool
+from .metrics import REGISTRY
+from .channels import ChannelPool, channel_options
+from .routing import HALF_OPEN, get_router
+
+FAILOVERS = REGISTRY.counter('model_client_failovers_total', 'Requests moved on to the next server after failing on one', ['ip'])
+RESTARTS = REGISTRY.counter('model_client_restarts_total', 'Restarts of the local model server')
+OVERLOADS = REGISTRY.counter('model_client_overloads_total', 'Requests rejected by an overloaded server', ['ip'])
 
 class ModelServerClient:
   """A model server client to handle gRPC communication"""
@@ -15,9 +25,33 @@ class ModelServerClient:
     self.logger = logger
     self.ip_pool = [self.config['grpc']['ip'], *self.config['grpc']['remote']]
     self.docker_manager = docker_manager
-    self.t_restart = 0
+    self.t_restart = None
+    # last Ready call during the cooldown, its answer holds until `ready_interval` has passed
+    self.t_ready_checked = None
+    # shared memory buffers for the local server, unlinked at exit
+    self.shm_pool = SharedImagePool()
+    atexit.register(self.shm_pool.close)
+    # one channel for each server and port, shared by all calls
+    self.channels = ChannelPool('model_client', options=self._channel_options())
+    atexit.register(self.channels.close)
     self.logger.info(f'Restart cooldown of model server: {self.config["grpc"]["restart_cooldown"]}s')
     self.docker_manager.run_if_not_yet(cooldown=0, **self.config['docker'])
+    # health of the servers kept by background probes, `None` to walk `ip_pool` in order
+    self.router = get_router(self.config, self.logger, probe=self._probe)
+    if self.router is not None:
+      self.router.start()
+      atexit.register(self.router.stop)
+
+  def _channel_options(self):
+    """Message sizes, keepalive and reconnect backoff of the channels to the servers"""
+    options = channel_options(self.config['grpc'].get('channel', {}))
+    max_msg_len = self.config['grpc'].get('max_msg_len', None)
+    if max_msg_len is not None:
+      options += [
+        ('grpc.max_send_message_length', int(max_msg_len * 1024 * 1024)),
+        ('grpc.max_receive_message_length', int(max_msg_len * 1024 * 1024)),
+      ]
+    return options
 
   def _check_infer(self, stub, sess_id):
     """Test model inference to check NSC2 status
@@ -34,24 +68,125 @@ class ModelServerClient:
         res_json = {"Result": "NG"}
     return res_json
 
-  def _make_dense_req(self, sess_id, img, key, num_only):
+  def _check_health(self, ip, stub, sess_id):
+    """Cached health verdict of a server, falls back to `_check_infer`
+
+    The verdict comes from the health port of the server, it is OK only if
+    the last background check passed within `grpc.health.max_age` seconds.
+    Servers without a health port or without a verdict yet run the check model.
+    """
+    health_config = self.config['grpc'].get('health', {})
+    if health_config.get('port', None) is None:
+      return self._check_infer(stub, sess_id)
+    timeout = self.config['grpc']['timeout']['check']
+    try:
+      health_stub = self.channels.stub(f'{ip}:{health_config["port"]}', model_serving_pb2_grpc.ModelServerStub)
+      res = health_stub.Health(model_serving_pb2.HealthRequest(sess_id=sess_id), timeout=timeout)
+    except grpc.RpcError as e:
+      self.logger.warning(f'Health unavailable @ {ip}, run infer check: {e.code()}')
+      return self._check_infer(stub, sess_id)
+    if res.age < 0:
+      return self._check_infer(stub, sess_id)
+    if res.status != 'OK' or res.age > health_config.get('max_age', 30):
+      self.logger.warning(f'Health @ {ip}: {res.status} {res.age:.1f}s ago')
+      return {"Result": "NG"}
+    return {"Result": "OK"}
+
+  def _probe(self, ip):
+    """Health of a server for the router, `None` while the local server restarts
+
+    Probes open and close breakers. The local server is restarted by the
+    failure of a call, or of the probe of its half-open breaker, since no
+    call reaches a server whose breaker is open.
+    """
+    if ip == self.ip_pool[0] and self.in_cooldown(): return None
+    half_open = self.router.state[ip] == HALF_OPEN
+    stub = self.channels.stub(f'{ip}:{self.config["grpc"]["port"]}', model_serving_pb2_grpc.ModelServerStub)
+    ok = self._check_health(ip, stub, 'probe').get('Result', 'NG') == 'OK'
+    if not ok and half_open: self.restart_if_local(ip)
+    return ok
+
+  def _route(self, network):
+    """Servers to try in turn, the best healthy ones first with `grpc.routing`, `ip_pool` in order otherwise"""
+    if self.router is None: return list(self.ip_pool)
+    return self.router.route(network)
+
+  def _begin(self, ip):
+    """Whether to call a server now, false for a half-open server whose trial call is running"""
+    return self.router is None or self.router.begin(ip)
+
+  def _record(self, ip, network, elapsed=None, ok=True):
+    """Result of a call for the router, a call without a verdict, e.g. an overload, has `ok` set to `None`"""
+    if self.router is None: return
+    if ok is None: self.router.cancel(ip)
+    else: self.router.record(ip, network, elapsed, ok)
+
+  def _needs_check(self, ip, check_local):
+    """Whether to check a server before a call, with routing the probes check servers in the background"""
+    if self.router is not None: return False
+    return ip != self.ip_pool[0] or check_local
+
+  def _encoding(self, ip):
+    """Image encoding for a server, raw for the local one and compressed for remote ones by default"""
+    encoding_config = self.config['grpc'].get('encoding', {})
+    if ip == self.ip_pool[0]:
+      return encoding_config.get('local', 'raw')
+    return encoding_config.get('remote', 'raw')
+
+  def _make_img_pb(self, img, encoding='raw'):
+    """Encode an image into an `Image` message, logs its size and encoding time"""
+    t0 = time.perf_counter()
+    data = encode_img(img, encoding, quality=self.config['grpc'].get('encoding', {}).get('quality', 90))
+    self.logger.debug(f'Encoded {img.shape[1]}x{img.shape[0]} image as {encoding}: {len(data) / 1024:.1f}KB '
+                      f'in {(time.perf_counter() - t0) * 1000:.1f}ms')
+    img_pb = model_serving_pb2.Image(data=data, h=img.shape[0], w=img.shape[1], c=img.shape[2], encoding=encoding)
+    return img_pb
+
+  def _make_dense_req(self, sess_id, img, key, num_only, encoding='raw'):
     """Prepare a gRPC request for text recognition
     """
-    img_pb = model_serving_pb2.Image(data=img.tobytes(), h=img.shape[0], w=img.shape[1], c=img.shape[2])
+    img_pb = self._make_img_pb(img, encoding)
     if key is None: key = get_dense_key(img)
-    req = model_serving_pb2.DenseRequest(sess_id=sess_id, img=img_pb, key=key, num_only=num_only)
+    req = model_serving_pb2.DenseRequest(sess_id=sess_id, img=img_pb, key=key, num_only=num_only, ragged=True)
     return req
 
+  def _rpc_err(self, e):
+    """Error of a failed RPC, rejections of an overloaded server are told apart to fail over without a restart"""
+    if e.code() == grpc.StatusCode.RESOURCE_EXHAUSTED:
+      self.logger.warning(e.details())
+      return self.err['overload_err']
+    return self.err['ocr_err']
+
+  def _is_overload(self, res_json):
+    return res_json.get('ErrCode', None) == self.err['overload_err']['ErrCode']
+
   def _sleep_if_necessary(self, infer_idx, trials):
     """Sleep when server is inactive and one more trial is allowed"""
     if infer_idx < trials - 1:
       self.logger.warning(f'Inactive inference server, retry after {self.config["grpc"]["infer_cooldown"]}s')
       time.sleep(self.config['grpc']['infer_cooldown'])
 
-  def _dense_infer(self, stub, sess_id, img, key, num_only, trials):
+  @contextmanager
+  def _path_req_options(self, img, use_shm):
+    """Path and shape options of a path request, `None` to send the image in the request
+
+    Images given as `str` are file paths. Arrays are passed through a shared
+    memory buffer when `use_shm` is set, the buffer is borrowed from the pool
+    until the `with` block exits and is reused by later requests after that.
+    """
+    if isinstance(img, str):
+      yield {"path": img}
+    elif not use_shm:
+      yield None
+    else:
+      with self.shm_pool.borrow() as shm:
+        yield {"path": shm.put(img), "h": img.shape[0], "w": img.shape[1], "c": img.shape[2]}
+
+  def _dense_infer(self, stub, sess_id, img, key, num_only, trials, use_shm=False, encoding='raw'):
     """Text recognition inference RPC
     """
     timeout = self.config['grpc']['timeout']['dense']
+    if key is None and not isinstance(img, str): key = get_dense_key(img)
     req_options = {
       "sess_id": sess_id,
       "key": key,
@@ -59,27 +194,29 @@ class ModelServerClient:
     }
     for infer_idx in range(trials):
       try:
-        if isinstance(img, str):
-          req = model_serving_pb2.DensePathRequest(path=img, **req_options)
-          res = stub.DensePathInferSync(req, timeout=timeout)
-        else:
-          req = self._make_dense_req(img=img, **req_options)
-          res = stub.DenseInferSync(req, timeout=timeout)
+        with self._path_req_options(img, use_shm) as path_options:
+          if path_options is not None:
+            req = model_serving_pb2.DensePathRequest(**path_options, **req_options)
+            res = stub.DenseInferPathSync(req, timeout=timeout)
+          else:
+            req = self._make_dense_req(img=img, encoding=encoding, **req_options)
+            res = stub.DenseInferSync(req, timeout=timeout)
         code = np.frombuffer(res.code, np.float32).copy()
         code = code.astype(np.int64)
         prob = np.frombuffer(res.prob, np.float32).copy()
         pos = np.frombuffer(res.position, np.float32).copy()
         res_json = {'code': code, 'prob': prob, 'position': pos}
       except grpc._channel._InactiveRpcError as e:
-        res_json = self.err['ocr_err']
+        res_json = self._rpc_err(e)
+        if self._is_overload(res_json): break
         self._sleep_if_necessary(infer_idx, trials)
     return res_json
 
-  def _dense_req_iterator(self, sess_id, imgs, keys, num_onlys):
+  def _dense_req_iterator(self, sess_id, imgs, keys, num_onlys, encoding='raw'):
     """Make a text recognition request generator for stream"""
     def req_gen():
       for i, img in enumerate(imgs):
-        yield self._make_dense_req(sess_id, img, keys[i], num_onlys[i])
+        yield self._make_dense_req(sess_id, img, keys[i], num_onlys[i], encoding)
     iterator = req_gen()
     return iterator
 
@@ -88,7 +225,43 @@ class ModelServerClient:
     results_clean = [r[r!=-1] for r in results.reshape((n, -1))]
     return results_clean
 
-  def _dense_batch_infer(self, stub, sess_id, imgs, keys, num_onlys, trials=1):
+  def _parse_compact(self, res):
+    """Codes, probs and positions of a ragged DenseBatchResponse or a DenseChipResponse"""
+    code_dtype = {2: np.int16, 4: np.int32}[res.code_size]
+    codes = np.frombuffer(res.codes, code_dtype).astype(np.int64)
+    probs = np.frombuffer(res.probs, np.float16).astype(np.float32)
+    positions = np.frombuffer(res.positions, np.uint16).astype(np.float32)
+    return codes, probs, positions
+
+  def _parse_ragged_res(self, res):
+    """Split a ragged DenseBatchResponse into per-chip views"""
+    offsets = np.frombuffer(res.offsets, np.uint32)
+    codes, probs, positions = self._parse_compact(res)
+    splits = offsets[1:-1]
+    res_json = {
+      'codes': np.split(codes, splits),
+      'probs': np.split(probs, splits),
+      'positions': np.split(positions, splits),
+    }
+    return res_json
+
+  def _parse_dense_batch_res(self, res, n):
+    """Unpack a DenseBatchResponse into per-chip arrays"""
+    if n == 0:
+      return {'codes': [], 'probs': [], 'positions': []}
+    if res.ragged:
+      return self._parse_ragged_res(res)
+    codes = np.frombuffer(res.codes, np.float32).copy()
+    codes = self._clean_dense_res(codes, n=n)
+    codes = [c.astype(np.int64) for c in codes]
+    probs = np.frombuffer(res.probs, np.float32).copy()
+    probs = self._clean_dense_res(probs, n=n)
+    positions = np.frombuffer(res.positions, np.float32).copy()
+    positions = self._clean_dense_res(positions, n=n)
+    res_json = {'codes': codes, 'probs': probs, 'positions': positions}
+    return res_json
+
+  def _dense_batch_infer(self, stub, sess_id, imgs, keys, num_onlys, trials=1, encoding='raw'):
     """Text recognition batch inference RPC
 
     This ONLY helps with the inference speed when NCS2 is used.
@@ -99,21 +272,31 @@ class ModelServerClient:
     timeout = self.config['grpc']['timeout']['dense_batch']
     for infer_idx in range(trials):
       try:
-        res = stub.DenseBatchInferSync(self._dense_req_iterator(sess_id, imgs, keys, num_onlys))
-        codes = np.frombuffer(res.codes, np.float32).copy()
-        codes = self._clean_dense_res(codes, n=len(imgs))
-        codes = [c.astype(np.int64) for c in codes]
-        probs = np.frombuffer(res.probs, np.float32).copy()
-        probs = self._clean_dense_res(probs, n=len(imgs))
-        positions = np.frombuffer(res.positions, np.float32).copy()
-        positions = self._clean_dense_res(positions, n=len(imgs))
-        res_json = {'codes': codes, 'probs': probs, 'positions': positions}
+        res = stub.DenseBatchInferSync(self._dense_req_iterator(sess_id, imgs, keys, num_onlys, encoding),
+                                       timeout=timeout)
+        res_json = self._parse_dense_batch_res(res, n=len(imgs))
       except grpc._channel._InactiveRpcError as e:
-        res_json = self.err['ocr_err']
+        res_json = self._rpc_err(e)
+        if self._is_overload(res_json): break
         self._sleep_if_necessary(infer_idx, trials)
     return res_json
 
-  def _det_infer(self, stub, sess_id, img, layout, suppress_lines, trials):
+  def _dense_stream_infer(self, stub, sess_id, imgs, num_onlys, indices, encoding='raw'):
+    """Text recognition streaming RPC, yields `(index, result)` of each chip as soon as it is recognized
+
+    Only chips at `indices` are sent, with their index as id.
+    """
+    timeout = self.config['grpc']['timeout'].get('dense_stream', self.config['grpc']['timeout']['dense_batch'])
+    def req_gen():
+      for idx in indices:
+        img = imgs[idx]
+        yield model_serving_pb2.DenseChipRequest(sess_id=sess_id, id=idx, img=self._make_img_pb(img, encoding),
+                                                 key=get_dense_key(img), num_only=bool(num_onlys[idx]))
+    for res in stub.DenseStreamInfer(req_gen(), timeout=timeout):
+      code, prob, position = self._parse_compact(res)
+      yield res.id, {'code': code, 'prob': prob, 'position': position}
+
+  def _det_infer(self, stub, sess_id, img, layout, suppress_lines, trials, use_shm=False, encoding='raw'):
     """Text detection inference RPC
 
     Ars:
@@ -122,6 +305,7 @@ class ModelServerClient:
         with the output of `get_layout`
     """
     timeout = self.config['grpc']['timeout']['det']
+    if layout is None and not isinstance(img, str): layout = get_layout(img)
     req_options = {
       "sess_id": sess_id,
       "layout": layout,
@@ -129,37 +313,92 @@ class ModelServerClient:
     }
     for infer_idx in range(trials):
       try:
-        if isinstance(img, str):
-          req = model_serving_pb2.DetPathRequest(path=img, **req_options)
-          res = stub.DetPathInferSync(req, timeout=timeout)
-        else:
-          img_pb = model_serving_pb2.Image(data=img.tobytes(),
-                                           h=img.shape[0], w=img.shape[1], c=img.shape[2])
-          if layout is None: layout = get_layout(img)
-          req = model_serving_pb2.DetRequest(img=img_pb, **req_options)
-          res = stub.DetInferSync(req, timeout=timeout)
+        with self._path_req_options(img, use_shm) as path_options:
+          if path_options is not None:
+            req = model_serving_pb2.DetPathRequest(**path_options, **req_options)
+            res = stub.DetInferPathSync(req, timeout=timeout)
+          else:
+            img_pb = self._make_img_pb(img, encoding)
+            req = model_serving_pb2.DetRequest(img=img_pb, **req_options)
+            res = stub.DetInferSync(req, timeout=timeout)
         lines = np.frombuffer(res.lines, np.float32).copy()
         lines = lines.reshape((-1, 8))
         res_json = {'lines': lines.copy(), 'angle': res.angle}
       except grpc._channel._InactiveRpcError as e:
-        res_json = self.err['ocr_err']
+        res_json = self._rpc_err(e)
+        if self._is_overload(res_json): break
         if infer_idx < trials - 1:
           self.logger.warning(f'Inactive inference server,'
                               f'retry after {self.config["grpc"]["infer_cooldown"]}s')
           time.sleep(self.config['grpc']['infer_cooldown'])
     return res_json
 
+  def _page_infer(self, stub, sess_id, img, layout, min_wh_ratio, num_only, trials, encoding='raw'):
+    """Fused page reading RPC
+
+    Runs text detection, box filtering and merging, deskewing, cropping and
+    text recognition on the server, so that chips never travel over gRPC.
+    """
+    timeout = self.config['grpc']['timeout']['page']
+    img_pb = self._make_img_pb(img, encoding)
+    if layout is None: layout = get_layout(img)
+    req = model_serving_pb2.PageRequest(sess_id=sess_id, img=img_pb, layout=layout, min_wh_ratio=min_wh_ratio,
+                                        num_only=bool(num_only), ragged=True)
+    for infer_idx in range(trials):
+      try:
+        res = stub.ReadPage(req, timeout=timeout)
+        boxes = np.frombuffer(res.boxes, np.float32).copy().reshape((-1, 4))
+        res_json = {'n_lines': res.n_lines, 'boxes': boxes, 'angle': res.angle}
+        res_json.update(self._parse_dense_batch_res(res.texts, n=res.texts.n))
+      except grpc._channel._InactiveRpcError as e:
+        res_json = self._rpc_err(e)
+        if self._is_overload(res_json): break
+        self._sleep_if_necessary(infer_idx, trials)
+    return res_json
+
+  def _local_ready(self):
+    """Whether the local model server reports that it finished warming up"""
+    ip, port = self.ip_pool[0], self.config['grpc']['port']
+    timeout = self.config['grpc']['timeout'].get('ready', 0.5)
+    try:
+      stub = self.channels.stub(f'{ip}:{port}', model_serving_pb2_grpc.ModelServerStub)
+      res = stub.Ready(model_serving_pb2.ReadyRequest(sess_id='ready'), timeout=timeout)
+    except grpc.RpcError:
+      # not listening yet, or a server without `Ready` which is left to the cooldown
+      return False
+    if res.ready:
+      warm_up = ', '.join(f'{m.name} {m.first_ms:.0f}/{m.warm_ms:.0f}ms' for m in res.models)
+      self.logger.info(f'Local model_server ready {time.time() - self.t_restart:.1f}s after restart ({warm_up})')
+    return res.ready
+
   def in_cooldown(self):
-    """Check if the model server is in cooldown (initialization phase)"""
-    if time.time() - self.t_restart < self.config['grpc']['restart_cooldown']:
+    """Check if the model server is in cooldown (initialization phase)
+
+    The cooldown ends when the local server reports it is ready, or after
+    `restart_cooldown` seconds at the latest. The server is asked at most
+    once every `ready_interval` seconds, calls in between stay in cooldown.
+    """
+    if self.t_restart is None:
+      return False
+    now = time.time()
+    if now - self.t_restart >= self.config['grpc']['restart_cooldown']:
+      self.t_restart = None
+      return False
+    if self.t_ready_checked is not None and now - self.t_ready_checked < self.config['grpc'].get('ready_interval', 1):
       return True
-    return False
+    self.t_ready_checked = now
+    if self._local_ready():
+      self.t_restart = None
+      return False
+    return True
 
   def restart(self):
     """Restart model_server docker container"""
     self.docker_manager.stop(self.config['docker']['image'])
     self.docker_manager.run_if_not_yet(cooldown=0, **self.config['docker'])
     self.t_restart = time.time()
+    self.t_ready_checked = None
+    RESTARTS.labels().inc()
 
 
   def restart_if_local(self, ip):
@@ -172,62 +411,76 @@ class ModelServerClient:
       self.logger.info('Just restarted local model_server, ignored restart signal.')
 
   def infer_sync(self, sess_id, network, img, key=None, num_only=None, layout=None, suppress_lines=None,
-                 check_local=True):
+                 check_local=True, min_wh_ratio=0.5):
     """Run inference of text detection or recognition
+
+    `network='Page'` runs detection and recognition of a whole page in one RPC,
+    `min_wh_ratio` is only used by it.
     """
-    # gRPC options
     port = self.config['grpc']['port']
-    options = None
-    max_msg_len = self.config['grpc'].get('max_msg_len', None)
-    if max_msg_len is not None:
-      options = [
-        ('grpc.max_send_message_length', int(max_msg_len * 1024 * 1024)),
-        ('grpc.max_receive_message_length', int(max_msg_len * 1024 * 1024)),
-      ]
 
-    for ip in self.ip_pool:
+    # the answer when no server is called, e.g. all breakers are open
+    res_json = {'Result': 'NG'} if network == 'Check' else self.err['ocr_err']
+    ips = self._route(network)
+    for idx, ip in enumerate(ips):
+      # only a failure on the previous server gets here
+      if idx > 0: FAILOVERS.labels(ips[idx - 1]).inc()
       # Do nothing and return an error when model_server is cooling down
       if self.in_cooldown() and ip == self.ip_pool[0]:
         self.logger.info("Just restarted local model_server, skip inference on it")
-        if network == 'Check': res_json = {'Result': 'NG'}
-        else: res_json = self.err['ocr_err']
         continue
+      if not self._begin(ip): continue
 
-      with grpc.insecure_channel(f'{ip}:{port}', options=options) as channel:
-        self.logger.info(f'{network} Infer at {ip}:{port}')
-        stub = model_serving_pb2_grpc.ModelServerStub(channel)
-        if network == 'Check':
-          # inference check
-          res_json = self._check_infer(stub, sess_id)
-        else:
-          if (ip != self.ip_pool[0] or check_local):
-            # run inference check if configured so or not using local server
-            test_json = self._check_infer(stub, sess_id)
-            if test_json.get('Result', 'NG') == 'NG':
-              self.logger.error(f'Infer check failed @ {ip}')
-              res_json = self.err['ocr_err']
-              self.restart_if_local(ip)
-              continue
-          if network == 'Dense':
-            # text recognition
-            res_json = self._dense_infer(stub, sess_id, img, key, num_only, trials=1)
-          elif network == 'Det':
-            # text detection
-            res_json = self._det_infer(stub, sess_id, img, layout, suppress_lines, trials=self.config['grpc']['infer_trials'])
-          else:
-            res_json = {
-              "ErrCode": "E000",
-              "ErrMsg": f"{network} is not implemented in model_serving."
-            }
-            return res_json
-        if 'ErrCode' in res_json or res_json == {"Result": "NG"}:
-          # restart model_server if any inference failed
-          self.logger.error(f'{res_json.get("ErrMsg", "Infer check failed")} @ {ip}')
-          self.restart_if_local(ip)
-          if 'Result' in res_json:
+      t0 = time.perf_counter()
+      self.logger.info(f'{network} Infer at {ip}:{port}')
+      stub = self.channels.stub(f'{ip}:{port}', model_serving_pb2_grpc.ModelServerStub)
+      if network == 'Check':
+        # inference check
+        res_json = self._check_infer(stub, sess_id)
+      else:
+        if self._needs_check(ip, check_local):
+          # run inference check if configured so or not using local server
+          test_json = self._check_health(ip, stub, sess_id)
+          if test_json.get('Result', 'NG') == 'NG':
+            self.logger.error(f'Infer check failed @ {ip}')
             res_json = self.err['ocr_err']
+            self.restart_if_local(ip)
+            continue
+        # images go through shared memory only to the local server
+        use_shm = ip == self.ip_pool[0] and self.config['grpc'].get('shared_memory', False)
+        if network == 'Dense':
+          # text recognition
+          res_json = self._dense_infer(stub, sess_id, img, key, num_only, trials=1, use_shm=use_shm,
+                                       encoding=self._encoding(ip))
+        elif network == 'Det':
+          # text detection
+          res_json = self._det_infer(stub, sess_id, img, layout, suppress_lines, trials=self.config['grpc']['infer_trials'],
+                                     use_shm=use_shm, encoding=self._encoding(ip))
+        elif network == 'Page':
+          # text detection and recognition
+          res_json = self._page_infer(stub, sess_id, img, layout, min_wh_ratio, num_only,
+                                      trials=self.config['grpc']['infer_trials'], encoding=self._encoding(ip))
         else:
+          res_json = {
+            "ErrCode": "E000",
+            "ErrMsg": f"{network} is not implemented in model_serving."
+          }
+          self._record(ip, network, ok=None)
           return res_json
+      if self._is_overload(res_json):
+        # busy, not broken
+        OVERLOADS.labels(ip).inc()
+        self._record(ip, network, ok=None)
+      elif 'ErrCode' in res_json or res_json == {"Result": "NG"}:
+        # restart model_server if any inference failed
+        self.logger.error(f'{res_json.get("ErrMsg", "Infer check failed")} @ {ip}')
+        self._record(ip, network, ok=False)
+        self.restart_if_local(ip)
+        if 'Result' in res_json:
+          res_json = self.err['ocr_err']
+      else:
+        self._record(ip, network, time.perf_counter() - t0)
+        return res_json
     return res_json
 
   def infer_batch_sync(self, sess_id, network, imgs, num_onlys=None, check_local=True):
@@ -243,36 +496,98 @@ class ModelServerClient:
     # broadcast num_only option
     if not isinstance(num_onlys, list): num_onlys = [num_onlys] * len(imgs)
 
-    # gRPC config
     port = self.config['grpc']['port']
-    options = None
-    max_msg_len = self.config['grpc'].get('max_msg_len', None)
-    if max_msg_len is not None:
-      options = [
-        ('grpc.max_send_message_length', int(max_msg_len * 1024 * 1024)),
-        ('grpc.max_receive_message_length', int(max_msg_len * 1024 * 1024)),
-      ]
 
-    for ip in self.ip_pool:
+    res_json = self.err['ocr_err']
+    ips = self._route('DenseBatch')
+    for idx, ip in enumerate(ips):
+      if idx > 0: FAILOVERS.labels(ips[idx - 1]).inc()
       # do nothing if model_server is cooling down
       if self.in_cooldown() and ip == self.ip_pool[0]:
         self.logger.info("Just restarted local model_server, skip inference on it")
-        res_json = self.err['ocr_err']
         continue
-      with grpc.insecure_channel(f'{ip}:{port}', options=options) as channel:
-        self.logger.info(f'{network} Batch Infer at {ip}:{port}')
-        stub = model_serving_pb2_grpc.ModelServerStub(channel)
-        if (ip != self.ip_pool[0] or check_local):
-          test_json = self._check_infer(stub, sess_id)
-          if test_json.get('Result', 'NG') == 'NG':
-            self.logger.error(f'Infer check failed @ {ip}')
-            res_json = self.err['ocr_err']
-            self.restart_if_local(ip)
-            continue
-        res_json = self._dense_batch_infer(stub, sess_id, imgs, [None]*len(imgs), num_onlys)
-      if 'ErrCode' in res_json:
+      if not self._begin(ip): continue
+      t0 = time.perf_counter()
+      self.logger.info(f'{network} Batch Infer at {ip}:{port}')
+      stub = self.channels.stub(f'{ip}:{port}', model_serving_pb2_grpc.ModelServerStub)
+      if self._needs_check(ip, check_local):
+        test_json = self._check_health(ip, stub, sess_id)
+        if test_json.get('Result', 'NG') == 'NG':
+          self.logger.error(f'Infer check failed @ {ip}')
+          res_json = self.err['ocr_err']
+          self.restart_if_local(ip)
+          continue
+      res_json = self._dense_batch_infer(stub, sess_id, imgs, [None]*len(imgs), num_onlys,
+                                         encoding=self._encoding(ip))
+      if self._is_overload(res_json):
+        OVERLOADS.labels(ip).inc()
+        self._record(ip, 'DenseBatch', ok=None)
+      elif 'ErrCode' in res_json:
         self.logger.error(f'{res_json.get("ErrMsg", "Batch infer failed")} @ {ip}')
+        self._record(ip, 'DenseBatch', ok=False)
         self.restart_if_local(ip)
       else:
+        self._record(ip, 'DenseBatch', time.perf_counter() - t0)
         return res_json
     return res_json
+
+  def infer_stream_sync(self, sess_id, network, imgs, num_onlys=None, check_local=True):
+    """Run text recognition of chips, yields `(index, result)` of each chip as soon as it is recognized
+
+    Chips without a result when a server fails are sent to the next one. If all
+    servers fail, the last item is `(None, error)`.
+    """
+    if network != 'Dense':
+      # only text recognition supports streaming inference
+      yield None, {
+        "ErrCode": "E000",
+        "ErrMsg": f"{network} is not implemented for stream inference."
+      }
+      return
+
+    # broadcast num_only option
+    if not isinstance(num_onlys, list): num_onlys = [num_onlys] * len(imgs)
+
+    port = self.config['grpc']['port']
+
+    pending = set(range(len(imgs)))
+    res_json = self.err['ocr_err']
+    ips = self._route('DenseStream')
+    for idx, ip in enumerate(ips):
+      if idx > 0: FAILOVERS.labels(ips[idx - 1]).inc()
+      # do nothing if model_server is cooling down
+      if self.in_cooldown() and ip == self.ip_pool[0]:
+        self.logger.info("Just restarted local model_server, skip inference on it")
+        continue
+      if not self._begin(ip): continue
+      t0 = time.perf_counter()
+      self.logger.info(f'{network} Stream Infer of {len(pending)} chips at {ip}:{port}')
+      stub = self.channels.stub(f'{ip}:{port}', model_serving_pb2_grpc.ModelServerStub)
+      if self._needs_check(ip, check_local):
+        test_json = self._check_health(ip, stub, sess_id)
+        if test_json.get('Result', 'NG') == 'NG':
+          self.logger.error(f'Infer check failed @ {ip}')
+          self.restart_if_local(ip)
+          continue
+      try:
+        for chip_idx, chip_json in self._dense_stream_infer(stub, sess_id, imgs, num_onlys, sorted(pending),
+                                                            encoding=self._encoding(ip)):
+          pending.discard(chip_idx)
+          yield chip_idx, chip_json
+      except GeneratorExit:
+        # the caller stopped reading, no verdict on the server
+        self._record(ip, 'DenseStream', ok=None)
+        raise
+      except grpc.RpcError as e:
+        res_json = self._rpc_err(e)
+        if self._is_overload(res_json):
+          OVERLOADS.labels(ip).inc()
+          self._record(ip, 'DenseStream', ok=None)
+        else:
+          self.logger.error(f'Stream infer failed with {e.code()}, {len(pending)} chips left @ {ip}')
+          self._record(ip, 'DenseStream', ok=False)
+          self.restart_if_local(ip)
+        continue
+      self._record(ip, 'DenseStream', time.perf_counter() - t0)
+      if not pending: return
+    yield None, res_json
@@ -0,0 +1,112 @@
+"""Background health checks of the model server
+
+The deep check runs the check model on a schedule in its own thread, and the
+`Health` RPC only returns the cached verdict. Health is also served on a
+separate port with its own executor, so that probes never wait behind
+inference on the main port.
+"""
+from concurrent import futures
+import threading
+import time
+import grpc
+
+from . import model_serving_pb2
+from . import model_serving_pb2_grpc
+from .channels import server_keepalive_options
+
+
+class HealthProber:
+  """Runs a check on a background schedule and caches its verdict
+
+  Args:
+    check: A callable returning 'OK' or 'NG'
+    interval: Seconds between the end of a check and the start of the next one
+    logger: A logging.Logger
+  """
+  def __init__(self, check, interval, logger):
+    self.check = check
+    self.interval = interval
+    self.logger = logger
+    self.status = 'UNKNOWN'
+    self.t_checked = None
+    self.lock = threading.Lock()
+    self.stopped = threading.Event()
+    self.thread = None
+
+  def start(self):
+    self.thread = threading.Thread(target=self._loop, name='health-prober', daemon=True)
+    self.thread.start()
+
+  def stop(self):
+    self.stopped.set()
+
+  def update(self, status):
+    """Records the verdict of a check, also used by on-demand checks"""
+    with self.lock:
+      self.status = status
+      self.t_checked = time.monotonic()
+
+  def verdict(self):
+    """Returns the cached status and its age in seconds, -1 before the first check"""
+    with self.lock:
+      if self.t_checked is None:
+        return self.status, -1.
+      return self.status, time.monotonic() - self.t_checked
+
+  def _loop(self):
+    while not self.stopped.is_set():
+      try:
+        status = self.check()
+      except Exception as e:
+        self.logger.error(f'Health check failed: {e}')
+        status = 'NG'
+      self.update(status)
+      self.stopped.wait(self.interval)
+
+
+def health_response(health, request):
+  status, age = health.verdict()
+  return model_serving_pb2.HealthResponse(sess_id=request.sess_id, status=status, age=age)
+
+
+class HealthServicer(model_serving_pb2_grpc.ModelServerServicer):
+  """Serves only `Health`, other RPCs are left unimplemented"""
+  def __init__(self, health):
+    super().__init__()
+    self.health = health
+
+  def Health(self, request, context):
+    return health_response(self.health, request)
+
+
+class AsyncHealthServicer(HealthServicer):
+  async def Health(self, request, context):
+    return health_response(self.health, request)
+
+
+def health_port(config):
+  return config['grpc'].get('health', {}).get('port', None)
+
+
+def start_health_server(config, health):
+  """Starts a server for `Health` on its own port and thread pool, `None` if no port is configured"""
+  port = health_port(config)
+  if port is None: return None
+  max_workers = config['grpc']['health'].get('max_workers', 2)
+  server = grpc.server(futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='health'),
+                       options=server_keepalive_options(config['grpc'].get('channel', {})))
+  model_serving_pb2_grpc.add_ModelServerServicer_to_server(HealthServicer(health), server)
+  server.add_insecure_port(f"{config['grpc'].get('ip', '127.0.0.1')}:{port}")
+  server.start()
+  return server
+
+
+async def start_health_server_aio(config, health):
+  """Same as `start_health_server` for `grpc.aio`, sharing the running event loop"""
+  port = health_port(config)
+  if port is None: return None
+  server = grpc.aio.server(options=server_keepalive_options(config['grpc'].get('channel', {})))
+  model_serving_pb2_grpc.add_ModelServerServicer_to_server(AsyncHealthServicer(health), server)
+  server.add_insecure_port(f"{config['grpc'].get('ip', '127.0.0.1')}:{port}")
+  await server.start()
+  return server
@@ -0,0 +1,354 @@
+"""Prometheus-style metrics served over HTTP in the text exposition format
+
+Metrics live in memory in a `Registry` and are rendered on each scrape of
+`/metrics` on the port given to `start_metrics_server`. An update is a dict
+lookup and a locked addition, a few microseconds per RPC (measured by
+`python -m benchmarks.metrics_overhead`), so metrics can stay on in production.
+"""
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import math
+import threading
+import time
+import grpc
+
+
+# latency buckets in seconds, from a cached health check to a full page
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1., 2.5, 5., 10., 20.)
+
+
+def _format_value(value):
+  if math.isinf(value): return '+Inf' if value > 0 else '-Inf'
+  return repr(float(value))
+
+
+def _format_labels(names, values):
+  if not names: return ''
+  pairs = ','.join(f'{n}="{str(v)}"' for n, v in zip(names, values))
+  return '{' + pairs + '}'
+
+
+class _Value:
+  """A counter or gauge value of one label set"""
+  def __init__(self):
+    self.value = 0.
+    self.fn = None
+    self.lock = threading.Lock()
+
+  def inc(self, amount=1.):
+    with self.lock:
+      self.value += amount
+
+  def dec(self, amount=1.):
+    with self.lock:
+      self.value -= amount
+
+  def set(self, value):
+    with self.lock:
+      self.value = float(value)
+
+  def set_function(self, fn):
+    """Reads the value from `fn` on every scrape instead"""
+    self.fn = fn
+
+  def get(self):
+    if self.fn is not None:
+      return float(self.fn())
+    return self.value
+
+
+class _HistogramValue:
+  """Bucket counts, sum and count of one label set"""
+  def __init__(self, buckets):
+    self.buckets = buckets
+    self.counts = [0] * (len(buckets) + 1)
+    self.sum = 0.
+    self.lock = threading.Lock()
+
+  def observe(self, value):
+    idx = bisect_left(self.buckets, value)
+    with self.lock:
+      self.counts[idx] += 1
+      self.sum += value
+
+  @contextmanager
+  def time(self):
+    t0 = time.perf_counter()
+    try:
+      yield
+    finally:
+      self.observe(time.perf_counter() - t0)
+
+
+class _Metric:
+  """A metric family, one value for each combination of label values"""
+  type = None
+
+  def __init__(self, name, doc, labelnames=()):
+    self.name = name
+    self.doc = doc
+    self.labelnames = tuple(labelnames)
+    self.values = {}
+    self.lock = threading.Lock()
+
+  def _new_value(self):
+    return _Value()
+
+  def labels(self, *values):
+    """The value of a label set, created on first use"""
+    value = self.values.get(values)
+    if value is None:
+      with self.lock:
+        value = self.values.setdefault(values, self._new_value())
+    return value
+
+  def _samples(self):
+    for values, value in list(self.values.items()):
+      yield self.name, self.labelnames, values, value.get()
+
+  def expose(self):
+    lines = [f'# HELP {self.name} {self.doc}', f'# TYPE {self.name} {self.type}']
+    for name, names, values, value in self._samples():
+      lines.append(f'{name}{_format_labels(names, values)} {_format_value(value)}')
+    return '\n'.join(lines)
+
+
+class Counter(_Metric):
+  type = 'counter'
+
+
+class Gauge(_Metric):
+  type = 'gauge'
+
+
+class Histogram(_Metric):
+  type = 'histogram'
+
+  def __init__(self, name, doc, labelnames=(), buckets=LATENCY_BUCKETS):
+    super().__init__(name, doc, labelnames)
+    self.buckets = tuple(sorted(buckets))
+
+  def _new_value(self):
+    return _HistogramValue(self.buckets)
+
+  def _samples(self):
+    names = self.labelnames + ('le',)
+    for values, value in list(self.values.items()):
+      with value.lock:
+        counts, total = list(value.counts), value.sum
+      cumulative = 0
+      for bound, count in zip(self.buckets + (math.inf,), counts):
+        cumulative += count
+        yield f'{self.name}_bucket', names, values + (_format_value(bound),), cumulative
+      yield f'{self.name}_sum', self.labelnames, values, total
+      yield f'{self.name}_count', self.labelnames, values, cumulative
+
+
+class Registry:
+  """Metric families of a process
+
+  The same name always returns the same family, so that modules and servers
+  created more than once share their metrics.
+  """
+  def __init__(self):
+    self.metrics = {}
+    self.lock = threading.Lock()
+
+  def _get(self, cls, name, *args, **kwargs):
+    with self.lock:
+      metric = self.metrics.get(name)
+      if metric is None:
+        metric = self.metrics[name] = cls(name, *args, **kwargs)
+      elif not isinstance(metric, cls):
+        raise ValueError(f'Metric {name} is already registered as a {metric.type}')
+    return metric
+
+  def counter(self, name, doc, labelnames=()):
+    return self._get(Counter, name, doc, labelnames)
+
+  def gauge(self, name, doc, labelnames=()):
+    return self._get(Gauge, name, doc, labelnames)
+
+  def histogram(self, name, doc, labelnames=(), buckets=LATENCY_BUCKETS):
+    return self._get(Histogram, name, doc, labelnames, buckets=buckets)
+
+  def expose(self):
+    """All metrics in the text exposition format"""
+    with self.lock:
+      metrics = list(self.metrics.values())
+    return '\n'.join(m.expose() for m in metrics) + '\n'
+
+
+REGISTRY = Registry()
+
+
+class RpcMetrics:
+  """Latency, in-flight, error and byte metrics of the requests of a server
+
+  Args:
+    prefix: Prefix of the metric names, e.g. model_server
+    registry: The `Registry` to add the metrics to
+  """
+  def __init__(self, prefix, registry=REGISTRY):
+    self.latency = registry.histogram(f'{prefix}_request_duration_seconds', 'Time to handle a request', ['method'])
+    self.in_flight = registry.gauge(f'{prefix}_requests_in_flight', 'Requests being handled', ['method'])
+    self.errors = registry.counter(f'{prefix}_request_errors_total', 'Requests that failed', ['method'])
+    self.bytes_in = registry.counter(f'{prefix}_received_bytes_total', 'Bytes of requests', ['method'])
+    self.bytes_out = registry.counter(f'{prefix}_sent_bytes_total', 'Bytes of responses', ['method'])
+
+  @contextmanager
+  def track(self, method):
+    """Times a request and counts it in flight, counts an error if it raises"""
+    in_flight = self.in_flight.labels(method)
+    in_flight.inc()
+    t0 = time.perf_counter()
+    try:
+      yield
+    except BaseException:
+      self.errors.labels(method).inc()
+      raise
+    finally:
+      self.latency.labels(method).observe(time.perf_counter() - t0)
+      in_flight.dec()
+
+
+def cached_wrap(interceptor, full_method, handler):
+  """Wrapped `handler`, wrapped once for each method"""
+  cached = interceptor.handlers.get(full_method)
+  if cached is None or cached[0] is not handler:
+    cached = interceptor.handlers[full_method] = (handler, interceptor._wrap(full_method.rsplit('/', 1)[-1], handler))
+  return cached[1]
+
+
+class MetricsInterceptor(grpc.ServerInterceptor):
+  """Records `RpcMetrics` of unary and streaming RPCs of a `grpc.server`"""
+  def __init__(self, metrics):
+    self.metrics = metrics
+    # wrapped handlers by method, servers return the same handler for every call
+    self.handlers = {}
+
+  def _unary(self, method, behavior):
+    def wrapper(request, context):
+      self.metrics.bytes_in.labels(method).inc(request.ByteSize())
+      with self.metrics.track(method):
+        res = behavior(request, context)
+      self.metrics.bytes_out.labels(method).inc(res.ByteSize())
+      return res
+    return wrapper
+
+  def _stream_unary(self, method, behavior):
+    bytes_in = self.metrics.bytes_in.labels(method)
+    def counted(request_iterator):
+      for request in request_iterator:
+        bytes_in.inc(request.ByteSize())
+        yield request
+    def wrapper(request_iterator, context):
+      with self.metrics.track(method):
+        res = behavior(counted(request_iterator), context)
+      self.metrics.bytes_out.labels(method).inc(res.ByteSize())
+      return res
+    return wrapper
+
+  def _stream_stream(self, method, behavior):
+    bytes_in = self.metrics.bytes_in.labels(method)
+    bytes_out = self.metrics.bytes_out.labels(method)
+    def counted(request_iterator):
+      for request in request_iterator:
+        bytes_in.inc(request.ByteSize())
+        yield request
+    def wrapper(request_iterator, context):
+      with self.metrics.track(method):
+        for res in behavior(counted(request_iterator), context):
+          bytes_out.inc(res.ByteSize())
+          yield res
+    return wrapper
+
+  def _wrap(self, method, handler):
+    if handler.unary_unary is not None:
+      return handler._replace(unary_unary=self._unary(method, handler.unary_unary))
+    if handler.stream_unary is not None:
+      return handler._replace(stream_unary=self._stream_unary(method, handler.stream_unary))
+    if handler.stream_stream is not None:
+      return handler._replace(stream_stream=self._stream_stream(method, handler.stream_stream))
+    return handler
+
+  def intercept_service(self, continuation, handler_call_details):
+    handler = continuation(handler_call_details)
+    if handler is None: return None
+    return cached_wrap(self, handler_call_details.method, handler)
+
+
+class AsyncMetricsInterceptor(grpc.aio.ServerInterceptor):
+  """Same as `MetricsInterceptor` for `grpc.aio` servers"""
+  def __init__(self, metrics):
+    self.metrics = metrics
+    # wrapped handlers by method, servers return the same handler for every call
+    self.handlers = {}
+
+  def _unary(self, method, behavior):
+    async def wrapper(request, context):
+      self.metrics.bytes_in.labels(method).inc(request.ByteSize())
+      with self.metrics.track(method):
+        res = await behavior(request, context)
+      self.metrics.bytes_out.labels(method).inc(res.ByteSize())
+      return res
+    return wrapper
+
+  def _stream_unary(self, method, behavior):
+    bytes_in = self.metrics.bytes_in.labels(method)
+    async def counted(request_iterator):
+      async for request in request_iterator:
+        bytes_in.inc(request.ByteSize())
+        yield request
+    async def wrapper(request_iterator, context):
+      with self.metrics.track(method):
+        res = await behavior(counted(request_iterator), context)
+      self.metrics.bytes_out.labels(method).inc(res.ByteSize())
+      return res
+    return wrapper
+
+  def _stream_stream(self, method, behavior):
+    bytes_in = self.metrics.bytes_in.labels(method)
+    bytes_out = self.metrics.bytes_out.labels(method)
+    async def counted(request_iterator):
+      async for request in request_iterator:
+        bytes_in.inc(request.ByteSize())
+        yield request
+    async def wrapper(request_iterator, context):
+      with self.metrics.track(method):
+        async for res in behavior(counted(request_iterator), context):
+          bytes_out.inc(res.ByteSize())
+          yield res
+    return wrapper
+
+  _wrap = MetricsInterceptor._wrap
+
+  async def intercept_service(self, continuation, handler_call_details):
+    handler = await continuation(handler_call_details)
+    if handler is None: return None
+    return cached_wrap(self, handler_call_details.method, handler)
+
+
+def start_metrics_server(port, ip='127.0.0.1', registry=REGISTRY):
+  """Serves `registry` at http://ip:port/metrics from a daemon thread"""
+  class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+      if self.path.split('?')[0] not in ('/', '/metrics'):
+        self.send_error(404)
+        return
+      body = registry.expose().encode('utf-8')
+      self.send_response(200)
+      self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+      self.send_header('Content-Length', str(len(body)))
+      self.end_headers()
+      self.wfile.write(body)
+
+    def log_message(self, format, *args):
+      # scrapes would flood the docker logs
+      pass
+
+  server = ThreadingHTTPServer((ip, port), Handler)
+  server.daemon_threads = True
+  threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+  return server
@@ -18,7 +18,7 @@ DESCRIPTOR = _descriptor.FileDescriptor(
   package='model_serving',
   syntax='proto3',
   serialized_options=b'\242\002\005MODEL',
-  serialized_pb=b'\n\x13model_serving.proto\x12\rmodel_serving\"\x1f\n\x0c\x43heckRequest\x12\x0f\n\x07sess_id\x18\x01 \x01(\t\"0\n\rCheckResponse\x12\x0f\n\x07sess_id\x18\x01 \x01(\t\x12\x0e\n\x06status\x18\x02 \x01(\t\"6\n\x05Image\x12\x0c\n\x04\x64\x61ta\x18\x01 \x01(\x0c\x12\t\n\x01h\x18\x02 \x01(\x05\x12\t\n\x01w\x18\x03 \x01(\x05\x12\t\n\x01\x63\x18\x04 \x01(\x05\"B\n\x06Images\x12\x0c\n\x04\x64\x61ta\x18\x01 \x01(\x0c\x12\t\n\x01\x62\x18\x02 \x01(\x05\x12\t\n\x01h\x18\x03 \x01(\x05\x12\t\n\x01w\x18\x04 \x01(\x05\x12\t\n\x01\x63\x18\x05 \x01(\x05\"h\n\nDetRequest\x12\x0f\n\x07sess_id\x18\x01 \x01(\t\x12!\n\x03img\x18\x02 \x01(\x0b\x32\x14.model_serving.Image\x12\x0e\n\x06layout\x18\x03 \x01(\t\x12\x16\n\x0esuppress_lines\x18\x04 \x01(\x08\"W\n\x0e\x44\x65tPathRequest\x12\x0f\n\x07sess_id\x18\x01 \x01(\t\x12\x0c\n\x04path\x18\x02 \x01(\t\x12\x0e\n\x06layout\x18\x03 \x01(\t\x12\x16\n\x0esuppress_lines\x18\x04 \x01(\x08\"a\n\x0c\x44\x65nseRequest\x12\x0f\n\x07sess_id\x18\x01 \x01(\t\x12!\n\x03img\x18\x02 \x01(\x0b\x32\x14.model_serving.Image\x12\x0b\n\x03key\x18\x03 \x01(\x05\x12\x10\n\x08num_only\x18\x04 \x01(\x08\"P\n\x10\x44\x65nsePathRequest\x12\x0f\n\x07sess_id\x18\x01 \x01(\t\x12\x0c\n\x04path\x18\x02 \x01(\t\x12\x0b\n\x03key\x18\x03 \x01(\x05\x12\x10\n\x08num_only\x18\x04 \x01(\x08\"<\n\x0b\x44\x65tResponse\x12\x0f\n\x07sess_id\x18\x01 \x01(\t\x12\r\n\x05lines\x18\x02 \x01(\x0c\x12\r\n\x05\x61ngle\x18\x03 \x01(\x02\"N\n\rDenseResponse\x12\x0f\n\x07sess_id\x18\x01 \x01(\t\x12\x0c\n\x04\x63ode\x18\x02 \x01(\x0c\x12\x0c\n\x04prob\x18\x03 \x01(\x0c\x12\x10\n\x08position\x18\x04 \x01(\x0c\"a\n\x12\x44\x65nseBatchResponse\x12\x0f\n\x07sess_id\x18\x01 \x01(\t\x12\t\n\x01n\x18\x02 \x01(\x05\x12\r\n\x05\x63odes\x18\x03 \x01(\x0c\x12\r\n\x05probs\x18\x04 \x01(\x0c\x12\x11\n\tpositions\x18\x05 \x01(\x0c\x32\xee\x03\n\x0bModelServer\x12\x44\n\x05\x43heck\x12\x1b.model_serving.CheckRequest\x1a\x1c.model_serving.CheckResponse\"\x00\x12G\n\x0c\x44\x65tInferSync\x12\x19.model_serving.DetRequest\x1a\x1a.model_serving.DetResponse\"\x00\x12O\n\x10\x44\x65tInferPathSync\x12\x1d.model_serving.DetPathRequest\x1a\x1a.model_serving.DetResponse\"\x00\x12M\n\x0e\x44\x65nseInferSync\x12\x1b.model_serving.DenseRequest\x1a\x1c.model_serving.DenseResponse\"\x00\x12Y\n\x13\x44\x65nseBatchInferSync\x12\x1b.model_serving.DenseRequest\x1a!.model_serving.DenseBatchResponse\"\x00(\x01\x12U\n\x12\x44\x65nseInferPathSync\x12\x1f.model_serving.DensePathRequest\x1a\x1c.model_serving.DenseResponse\"\x00\x42\x08\xa2\x02\x05MODELb\x06proto3'
+  serialized_pb=b'\n\x13model_serving.proto\x12\rmodel_serving\"\x1f\n\x0c\x43heckRequest\x12\x0f\n\x07sess_id\x18\x01 \x01(\t\"0\n\rCheckResponse\x12\x0f\n\x07sess_id\x18\x01 \x01(\t\x12\x0e\n\x06status\x18\x02 \x01(\t\" \n\rHealthRequest\x12\x0f\n\x07sess_id\x18\x01 \x01(\t\">\n\x0eHealthResponse\x12\x0f\n\x07sess_id\x18\x01 \x01(\t\x12\x0e\n\x06status\x18\x02 \x01(\t\x12\x0b\n\x03\x61ge\x18\x03 \x01(\x02\"\x1f\n\x0cReadyRequest\x12\x0f\n\x07sess_id\x18\x01 \x01(\t\">\n\x0bModelWarmup\x12\x0c\n\x04name\x18\x01 \x01(\t\x12\x10\n\x08\x66irst_ms\x18\x02 \x01(\x02\x12\x0f\n\x07warm_ms\x18\x03 \x01(\x02\"[\n\rReadyResponse\x12\x0f\n\x07sess_id\x18\x01 \x01(\t\x12\r\n\x05ready\x18\x02 \x01(\x08\x12*\n\x06models\x18\x03 \x03(\x0b\x32\x1a.model_serving.ModelWarmup\"H\n\x05Image\x12\x0c\n\x04\x64\x61ta\x18\x01 \x01(\x0c\x12\t\n\x01h\x18\x02 \x01(\x05\x12\t\n\x01w\x18\x03 \x01(\x05\x12\t\n\x01\x63\x18\x04 \x01(\x05\x12\x10\n\x08\x65ncoding\x18\x05 \x01(\t\"B\n\x06Images\x12\x0c\n\x04\x64\x61ta\x18\x01 \x01(\x0c\x12\t\n\x01\x62\x18\x02 \x01(\x05\x12\t\n\x01h\x18\x03 \x01(\x05\x12\t\n\x01w\x18\x04 \x01(\x05\x12\t\n\x01\x63\x18\x05 \x01(\x05\"h\n\nDetRequest\x12\x0f\n\x07sess_id\x18\x01 \x01(\t\x12!\n\x03img\x18\x02 \x01(\x0b\x32\x14.model_serving.Image\x12\x0e\n\x06layout\x18\x03 \x01(\t\x12\x16\n\x0esuppress_lines\x18\x04 \x01(\x08\"x\n\x0e\x44\x65tPathRequest\x12\x0f\n\x07sess_id\x18\x01 \x01(\t\x12\x0c\n\x04path\x18\x02 \x01(\t\x12\x0e\n\x06layout\x18\x03 \x01(\t\x12\x16\n\x0esuppress_lines\x18\x04 \x01(\x08\x12\t\n\x01h\x18\x05 \x01(\x05\x12\t\n\x01w\x18\x06 \x01(\x05\x12\t\n\x01\x63\x18\x07 \x01(\x05\"q\n\x0c\x44\x65nseRequest\x12\x0f\n\x07sess_id\x18\x01 \x01(\t\x12!\n\x03img\x18\x02 \x01(\x0b\x32\x14.model_serving.Image\x12\x0b\n\x03key\x18\x03 \x01(\x05\x12\x10\n\x08num_only\x18\x04 \x01(\x08\x12\x0e\n\x06ragged\x18\x05 \x01(\x08\"q\n\x10\x44\x65nsePathRequest\x12\x0f\n\x07sess_id\x18\x01 \x01(\t\x12\x0c\n\x04path\x18\x02 \x01(\t\x12\x0b\n\x03key\x18\x03 \x01(\x05\x12\x10\n\x08num_only\x18\x04 \x01(\x08\x12\t\n\x01h\x18\x05 \x01(\x05\x12\t\n\x01w\x18\x06 \x01(\x05\x12\t\n\x01\x63\x18\x07 \x01(\x05\"q\n\x10\x44\x65nseChipRequest\x12\x0f\n\x07sess_id\x18\x01 \x01(\t\x12\n\n\x02id\x18\x02 \x01(\x05\x12!\n\x03img\x18\x03 \x01(\x0b\x32\x14.model_serving.Image\x12\x0b\n\x03key\x18\x04 \x01(\x05\x12\x10\n\x08num_only\x18\x05 \x01(\x08\"t\n\x11\x44\x65nseChipResponse\x12\x0f\n\x07sess_id\x18\x01 \x01(\t\x12\n\n\x02id\x18\x02 \x01(\x05\x12\r\n\x05\x63odes\x18\x03 \x01(\x0c\x12\r\n\x05probs\x18\x04 \x01(\x0c\x12\x11\n\tpositions\x18\x05 \x01(\x0c\x12\x11\n\tcode_size\x18\x06 \x01(\x05\"<\n\x0b\x44\x65tResponse\x12\x0f\n\x07sess_id\x18\x01 \x01(\t\x12\r\n\x05lines\x18\x02 \x01(\x0c\x12\r\n\x05\x61ngle\x18\x03 \x01(\x02\"N\n\rDenseResponse\x12\x0f\n\x07sess_id\x18\x01 \x01(\t\x12\x0c\n\x04\x63ode\x18\x02 \x01(\x0c\x12\x0c\n\x04prob\x18\x03 \x01(\x0c\x12\x10\n\x08position\x18\x04 \x01(\x0c\"\x95\x01\n\x12\x44\x65nseBatchResponse\x12\x0f\n\x07sess_id\x18\x01 \x01(\t\x12\t\n\x01n\x18\x02 \x01(\x05\x12\r\n\x05\x63odes\x18\x03 \x01(\x0c\x12\r\n\x05probs\x18\x04 \x01(\x0c\x12\x11\n\tpositions\x18\x05 \x01(\x0c\x12\x0e\n\x06ragged\x18\x06 \x01(\x08\x12\x0f\n\x07offsets\x18\x07 \x01(\x0c\x12\x11\n\tcode_size\x18\x08 \x01(\x05\"\x89\x01\n\x0bPageRequest\x12\x0f\n\x07sess_id\x18\x01 \x01(\t\x12!\n\x03img\x18\x02 \x01(\x0b\x32\x14.model_serving.Image\x12\x0e\n\x06layout\x18\x03 \x01(\t\x12\x14\n\x0cmin_wh_ratio\x18\x04 \x01(\x02\x12\x10\n\x08num_only\x18\x05 \x01(\x08\x12\x0e\n\x06ragged\x18\x06 \x01(\x08\"\x80\x01\n\x0cPageResponse\x12\x0f\n\x07sess_id\x18\x01 \x01(\t\x12\x0f\n\x07n_lines\x18\x02 \x01(\x05\x12\r\n\x05\x62oxes\x18\x03 \x01(\x0c\x12\r\n\x05\x61ngle\x18\x04 \x01(\x02\x12\x30\n\x05texts\x18\x05 \x01(\x0b\x32!.model_serving.DenseBatchResponse2\xa1\x06\n\x0bModelServer\x12\x44\n\x05\x43heck\x12\x1b.model_serving.CheckRequest\x1a\x1c.model_serving.CheckResponse\"\x00\x12G\n\x0c\x44\x65tInferSync\x12\x19.model_serving.DetRequest\x1a\x1a.model_serving.DetResponse\"\x00\x12O\n\x10\x44\x65tInferPathSync\x12\x1d.model_serving.DetPathRequest\x1a\x1a.model_serving.DetResponse\"\x00\x12M\n\x0e\x44\x65nseInferSync\x12\x1b.model_serving.DenseRequest\x1a\x1c.model_serving.DenseResponse\"\x00\x12Y\n\x13\x44\x65nseBatchInferSync\x12\x1b.model_serving.DenseRequest\x1a!.model_serving.DenseBatchResponse\"\x00(\x01\x12U\n\x12\x44\x65nseInferPathSync\x12\x1f.model_serving.DensePathRequest\x1a\x1c.model_serving.DenseResponse\"\x00\x12[\n\x10\x44\x65nseStreamInfer\x12\x1f.model_serving.DenseChipRequest\x1a .model_serving.DenseChipResponse\"\x00(\x01\x30\x01\x12\x45\n\x08ReadPage\x12\x1a.model_serving.PageRequest\x1a\x1b.model_serving.PageResponse\"\x00\x12G\n\x06Health\x12\x1c.model_serving.HealthRequest\x1a\x1d.model_serving.HealthResponse\"\x00\x12\x44\n\x05Ready\x12\x1b.model_serving.ReadyRequest\x1a\x1c.model_serving.ReadyResponse\"\x00\x42\x08\xa2\x02\x05MODELb\x06proto3'
 )
 
 
@@ -93,6 +93,203 @@ _CHECKRESPONSE = _descriptor.Descriptor(
 )
 
 
+_HEALTHREQUEST = _descriptor.Descriptor(
+  name='HealthRequest',
+  full_name='model_serving.HealthRequest',
+  filename=None,
+  file=DESCRIPTOR,
+  containing_type=None,
+  fields=[
+    _descriptor.FieldDescriptor(
+      name='sess_id', full_name='model_serving.HealthRequest.sess_id', index=0,
+      number=1, type=9, cpp_type=9, label=1,
+      has_default_value=False, default_value=b"".decode('utf-8'),
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+  ],
+  extensions=[
+  ],
+  nested_types=[],
+  enum_types=[
+  ],
+  serialized_options=None,
+  is_extendable=False,
+  syntax='proto3',
+  extension_ranges=[],
+  oneofs=[
+  ],
+  serialized_start=121,
+  serialized_end=153,
+)
+
+
+_HEALTHRESPONSE = _descriptor.Descriptor(
+  name='HealthResponse',
+  full_name='model_serving.HealthResponse',
+  filename=None,
+  file=DESCRIPTOR,
+  containing_type=None,
+  fields=[
+    _descriptor.FieldDescriptor(
+      name='sess_id', full_name='model_serving.HealthResponse.sess_id', index=0,
+      number=1, type=9, cpp_type=9, label=1,
+      has_default_value=False, default_value=b"".decode('utf-8'),
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='status', full_name='model_serving.HealthResponse.status', index=1,
+      number=2, type=9, cpp_type=9, label=1,
+      has_default_value=False, default_value=b"".decode('utf-8'),
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='age', full_name='model_serving.HealthResponse.age', index=2,
+      number=3, type=2, cpp_type=6, label=1,
+      has_default_value=False, default_value=float(0),
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+  ],
+  extensions=[
+  ],
+  nested_types=[],
+  enum_types=[
+  ],
+  serialized_options=None,
+  is_extendable=False,
+  syntax='proto3',
+  extension_ranges=[],
+  oneofs=[
+  ],
+  serialized_start=155,
+  serialized_end=217,
+)
+
+
+_READYREQUEST = _descriptor.Descriptor(
+  name='ReadyRequest',
+  full_name='model_serving.ReadyRequest',
+  filename=None,
+  file=DESCRIPTOR,
+  containing_type=None,
+  fields=[
+    _descriptor.FieldDescriptor(
+      name='sess_id', full_name='model_serving.ReadyRequest.sess_id', index=0,
+      number=1, type=9, cpp_type=9, label=1,
+      has_default_value=False, default_value=b"".decode('utf-8'),
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+  ],
+  extensions=[
+  ],
+  nested_types=[],
+  enum_types=[
+  ],
+  serialized_options=None,
+  is_extendable=False,
+  syntax='proto3',
+  extension_ranges=[],
+  oneofs=[
+  ],
+  serialized_start=219,
+  serialized_end=250,
+)
+
+
+_MODELWARMUP = _descriptor.Descriptor(
+  name='ModelWarmup',
+  full_name='model_serving.ModelWarmup',
+  filename=None,
+  file=DESCRIPTOR,
+  containing_type=None,
+  fields=[
+    _descriptor.FieldDescriptor(
+      name='name', full_name='model_serving.ModelWarmup.name', index=0,
+      number=1, type=9, cpp_type=9, label=1,
+      has_default_value=False, default_value=b"".decode('utf-8'),
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='first_ms', full_name='model_serving.ModelWarmup.first_ms', index=1,
+      number=2, type=2, cpp_type=6, label=1,
+      has_default_value=False, default_value=float(0),
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='warm_ms', full_name='model_serving.ModelWarmup.warm_ms', index=2,
+      number=3, type=2, cpp_type=6, label=1,
+      has_default_value=False, default_value=float(0),
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+  ],
+  extensions=[
+  ],
+  nested_types=[],
+  enum_types=[
+  ],
+  serialized_options=None,
+  is_extendable=False,
+  syntax='proto3',
+  extension_ranges=[],
+  oneofs=[
+  ],
+  serialized_start=252,
+  serialized_end=314,
+)
+
+
+_READYRESPONSE = _descriptor.Descriptor(
+  name='ReadyResponse',
+  full_name='model_serving.ReadyResponse',
+  filename=None,
+  file=DESCRIPTOR,
+  containing_type=None,
+  fields=[
+    _descriptor.FieldDescriptor(
+      name='sess_id', full_name='model_serving.ReadyResponse.sess_id', index=0,
+      number=1, type=9, cpp_type=9, label=1,
+      has_default_value=False, default_value=b"".decode('utf-8'),
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='ready', full_name='model_serving.ReadyResponse.ready', index=1,
+      number=2, type=8, cpp_type=7, label=1,
+      has_default_value=False, default_value=False,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='models', full_name='model_serving.ReadyResponse.models', index=2,
+      number=3, type=11, cpp_type=10, label=3,
+      has_default_value=False, default_value=[],
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+  ],
+  extensions=[
+  ],
+  nested_types=[],
+  enum_types=[
+  ],
+  serialized_options=None,
+  is_extendable=False,
+  syntax='proto3',
+  extension_ranges=[],
+  oneofs=[
+  ],
+  serialized_start=316,
+  serialized_end=407,
+)
+
+
 _IMAGE = _descriptor.Descriptor(
   name='Image',
   full_name='model_serving.Image',
@@ -128,6 +325,13 @@ _IMAGE = _descriptor.Descriptor(
       message_type=None, enum_type=None, containing_type=None,
       is_extension=False, extension_scope=None,
       serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='encoding', full_name='model_serving.Image.encoding', index=4,
+      number=5, type=9, cpp_type=9, label=1,
+      has_default_value=False, default_value=b"".decode('utf-8'),
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
   ],
   extensions=[
   ],
@@ -140,8 +344,8 @@ _IMAGE = _descriptor.Descriptor(
   extension_ranges=[],
   oneofs=[
   ],
-  serialized_start=121,
-  serialized_end=175,
+  serialized_start=409,
+  serialized_end=481,
 )
 
 
@@ -199,8 +403,8 @@ _IMAGES = _descriptor.Descriptor(
   extension_ranges=[],
   oneofs=[
   ],
-  serialized_start=177,
-  serialized_end=243,
+  serialized_start=483,
+  serialized_end=549,
 )
 
 
@@ -251,8 +455,8 @@ _DETREQUEST = _descriptor.Descriptor(
   extension_ranges=[],
   oneofs=[
   ],
-  serialized_start=245,
-  serialized_end=349,
+  serialized_start=551,
+  serialized_end=655,
 )
 
 
@@ -291,6 +495,27 @@ _DETPATHREQUEST = _descriptor.Descriptor(
       message_type=None, enum_type=None, containing_type=None,
       is_extension=False, extension_scope=None,
       serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='h', full_name='model_serving.DetPathRequest.h', index=4,
+      number=5, type=5, cpp_type=1, label=1,
+      has_default_value=False, default_value=0,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='w', full_name='model_serving.DetPathRequest.w', index=5,
+      number=6, type=5, cpp_type=1, label=1,
+      has_default_value=False, default_value=0,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='c', full_name='model_serving.DetPathRequest.c', index=6,
+      number=7, type=5, cpp_type=1, label=1,
+      has_default_value=False, default_value=0,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
   ],
   extensions=[
   ],
@@ -303,8 +528,8 @@ _DETPATHREQUEST = _descriptor.Descriptor(
   extension_ranges=[],
   oneofs=[
   ],
-  serialized_start=351,
-  serialized_end=438,
+  serialized_start=657,
+  serialized_end=777,
 )
 
 
@@ -343,6 +568,13 @@ _DENSEREQUEST = _descriptor.Descriptor(
       message_type=None, enum_type=None, containing_type=None,
       is_extension=False, extension_scope=None,
       serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='ragged', full_name='model_serving.DenseRequest.ragged', index=4,
+      number=5, type=8, cpp_type=7, label=1,
+      has_default_value=False, default_value=False,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
   ],
   extensions=[
   ],
@@ -355,8 +587,8 @@ _DENSEREQUEST = _descriptor.Descriptor(
   extension_ranges=[],
   oneofs=[
   ],
-  serialized_start=440,
-  serialized_end=537,
+  serialized_start=779,
+  serialized_end=892,
 )
 
 
@@ -395,6 +627,27 @@ _DENSEPATHREQUEST = _descriptor.Descriptor(
       message_type=None, enum_type=None, containing_type=None,
       is_extension=False, extension_scope=None,
       serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='h', full_name='model_serving.DensePathRequest.h', index=4,
+      number=5, type=5, cpp_type=1, label=1,
+      has_default_value=False, default_value=0,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='w', full_name='model_serving.DensePathRequest.w', index=5,
+      number=6, type=5, cpp_type=1, label=1,
+      has_default_value=False, default_value=0,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='c', full_name='model_serving.DensePathRequest.c', index=6,
+      number=7, type=5, cpp_type=1, label=1,
+      has_default_value=False, default_value=0,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
   ],
   extensions=[
   ],
@@ -407,8 +660,133 @@ _DENSEPATHREQUEST = _descriptor.Descriptor(
   extension_ranges=[],
   oneofs=[
   ],
-  serialized_start=539,
-  serialized_end=619,
+  serialized_start=894,
+  serialized_end=1007,
+)
+
+
+_DENSECHIPREQUEST = _descriptor.Descriptor(
+  name='DenseChipRequest',
+  full_name='model_serving.DenseChipRequest',
+  filename=None,
+  file=DESCRIPTOR,
+  containing_type=None,
+  fields=[
+    _descriptor.FieldDescriptor(
+      name='sess_id', full_name='model_serving.DenseChipRequest.sess_id', index=0,
+      number=1, type=9, cpp_type=9, label=1,
+      has_default_value=False, default_value=b"".decode('utf-8'),
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='id', full_name='model_serving.DenseChipRequest.id', index=1,
+      number=2, type=5, cpp_type=1, label=1,
+      has_default_value=False, default_value=0,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='img', full_name='model_serving.DenseChipRequest.img', index=2,
+      number=3, type=11, cpp_type=10, label=1,
+      has_default_value=False, default_value=None,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='key', full_name='model_serving.DenseChipRequest.key', index=3,
+      number=4, type=5, cpp_type=1, label=1,
+      has_default_value=False, default_value=0,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='num_only', full_name='model_serving.DenseChipRequest.num_only', index=4,
+      number=5, type=8, cpp_type=7, label=1,
+      has_default_value=False, default_value=False,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+  ],
+  extensions=[
+  ],
+  nested_types=[],
+  enum_types=[
+  ],
+  serialized_options=None,
+  is_extendable=False,
+  syntax='proto3',
+  extension_ranges=[],
+  oneofs=[
+  ],
+  serialized_start=1009,
+  serialized_end=1122,
+)
+
+
+_DENSECHIPRESPONSE = _descriptor.Descriptor(
+  name='DenseChipResponse',
+  full_name='model_serving.DenseChipResponse',
+  filename=None,
+  file=DESCRIPTOR,
+  containing_type=None,
+  fields=[
+    _descriptor.FieldDescriptor(
+      name='sess_id', full_name='model_serving.DenseChipResponse.sess_id', index=0,
+      number=1, type=9, cpp_type=9, label=1,
+      has_default_value=False, default_value=b"".decode('utf-8'),
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='id', full_name='model_serving.DenseChipResponse.id', index=1,
+      number=2, type=5, cpp_type=1, label=1,
+      has_default_value=False, default_value=0,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='codes', full_name='model_serving.DenseChipResponse.codes', index=2,
+      number=3, type=12, cpp_type=9, label=1,
+      has_default_value=False, default_value=b"",
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='probs', full_name='model_serving.DenseChipResponse.probs', index=3,
+      number=4, type=12, cpp_type=9, label=1,
+      has_default_value=False, default_value=b"",
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='positions', full_name='model_serving.DenseChipResponse.positions', index=4,
+      number=5, type=12, cpp_type=9, label=1,
+      has_default_value=False, default_value=b"",
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='code_size', full_name='model_serving.DenseChipResponse.code_size', index=5,
+      number=6, type=5, cpp_type=1, label=1,
+      has_default_value=False, default_value=0,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+  ],
+  extensions=[
+  ],
+  nested_types=[],
+  enum_types=[
+  ],
+  serialized_options=None,
+  is_extendable=False,
+  syntax='proto3',
+  extension_ranges=[],
+  oneofs=[
+  ],
+  serialized_start=1124,
+  serialized_end=1240,
 )
 
 
@@ -452,8 +830,8 @@ _DETRESPONSE = _descriptor.Descriptor(
   extension_ranges=[],
   oneofs=[
   ],
-  serialized_start=621,
-  serialized_end=681,
+  serialized_start=1242,
+  serialized_end=1302,
 )
 
 
@@ -504,8 +882,8 @@ _DENSERESPONSE = _descriptor.Descriptor(
   extension_ranges=[],
   oneofs=[
   ],
-  serialized_start=683,
-  serialized_end=761,
+  serialized_start=1304,
+  serialized_end=1382,
 )
 
 
@@ -551,6 +929,27 @@ _DENSEBATCHRESPONSE = _descriptor.Descriptor(
       message_type=None, enum_type=None, containing_type=None,
       is_extension=False, extension_scope=None,
       serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='ragged', full_name='model_serving.DenseBatchResponse.ragged', index=5,
+      number=6, type=8, cpp_type=7, label=1,
+      has_default_value=False, default_value=False,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='offsets', full_name='model_serving.DenseBatchResponse.offsets', index=6,
+      number=7, type=12, cpp_type=9, label=1,
+      has_default_value=False, default_value=b"",
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='code_size', full_name='model_serving.DenseBatchResponse.code_size', index=7,
+      number=8, type=5, cpp_type=1, label=1,
+      has_default_value=False, default_value=0,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
   ],
   extensions=[
   ],
@@ -563,23 +962,161 @@ _DENSEBATCHRESPONSE = _descriptor.Descriptor(
   extension_ranges=[],
   oneofs=[
   ],
-  serialized_start=763,
-  serialized_end=860,
+  serialized_start=1385,
+  serialized_end=1534,
 )
 
+
+_PAGEREQUEST = _descriptor.Descriptor(
+  name='PageRequest',
+  full_name='model_serving.PageRequest',
+  filename=None,
+  file=DESCRIPTOR,
+  containing_type=None,
+  fields=[
+    _descriptor.FieldDescriptor(
+      name='sess_id', full_name='model_serving.PageRequest.sess_id', index=0,
+      number=1, type=9, cpp_type=9, label=1,
+      has_default_value=False, default_value=b"".decode('utf-8'),
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='img', full_name='model_serving.PageRequest.img', index=1,
+      number=2, type=11, cpp_type=10, label=1,
+      has_default_value=False, default_value=None,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='layout', full_name='model_serving.PageRequest.layout', index=2,
+      number=3, type=9, cpp_type=9, label=1,
+      has_default_value=False, default_value=b"".decode('utf-8'),
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='min_wh_ratio', full_name='model_serving.PageRequest.min_wh_ratio', index=3,
+      number=4, type=2, cpp_type=6, label=1,
+      has_default_value=False, default_value=float(0),
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='num_only', full_name='model_serving.PageRequest.num_only', index=4,
+      number=5, type=8, cpp_type=7, label=1,
+      has_default_value=False, default_value=False,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='ragged', full_name='model_serving.PageRequest.ragged', index=5,
+      number=6, type=8, cpp_type=7, label=1,
+      has_default_value=False, default_value=False,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+  ],
+  extensions=[
+  ],
+  nested_types=[],
+  enum_types=[
+  ],
+  serialized_options=None,
+  is_extendable=False,
+  syntax='proto3',
+  extension_ranges=[],
+  oneofs=[
+  ],
+  serialized_start=1537,
+  serialized_end=1674,
+)
+
+
+_PAGERESPONSE = _descriptor.Descriptor(
+  name='PageResponse',
+  full_name='model_serving.PageResponse',
+  filename=None,
+  file=DESCRIPTOR,
+  containing_type=None,
+  fields=[
+    _descriptor.FieldDescriptor(
+      name='sess_id', full_name='model_serving.PageResponse.sess_id', index=0,
+      number=1, type=9, cpp_type=9, label=1,
+      has_default_value=False, default_value=b"".decode('utf-8'),
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='n_lines', full_name='model_serving.PageResponse.n_lines', index=1,
+      number=2, type=5, cpp_type=1, label=1,
+      has_default_value=False, default_value=0,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='boxes', full_name='model_serving.PageResponse.boxes', index=2,
+      number=3, type=12, cpp_type=9, label=1,
+      has_default_value=False, default_value=b"",
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='angle', full_name='model_serving.PageResponse.angle', index=3,
+      number=4, type=2, cpp_type=6, label=1,
+      has_default_value=False, default_value=float(0),
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='texts', full_name='model_serving.PageResponse.texts', index=4,
+      number=5, type=11, cpp_type=10, label=1,
+      has_default_value=False, default_value=None,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+  ],
+  extensions=[
+  ],
+  nested_types=[],
+  enum_types=[
+  ],
+  serialized_options=None,
+  is_extendable=False,
+  syntax='proto3',
+  extension_ranges=[],
+  oneofs=[
+  ],
+  serialized_start=1677,
+  serialized_end=1805,
+)
+
+_READYRESPONSE.fields_by_name['models'].message_type = _MODELWARMUP
 _DETREQUEST.fields_by_name['img'].message_type = _IMAGE
 _DENSEREQUEST.fields_by_name['img'].message_type = _IMAGE
+_DENSECHIPREQUEST.fields_by_name['img'].message_type = _IMAGE
+_PAGEREQUEST.fields_by_name['img'].message_type = _IMAGE
+_PAGERESPONSE.fields_by_name['texts'].message_type = _DENSEBATCHRESPONSE
 DESCRIPTOR.message_types_by_name['CheckRequest'] = _CHECKREQUEST
 DESCRIPTOR.message_types_by_name['CheckResponse'] = _CHECKRESPONSE
+DESCRIPTOR.message_types_by_name['HealthRequest'] = _HEALTHREQUEST
+DESCRIPTOR.message_types_by_name['HealthResponse'] = _HEALTHRESPONSE
+DESCRIPTOR.message_types_by_name['ReadyRequest'] = _READYREQUEST
+DESCRIPTOR.message_types_by_name['ModelWarmup'] = _MODELWARMUP
+DESCRIPTOR.message_types_by_name['ReadyResponse'] = _READYRESPONSE
 DESCRIPTOR.message_types_by_name['Image'] = _IMAGE
 DESCRIPTOR.message_types_by_name['Images'] = _IMAGES
 DESCRIPTOR.message_types_by_name['DetRequest'] = _DETREQUEST
 DESCRIPTOR.message_types_by_name['DetPathRequest'] = _DETPATHREQUEST
 DESCRIPTOR.message_types_by_name['DenseRequest'] = _DENSEREQUEST
 DESCRIPTOR.message_types_by_name['DensePathRequest'] = _DENSEPATHREQUEST
+DESCRIPTOR.message_types_by_name['DenseChipRequest'] = _DENSECHIPREQUEST
+DESCRIPTOR.message_types_by_name['DenseChipResponse'] = _DENSECHIPRESPONSE
 DESCRIPTOR.message_types_by_name['DetResponse'] = _DETRESPONSE
 DESCRIPTOR.message_types_by_name['DenseResponse'] = _DENSERESPONSE
 DESCRIPTOR.message_types_by_name['DenseBatchResponse'] = _DENSEBATCHRESPONSE
+DESCRIPTOR.message_types_by_name['PageRequest'] = _PAGEREQUEST
+DESCRIPTOR.message_types_by_name['PageResponse'] = _PAGERESPONSE
 _sym_db.RegisterFileDescriptor(DESCRIPTOR)
 
 CheckRequest = _reflection.GeneratedProtocolMessageType('CheckRequest', (_message.Message,), {
@@ -596,6 +1133,41 @@ CheckResponse = _reflection.GeneratedProtocolMessageType('CheckResponse', (_mess
   })
 _sym_db.RegisterMessage(CheckResponse)
 
+HealthRequest = _reflection.GeneratedProtocolMessageType('HealthRequest', (_message.Message,), {
+  'DESCRIPTOR' : _HEALTHREQUEST,
+  '__module__' : 'model_serving_pb2'
+  # @@protoc_insertion_point(class_scope:model_serving.HealthRequest)
+  })
+_sym_db.RegisterMessage(HealthRequest)
+
+HealthResponse = _reflection.GeneratedProtocolMessageType('HealthResponse', (_message.Message,), {
+  'DESCRIPTOR' : _HEALTHRESPONSE,
+  '__module__' : 'model_serving_pb2'
+  # @@protoc_insertion_point(class_scope:model_serving.HealthResponse)
+  })
+_sym_db.RegisterMessage(HealthResponse)
+
+ReadyRequest = _reflection.GeneratedProtocolMessageType('ReadyRequest', (_message.Message,), {
+  'DESCRIPTOR' : _READYREQUEST,
+  '__module__' : 'model_serving_pb2'
+  # @@protoc_insertion_point(class_scope:model_serving.ReadyRequest)
+  })
+_sym_db.RegisterMessage(ReadyRequest)
+
+ModelWarmup = _reflection.GeneratedProtocolMessageType('ModelWarmup', (_message.Message,), {
+  'DESCRIPTOR' : _MODELWARMUP,
+  '__module__' : 'model_serving_pb2'
+  # @@protoc_insertion_point(class_scope:model_serving.ModelWarmup)
+  })
+_sym_db.RegisterMessage(ModelWarmup)
+
+ReadyResponse = _reflection.GeneratedProtocolMessageType('ReadyResponse', (_message.Message,), {
+  'DESCRIPTOR' : _READYRESPONSE,
+  '__module__' : 'model_serving_pb2'
+  # @@protoc_insertion_point(class_scope:model_serving.ReadyResponse)
+  })
+_sym_db.RegisterMessage(ReadyResponse)
+
 Image = _reflection.GeneratedProtocolMessageType('Image', (_message.Message,), {
   'DESCRIPTOR' : _IMAGE,
   '__module__' : 'model_serving_pb2'
@@ -638,6 +1210,20 @@ DensePathRequest = _reflection.GeneratedProtocolMessageType('DensePathRequest',
   })
 _sym_db.RegisterMessage(DensePathRequest)
 
+DenseChipRequest = _reflection.GeneratedProtocolMessageType('DenseChipRequest', (_message.Message,), {
+  'DESCRIPTOR' : _DENSECHIPREQUEST,
+  '__module__' : 'model_serving_pb2'
+  # @@protoc_insertion_point(class_scope:model_serving.DenseChipRequest)
+  })
+_sym_db.RegisterMessage(DenseChipRequest)
+
+DenseChipResponse = _reflection.GeneratedProtocolMessageType('DenseChipResponse', (_message.Message,), {
+  'DESCRIPTOR' : _DENSECHIPRESPONSE,
+  '__module__' : 'model_serving_pb2'
+  # @@protoc_insertion_point(class_scope:model_serving.DenseChipResponse)
+  })
+_sym_db.RegisterMessage(DenseChipResponse)
+
 DetResponse = _reflection.GeneratedProtocolMessageType('DetResponse', (_message.Message,), {
   'DESCRIPTOR' : _DETRESPONSE,
   '__module__' : 'model_serving_pb2'
@@ -659,6 +1245,20 @@ DenseBatchResponse = _reflection.GeneratedProtocolMessageType('DenseBatchRespons
   })
 _sym_db.RegisterMessage(DenseBatchResponse)
 
+PageRequest = _reflection.GeneratedProtocolMessageType('PageRequest', (_message.Message,), {
+  'DESCRIPTOR' : _PAGEREQUEST,
+  '__module__' : 'model_serving_pb2'
+  # @@protoc_insertion_point(class_scope:model_serving.PageRequest)
+  })
+_sym_db.RegisterMessage(PageRequest)
+
+PageResponse = _reflection.GeneratedProtocolMessageType('PageResponse', (_message.Message,), {
+  'DESCRIPTOR' : _PAGERESPONSE,
+  '__module__' : 'model_serving_pb2'
+  # @@protoc_insertion_point(class_scope:model_serving.PageResponse)
+  })
+_sym_db.RegisterMessage(PageResponse)
+
 
 DESCRIPTOR._options = None
 
@@ -668,8 +1268,8 @@ _MODELSERVER = _descriptor.ServiceDescriptor(
   file=DESCRIPTOR,
   index=0,
   serialized_options=None,
-  serialized_start=863,
-  serialized_end=1357,
+  serialized_start=1808,
+  serialized_end=2609,
   methods=[
   _descriptor.MethodDescriptor(
     name='Check',
@@ -725,6 +1325,42 @@ _MODELSERVER = _descriptor.ServiceDescriptor(
     output_type=_DENSERESPONSE,
     serialized_options=None,
   ),
+  _descriptor.MethodDescriptor(
+    name='DenseStreamInfer',
+    full_name='model_serving.ModelServer.DenseStreamInfer',
+    index=6,
+    containing_service=None,
+    input_type=_DENSECHIPREQUEST,
+    output_type=_DENSECHIPRESPONSE,
+    serialized_options=None,
+  ),
+  _descriptor.MethodDescriptor(
+    name='ReadPage',
+    full_name='model_serving.ModelServer.ReadPage',
+    index=7,
+    containing_service=None,
+    input_type=_PAGEREQUEST,
+    output_type=_PAGERESPONSE,
+    serialized_options=None,
+  ),
+  _descriptor.MethodDescriptor(
+    name='Health',
+    full_name='model_serving.ModelServer.Health',
+    index=8,
+    containing_service=None,
+    input_type=_HEALTHREQUEST,
+    output_type=_HEALTHRESPONSE,
+    serialized_options=None,
+  ),
+  _descriptor.MethodDescriptor(
+    name='Ready',
+    full_name='model_serving.ModelServer.Ready',
+    index=9,
+    containing_service=None,
+    input_type=_READYREQUEST,
+    output_type=_READYRESPONSE,
+    serialized_options=None,
+  ),
 ])
 _sym_db.RegisterServiceDescriptor(_MODELSERVER)
 
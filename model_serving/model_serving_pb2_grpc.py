@@ -43,6 +43,26 @@ class ModelServerStub(object):
                 request_serializer=model__serving__pb2.DensePathRequest.SerializeToString,
                 response_deserializer=model__serving__pb2.DenseResponse.FromString,
                 )
+        self.DenseStreamInfer = channel.stream_stream(
+                '/model_serving.ModelServer/DenseStreamInfer',
+                request_serializer=model__serving__pb2.DenseChipRequest.SerializeToString,
+                response_deserializer=model__serving__pb2.DenseChipResponse.FromString,
+                )
+        self.ReadPage = channel.unary_unary(
+                '/model_serving.ModelServer/ReadPage',
+                request_serializer=model__serving__pb2.PageRequest.SerializeToString,
+                response_deserializer=model__serving__pb2.PageResponse.FromString,
+                )
+        self.Health = channel.unary_unary(
+                '/model_serving.ModelServer/Health',
+                request_serializer=model__serving__pb2.HealthRequest.SerializeToString,
+                response_deserializer=model__serving__pb2.HealthResponse.FromString,
+                )
+        self.Ready = channel.unary_unary(
+                '/model_serving.ModelServer/Ready',
+                request_serializer=model__serving__pb2.ReadyRequest.SerializeToString,
+                response_deserializer=model__serving__pb2.ReadyResponse.FromString,
+                )
 
 
 class ModelServerServicer(object):
@@ -84,6 +104,30 @@ class ModelServerServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def DenseStreamInfer(self, request_iterator, context):
+        """Missing associated documentation comment in .proto file"""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def ReadPage(self, request, context):
+        """Missing associated documentation comment in .proto file"""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def Health(self, request, context):
+        """Missing associated documentation comment in .proto file"""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def Ready(self, request, context):
+        """Missing associated documentation comment in .proto file"""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_ModelServerServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -117,6 +161,26 @@ def add_ModelServerServicer_to_server(servicer, server):
                     request_deserializer=model__serving__pb2.DensePathRequest.FromString,
                     response_serializer=model__serving__pb2.DenseResponse.SerializeToString,
             ),
+            'DenseStreamInfer': grpc.stream_stream_rpc_method_handler(
+                    servicer.DenseStreamInfer,
+                    request_deserializer=model__serving__pb2.DenseChipRequest.FromString,
+                    response_serializer=model__serving__pb2.DenseChipResponse.SerializeToString,
+            ),
+            'ReadPage': grpc.unary_unary_rpc_method_handler(
+                    servicer.ReadPage,
+                    request_deserializer=model__serving__pb2.PageRequest.FromString,
+                    response_serializer=model__serving__pb2.PageResponse.SerializeToString,
+            ),
+            'Health': grpc.unary_unary_rpc_method_handler(
+                    servicer.Health,
+                    request_deserializer=model__serving__pb2.HealthRequest.FromString,
+                    response_serializer=model__serving__pb2.HealthResponse.SerializeToString,
+            ),
+            'Ready': grpc.unary_unary_rpc_method_handler(
+                    servicer.Ready,
+                    request_deserializer=model__serving__pb2.ReadyRequest.FromString,
+                    response_serializer=model__serving__pb2.ReadyResponse.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'model_serving.ModelServer', rpc_method_handlers)
@@ -222,3 +286,67 @@ class ModelServer(object):
             model__serving__pb2.DenseResponse.FromString,
             options, channel_credentials,
             call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def DenseStreamInfer(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_stream(request_iterator, target, '/model_serving.ModelServer/DenseStreamInfer',
+            model__serving__pb2.DenseChipRequest.SerializeToString,
+            model__serving__pb2.DenseChipResponse.FromString,
+            options, channel_credentials,
+            call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def ReadPage(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/model_serving.ModelServer/ReadPage',
+            model__serving__pb2.PageRequest.SerializeToString,
+            model__serving__pb2.PageResponse.FromString,
+            options, channel_credentials,
+            call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def Health(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/model_serving.ModelServer/Health',
+            model__serving__pb2.HealthRequest.SerializeToString,
+            model__serving__pb2.HealthResponse.FromString,
+            options, channel_credentials,
+            call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def Ready(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/model_serving.ModelServer/Ready',
+            model__serving__pb2.ReadyRequest.SerializeToString,
+            model__serving__pb2.ReadyResponse.FromString,
+            options, channel_credentials,
+            call_credentials, compression, wait_for_ready, timeout, metadata)
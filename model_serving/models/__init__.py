@@ -1,6 +1,12 @@
+from .dense8_stub import Dense8Stub
+from .dbnet_stub import DBNetStub
 try:
-  from .ctpnp_openvino import CTPNP_OpenVINO
   from .dense8_openvino import Dense8OpenVINO
   from .dbnet_openvino import DBNetOpenVINO
 except ModuleNotFoundError:
   print('OpenVINO not installed')
+try:
+  from .dense8_onnxruntime import Dense8ONNXRuntime
+  from .dbnet_onnxruntime import DBNetONNXRuntime
+except ModuleNotFoundError:
+  print('ONNX Runtime not installed')
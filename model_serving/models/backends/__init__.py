@@ -0,0 +1,7 @@
+"""Inference engines the model wrappers run on
+
+A backend does not load anything itself. It wraps a network loaded by a model
+wrapper and runs it on infer requests. Each engine lives in its own module,
+which is only imported by the wrappers of that engine.
+"""
+from .base import Backend
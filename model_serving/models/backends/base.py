@@ -0,0 +1,51 @@
+import numpy as np
+
+from ..context import RequestIds
+
+
+class Backend:
+  """A network loaded on an inference engine, run on a fixed number of infer requests
+
+  Backends know nothing about images or text, the model wrappers (`DBNet`,
+  `Dense8Base`) prepare the input and parse the output. Subclasses set
+  `input_shape` and implement `start` and `wait`. An infer request is owned by
+  one caller from taking its id from `req_ids` until its output has been read.
+  Each request also owns an input buffer allocated once, which wrappers
+  preprocess into so that starting the request copies nothing.
+
+  Args:
+    num_requests: Number of infer requests
+  """
+  def __init__(self, num_requests):
+    self.req_ids = RequestIds(num_requests)
+    self.input_shape = None
+    self.inputs = None
+
+  def _allocate_inputs(self):
+    """Allocates a float32 input buffer of `input_shape` for every request"""
+    self.inputs = [np.zeros(self.input_shape, dtype=np.float32) for _ in range(self.num_requests)]
+
+  def input_buffer(self, req_id):
+    """Input buffer of request `req_id`, passed as `feed` to `start` once written"""
+    return self.inputs[req_id]
+
+  @property
+  def num_requests(self):
+    return self.req_ids.size
+
+  def start(self, req_id, feed, done=None):
+    """Starts inference of `feed` on request `req_id`
+
+    Args:
+      req_id: Id of an infer request taken from `req_ids`
+      feed: The input tensor
+      done: A callable without arguments called from any thread when the inference completes
+
+    Returns:
+      A handle to pass to `wait`
+    """
+    raise NotImplementedError
+
+  def wait(self, handle):
+    """Waits for an inference and returns its output, valid until its request is started again"""
+    raise NotImplementedError
@@ -0,0 +1,80 @@
+from concurrent import futures
+import numpy as np
+import onnxruntime as ort
+
+from .base import Backend
+
+
+def load_session(model_path, intra_op_threads=0, inter_op_threads=0):
+  """Loads an ONNX model for the CPU, 0 threads lets ONNX Runtime pick the number"""
+  options = ort.SessionOptions()
+  options.intra_op_num_threads = intra_op_threads
+  options.inter_op_num_threads = inter_op_threads
+  options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+  return ort.InferenceSession(model_path, sess_options=options, providers=['CPUExecutionProvider'])
+
+
+class ONNXRuntimeBackend(Backend):
+  """An ONNX Runtime session on the CPU with a single float32 input and output
+
+  Each infer request is a thread running the session, which is thread-safe.
+  With `io_binding`, every request owns an input and an output buffer
+  allocated once and bound to the session, so that no tensor is allocated
+  or copied out by ONNX Runtime per call.
+
+  Args:
+    session: An `InferenceSession` from `load_session`
+    num_requests: Number of infer requests
+    batch_size: Size of the batch dimension, which must be dynamic in the model if larger than 1
+    io_binding: Whether to run on preallocated buffers
+  """
+  def __init__(self, session, num_requests=1, batch_size=1, io_binding=True):
+    super().__init__(num_requests)
+    self.session = session
+    nodes_in = session.get_inputs()
+    nodes_out = session.get_outputs()
+    assert len(nodes_in) == 1, f'{len(nodes_in)} inputs found, 1 expected'
+    assert len(nodes_out) == 1, f'{len(nodes_out)} outputs found, 1 expected'
+    self.input_name = nodes_in[0].name
+    self.output_name = nodes_out[0].name
+    batch_dim = nodes_in[0].shape[0]
+    if isinstance(batch_dim, int) and batch_dim != batch_size:
+      raise ValueError(f'Batch size {batch_size} requested, but the batch dimension of {self.input_name} is {batch_dim}')
+    for dim in nodes_in[0].shape[1:]:
+      if not isinstance(dim, int):
+        raise ValueError(f'Dynamic input dimension {dim} of {self.input_name} is not supported')
+    self.input_shape = [batch_size, *nodes_in[0].shape[1:]]
+    self.pool = futures.ThreadPoolExecutor(max_workers=num_requests, thread_name_prefix='onnxruntime')
+    self.bindings = None
+    self._allocate_inputs()
+    if io_binding:
+      # dynamic output dimensions are only known after a run
+      output_shape = session.run([self.output_name], {self.input_name: self.inputs[0]})[0].shape
+      self.outputs = [np.empty(output_shape, dtype=np.float32) for _ in range(num_requests)]
+      self.bindings = []
+      for x, y in zip(self.inputs, self.outputs):
+        binding = session.io_binding()
+        binding.bind_input(self.input_name, 'cpu', 0, np.float32, x.shape, x.ctypes.data)
+        binding.bind_output(self.output_name, 'cpu', 0, np.float32, y.shape, y.ctypes.data)
+        self.bindings.append(binding)
+
+  def _run(self, req_id, feed):
+    if self.bindings is None:
+      return self.session.run([self.output_name], {self.input_name: feed})[0]
+    self.session.run_with_iobinding(self.bindings[req_id])
+    return self.outputs[req_id]
+
+  def start(self, req_id, feed, done=None):
+    # inputs are converted to float32 and batched as OpenVINO does, e.g. HWC uint8 images of `DBNet`
+    if self.bindings is not None:
+      if feed is not self.inputs[req_id]: np.copyto(self.inputs[req_id], feed)
+      feed = None
+    else:
+      feed = np.asarray(feed, dtype=np.float32).reshape(self.input_shape)
+    future = self.pool.submit(self._run, req_id, feed)
+    if done is not None:
+      future.add_done_callback(lambda _: done())
+    return future
+
+  def wait(self, future):
+    return future.result()
@@ -0,0 +1,35 @@
+from .base import Backend
+
+
+class OpenVINOBackend(Backend):
+  """An OpenVINO `ExecutableNetwork` with a single input and output
+
+  Args:
+    exe: The `ExecutableNetwork`, its infer requests are the requests of the backend
+  """
+  def __init__(self, exe):
+    super().__init__(len(exe.requests))
+    self.exe = exe
+    nodes_in = list(exe.input_info.keys())
+    nodes_out = list(exe.outputs.keys())
+    assert len(nodes_in) == 1, f'{len(nodes_in)} inputs found, 1 expected'
+    assert len(nodes_out) == 1, f'{len(nodes_out)} outputs found, 1 expected'
+    self.input_name = nodes_in[0]
+    self.output_name = nodes_out[0]
+    self.input_shape = exe.input_info[self.input_name].tensor_desc.dims
+    # input blobs of the requests, written in place by the wrappers
+    self.inputs = [req.input_blobs[self.input_name].buffer for req in exe.requests]
+
+  def start(self, req_id, feed, done=None):
+    req = self.exe.requests[req_id]
+    if done is not None:
+      req.set_completion_callback(lambda status, _: done())
+    if feed is self.inputs[req_id]:
+      req.async_infer()
+    else:
+      req.async_infer({self.input_name: feed})
+    return req
+
+  def wait(self, req):
+    req.wait()
+    return req.output_blobs[self.output_name].buffer
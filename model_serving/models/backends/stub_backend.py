@@ -0,0 +1,118 @@
+from concurrent import futures
+import itertools
+import threading
+import time
+import numpy as np
+
+from .base import Backend
+
+
+class Latency:
+  """Random inference times in seconds
+
+  Args:
+    distribution: constant, uniform, normal or lognormal
+    mean_ms: Mean time
+    std_ms: Standard deviation, half the range for uniform
+    seed: Seed of the generator, so that runs are repeatable
+  """
+  def __init__(self, distribution='constant', mean_ms=0., std_ms=0., seed=0):
+    if distribution not in ('constant', 'uniform', 'normal', 'lognormal'):
+      raise ValueError(f'Unknown latency distribution {distribution}')
+    self.distribution = distribution
+    self.mean = mean_ms / 1000
+    self.std = std_ms / 1000
+    self.rng = np.random.default_rng(seed)
+    self.lock = threading.Lock()
+
+  def sample(self):
+    if self.distribution == 'constant' or self.std == 0 or self.mean <= 0: return max(self.mean, 0.)
+    with self.lock:
+      if self.distribution == 'uniform':
+        t = self.rng.uniform(self.mean - self.std, self.mean + self.std)
+      elif self.distribution == 'normal':
+        t = self.rng.normal(self.mean, self.std)
+      else:
+        # parameters of the underlying normal giving the requested mean and deviation
+        sigma2 = np.log(1 + (self.std / self.mean) ** 2)
+        t = self.rng.lognormal(np.log(self.mean) - sigma2 / 2, np.sqrt(sigma2))
+    return max(t, 0.)
+
+
+class StubBackend(Backend):
+  """A stand-in for a network, whose outputs are computed by `fn` or replayed after a random delay
+
+  Each infer request is a thread as in `ONNXRuntimeBackend`, so that requests
+  overlap as they do on a device.
+
+  Args:
+    input_shape: Shape of the input the model wrapper prepares
+    fn: Computes the output of a float32 input of `input_shape`
+    num_requests: Number of infer requests
+    latency: A `Latency`, outputs are returned at once without it
+    recorded: Outputs of a single input replayed in turn instead of calling `fn`, batched as the input
+  """
+  def __init__(self, input_shape, fn, num_requests=1, latency=None, recorded=None):
+    super().__init__(num_requests)
+    self.input_shape = list(input_shape)
+    self.fn = fn
+    self.latency = latency
+    self.recorded = recorded
+    self.count = itertools.count()
+    self.pool = futures.ThreadPoolExecutor(max_workers=num_requests, thread_name_prefix='stub')
+    self._allocate_inputs()
+
+  def _replay(self):
+    batch_size = self.input_shape[0]
+    start = next(self.count) * batch_size
+    outputs = [self.recorded[(start + idx) % len(self.recorded)] for idx in range(batch_size)]
+    return outputs[0] if batch_size == 1 else np.concatenate(outputs)
+
+  def _run(self, feed, delay):
+    t0 = time.perf_counter()
+    out = self._replay() if self.recorded else self.fn(feed)
+    # computing the output is part of the delay
+    remaining = delay - (time.perf_counter() - t0)
+    if remaining > 0: time.sleep(remaining)
+    return out
+
+  def start(self, req_id, feed, done=None):
+    feed = np.asarray(feed, dtype=np.float32).reshape(self.input_shape)
+    delay = 0. if self.latency is None else self.latency.sample()
+    future = self.pool.submit(self._run, feed, delay)
+    if done is not None:
+      future.add_done_callback(lambda _: done())
+    return future
+
+  def wait(self, future):
+    return future.result()
+
+
+def load_recorded(path, shape):
+  """Arrays of an .npz file with as many values as an output of `shape`, in file order"""
+  data = np.load(path)
+  size = int(np.prod(shape))
+  arrays = [data[k] for k in data.files]
+  outputs = [a.astype(np.float32) for a in arrays if a.size == size]
+  if not outputs:
+    raise ValueError(f'No output of shape {list(shape)} recorded in {path}')
+  return outputs
+
+
+def build_stub(input_shape, output_shape, fn, model_path, num_requests=1, latency=None, recorded=False, seed=0,
+               **kwargs):
+  """A `StubBackend` configured by the `stub` section of a model
+
+  Args:
+    input_shape: Shape of the input, batch first
+    output_shape: Shape of the output of one input
+    fn: Computes the output of an input
+    model_path: Path of the model without extension, recorded outputs are read from `model_path` + .npz
+    num_requests: Number of infer requests
+    latency: Keyword arguments of `Latency`
+    recorded: Whether to replay recorded outputs
+    seed: Seed of the latency
+  """
+  return StubBackend(input_shape, fn, num_requests=num_requests,
+                     latency=None if latency is None else Latency(seed=seed, **latency),
+                     recorded=load_recorded(model_path + '.npz', output_shape) if recorded else None)
@@ -0,0 +1,58 @@
+"""Per-call inference state shared by the model wrappers"""
+import queue
+
+
+class InferContext:
+  """State of a single inference call.
+
+  Everything that depends on the input of a call lives here instead of on the
+  model instance, so that one model can serve many threads or coroutines.
+
+  Attributes:
+    req_id: Id of the infer request the call runs on
+    req: The infer request itself
+    scale: Resize scale of a detection input
+    ratio: Resize ratio of a recognition input
+    length: Valid output length of a recognition input
+    device: Device of the replica the call runs on, set by `DeviceBalancer`
+    t_start: Start time of the call on that device
+  """
+  __slots__ = ('req_id', 'req', 'scale', 'ratio', 'length', 'device', 't_start')
+
+  def __init__(self, req_id=None, req=None, scale=None, ratio=None, length=None):
+    self.req_id = req_id
+    self.req = req
+    self.scale = scale
+    self.ratio = ratio
+    self.length = length
+    self.device = None
+    self.t_start = None
+
+
+class RequestIds:
+  """Thread-safe pool of infer request ids.
+
+  `ExecutableNetwork.get_idle_request_id` is not atomic across threads, two
+  callers may get the same id. Ids are handed out here instead and held
+  until the result has been read. A caller that already holds ids should
+  not block on more, or two callers can wait on each other forever.
+  """
+  def __init__(self, num_requests):
+    self.size = num_requests
+    self.idle = queue.Queue()
+    for req_id in range(num_requests):
+      self.idle.put(req_id)
+
+  @property
+  def in_use(self):
+    return self.size - self.idle.qsize()
+
+  def acquire(self, block=True):
+    """Takes an idle request id, returns `None` if none is idle and `block` is False"""
+    try:
+      return self.idle.get(block)
+    except queue.Empty:
+      return None
+
+  def release(self, req_id):
+    self.idle.put(req_id)
@@ -1,6 +1,8 @@
 import numpy as np
 import cv2
-from .utils.image import resize_ar, get_min_box, get_score, unclip, calc_angle, rotate_lines
+from .utils.image import resize_ar
+from .utils.geometry import min_area_rects, box_points, order_points, unclip_rects, clip_boxes, calc_angle, rotate_lines
+from .context import InferContext
 
 class DBNet:
   def __init__(self,
@@ -13,46 +15,88 @@ class DBNet:
                **kwargs):
     self.logger = logger
     self.threshold = threshold
+    self.logit_threshold = np.log(threshold / (1 - threshold))
     self.box_th = box_th
     self.max_candidates = max_candidates
     self.unclip_ratio = unclip_ratio
     self.min_size = min_size
 
-  def preprocess(self, img: np.ndarray, **kwargs):
-    img, self.scale = resize_ar(img, self.input_w, self.input_h)
-    self.img = img.copy()[np.newaxis, ...].astype(np.float32)
-    return img
+  def _set_backend(self, backend):
+    """Runs the network on `backend`, whose input is NHWC"""
+    self.backend = backend
+    self.req_ids = backend.req_ids
+    self.input_shape = backend.input_shape
+    self.input_h = self.input_shape[1]
+    self.input_w = self.input_shape[2]
 
-  def parse_result(self, result: np.ndarray):
+  def infer_sync(self, img: np.ndarray, **kwargs):
+    req_id = self.req_ids.acquire()
+    try:
+      feed, ctx = self.preprocess(img, out=self.backend.input_buffer(req_id))
+      ctx.req_id = req_id
+      res = self.backend.wait(self.backend.start(ctx.req_id, feed))
+      boxes, angle = self.parse_result(res, ctx)
+    finally:
+      self.req_ids.release(req_id)
+    return boxes, angle
+
+  def preprocess(self, img: np.ndarray, out: np.ndarray = None, **kwargs):
+    """Resizes an image to the input size
+
+    Args:
+      img: Image to detect text in
+      out: Input buffer to write into, e.g. `Backend.input_buffer`, a new uint8 image if not given
+
+    Returns:
+      The resized image, `out` if given, and an `InferContext` carrying its scale
+    """
+    if out is None:
+      img, scale = resize_ar(img, self.input_w, self.input_h)
+      return img, InferContext(scale=scale)
+    _, scale = resize_ar(img, self.input_w, self.input_h, out=out[0])
+    return out, InferContext(scale=scale)
+
+  @staticmethod
+  def _filled_score(result: np.ndarray, contour: np.ndarray):
+    """Mean probability inside a contour, holes included"""
+    x, y, w, h = cv2.boundingRect(contour)
+    fill = np.zeros((h, w), dtype=np.uint8)
+    cv2.drawContours(fill, [contour], -1, 1, thickness=-1, offset=(-x, -y))
+    probs = 1 / (1 + np.exp(-result[y:y + h, x:x + w]))
+    return cv2.mean(probs, fill)[0]
+
+  def parse_result(self, result: np.ndarray, ctx: InferContext):
+    scale = ctx.scale
     result = result[0, ..., 0]
-    res_exp = np.exp(result)
-    result = res_exp / (res_exp + 1)
-    mask = result > self.threshold
+    # sigmoid is monotonic, threshold the logits instead of the probabilities
+    fg = result > self.logit_threshold
+    mask = fg.view(np.uint8)
     h, w = mask.shape
-    contours, _ = cv2.findContours((mask * 255).astype(np.uint8), cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
-    n_contours = min(len(contours), self.max_candidates)
-    boxes = []
-    scores = []
-    rects = []
-    for idx, contour in enumerate(contours[:n_contours]):
-      c = contour.squeeze(1)
-      pts, sside = get_min_box(c)
-      if sside < self.min_size:
-        continue
-      score = get_score(result, c)
-      if self.box_th > score:
-        continue
-      c = unclip(pts, unclip_ratio=self.unclip_ratio).reshape(-1, 1, 2)
-      pts, sside = get_min_box(c)
-      if sside < self.min_size + 2:
-        continue
-      pts[:, 0] = np.clip(np.round(pts[:, 0]), 0, w)
-      pts[:, 1] = np.clip(np.round(pts[:, 1]), 0, h)
-      boxes.append(pts.astype(np.float32))
-      scores.append(score)
-    boxes = np.array(boxes)
-    scores = np.array(scores)
-    boxes /= self.scale
+    n_labels, labels = cv2.connectedComponents(mask, connectivity=8)
+    # mean probability of every region at once, sigmoid only on foreground pixels
+    fg_labels = labels[fg]
+    fg_probs = 1 / (1 + np.exp(-result[fg]))
+    areas = np.bincount(fg_labels, minlength=n_labels)
+    region_scores = np.bincount(fg_labels, weights=fg_probs, minlength=n_labels) / np.maximum(areas, 1)
+    # outer borders and the borders of their holes, a region nested in a hole has an outer border of its own
+    contours, hierarchy = cv2.findContours(mask, cv2.RETR_CCOMP, cv2.CHAIN_APPROX_SIMPLE)
+    hierarchy = np.zeros((0, 4), dtype=np.int32) if hierarchy is None else hierarchy[0]
+    outer = np.flatnonzero(hierarchy[:, 3] < 0)[:self.max_candidates]
+    contours = [contours[idx] for idx in outer]
+    first_pts = np.array([c[0, 0] for c in contours], dtype=np.int64).reshape(-1, 2)
+    scores = region_scores[labels[first_pts[:, 1], first_pts[:, 0]]]
+    # a region with holes is scored over its whole outline like the others, holes included, so that a ring
+    # around background does not pass as the text it encloses
+    for idx in np.flatnonzero(hierarchy[outer, 2] >= 0):
+      scores[idx] = self._filled_score(result, contours[idx])
+    contours = [c for c, score in zip(contours, scores) if score >= self.box_th]
+    # every candidate is a rotated rectangle from here on, measured and expanded at once
+    rects = min_area_rects(contours)
+    rects = rects[rects[:, 2:4].min(axis=1) >= self.min_size]
+    rects = unclip_rects(rects, unclip_ratio=self.unclip_ratio)
+    rects = rects[rects[:, 2:4].min(axis=1) >= self.min_size + 2]
+    boxes = clip_boxes(order_points(box_points(rects)), w, h).astype(np.float32)
+    boxes /= scale
     angle = calc_angle(boxes)
-    if np.abs(angle) > 0.2: boxes = rotate_lines(boxes, w=w / self.scale, h=h / self.scale, angle=angle)
+    if np.abs(angle) > 0.2: boxes = rotate_lines(boxes, w=w / scale, h=h / scale, angle=angle)
     return boxes, angle
@@ -0,0 +1,16 @@
+from .dbnet_base import DBNet
+from .backends.onnxruntime_backend import ONNXRuntimeBackend, load_session
+
+
+class DBNetONNXRuntime(DBNet):
+  """
+  ONNX Runtime wrapper for DBNet inference on the CPU, reads `model_path` + .onnx
+  """
+  def __init__(self, model_path, logger, dev="CPU", **kwargs):
+    super().__init__(logger, **kwargs)
+    if dev != "CPU":
+      raise ValueError(f"ONNX Runtime only runs on CPU, not on {dev}")
+    session = load_session(model_path + ".onnx", intra_op_threads=kwargs.get("intra_op_threads", 0),
+                           inter_op_threads=kwargs.get("inter_op_threads", 0))
+    self._set_backend(ONNXRuntimeBackend(session, num_requests=kwargs.get("num_requests", 1),
+                                         io_binding=kwargs.get("io_binding", True)))
@@ -0,0 +1,29 @@
+import re
+from pathlib import Path
+from .dbnet_base import DBNet
+from .backends.stub_backend import build_stub
+
+
+def dark_regions(feed):
+  """Logits of pixels darker than mid-grey, the zero padding of `resize_ar` excluded"""
+  gray = feed.mean(axis=-1, keepdims=True)
+  logits = (128 - gray) / 16
+  logits[gray == 0] = -8
+  return logits
+
+
+class DBNetStub(DBNet):
+  """
+  Stand-in for DBNet that needs neither OpenVINO nor a device, for tests and profiling
+
+  The input size is read from the model name, e.g. 640_992_logits_fp32_MYRIAD
+  takes 640x992 images. Outputs are `dark_regions` of the input, or maps recorded
+  in `model_path` + .npz (`python -m benchmarks.dbnet_postprocess --record`) with `recorded`.
+  """
+  def __init__(self, model_path, logger, dev="CPU", **kwargs):
+    super().__init__(logger, **kwargs)
+    match = re.match(r"(\d+)_(\d+)", Path(model_path).name)
+    if match is None:
+      raise ValueError(f"Input size not found in the model name {model_path}, expected H_W_...")
+    h, w = int(match[1]), int(match[2])
+    self._set_backend(build_stub([1, h, w, 3], [1, h, w, 1], dark_regions, model_path, **kwargs))
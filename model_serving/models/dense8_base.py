@@ -1,40 +1,176 @@
 import numpy as np
 import cv2
-from .utils.general import softmax, greedy_decode
+from .utils.general import softmax, greedy_decode_batch
 from .utils.image import resize_h
+from .context import InferContext
+
+# labels kept when only numbers are decoded, void is appended per model
+NUM_CLASSES = [1, 6, 17, 31, 34, 42, 46, 49, 50, 39]
 
 class Dense8Base:
   """
   DenseNet8 Inference Class
+
+  Pre- and post-processing run here, subclasses load the network and pass
+  its `Backend` to `_set_backend`.
   """
   def __init__(self, logger, height, **kwargs):
     self.logger = logger
-    self.input_len = -1
-    self.ratio = None
     self.height = height
     self.stride = self.height // 4
+    self.batch_size = 1
 
-  def preprocess(self, img, nchw=True):
-    self.ratio = self.height / img.shape[0]
-    img_pad, img_resize = resize_h(img, h=self.input_shape[2], w=self.input_shape[3], logger=self.logger)
-    if nchw:
-      img_pad = img_pad.transpose(2, 0, 1)
-    img_pad = img_pad[np.newaxis, ...].astype(np.float32)
-    self.input_len = max(img_resize.shape[1] // self.stride, self.input_len)
-    return img_pad
-
-  def parse_result(self, probs, num_only):
-    probs = probs.reshape(probs.shape[1], probs.shape[-1])
-    if len(probs.shape) == 4:
-      probs = probs.transpose(1, 0)
-    if num_only:
-      probs_num = np.zeros_like(probs)
-      num_indices = [1,6,17,31,34,42,46,49,50,39, probs.shape[-1]-1]
-      probs_num[:, num_indices] = probs[:, num_indices]
-      probs = probs_num
-    codes, probs, positions = greedy_decode(probs, self.input_len)
-    positions = (positions * self.stride + self.stride // 2) / self.ratio
-    return codes, probs, positions
+  def _resize(self, img, out, nchw=True):
+    """Resizes and pads a chip into `out`, one input of the network, returns its scale ratio and valid length"""
+    ratio = self.height / img.shape[0]
+    # pixels are converted to the dtype of `out` as they are written, CHW through a transposed view
+    view = out.transpose(1, 2, 0) if nchw else out
+    _, img_resize = resize_h(img, h=self.input_shape[2], w=self.input_shape[3], logger=self.logger, out=view)
+    length = img_resize.shape[1] // self.stride
+    return ratio, length
+
+  def preprocess(self, img, nchw=True, out=None):
+    """Prepares a chip as network input
+
+    Args:
+      img: Image chip
+      nchw: Whether the network takes NCHW input, NHWC otherwise
+      out: Input buffer to write into, e.g. `Backend.input_buffer`, a new float32 one if not given
+
+    Returns:
+      The input tensor and an `InferContext` carrying the ratio and valid length
+    """
+    if out is None:
+      shape = self.input_shape[1:] if nchw else (self.input_shape[2], self.input_shape[3], self.input_shape[1])
+      out = np.empty((1, *shape), dtype=np.float32)
+    ratio, length = self._resize(img, out[0], nchw=nchw)
+    return out, InferContext(ratio=ratio, length=length)
+
+  def preprocess_batch(self, imgs, nchw=True, out=None):
+    """Stacks chips of the same width bucket into one batched input
+
+    Returns:
+      The batched input with a shape of [batch_size, C, H, W] (NHWC if `nchw` is False),
+      written into `out` if given, and an `InferContext` for each chip.
+    """
+    shape = self.input_shape[1:] if nchw else (self.input_shape[2], self.input_shape[3], self.input_shape[1])
+    feed = np.empty((self.batch_size, *shape), dtype=np.float32) if out is None else out
+    ctxs = []
+    for idx, img in enumerate(imgs):
+      ratio, length = self._resize(img, feed[idx], nchw=nchw)
+      ctxs.append(InferContext(ratio=ratio, length=length))
+    # rows not filled by chips are padded with the background value used by `resize_h`
+    feed[len(imgs):] = 200
+    return feed, ctxs
+
+  def parse_result(self, probs, num_only, ctx):
+    return self.parse_batch(probs, [num_only], [ctx])[0]
+
+  def parse_batch(self, probs, num_onlys, ctxs):
+    """Decodes the outputs of a batch of chips
+
+    Args:
+      probs: Network output for at least `len(ctxs)` chips
+      num_onlys: Whether only numbers should be decoded, one for each chip
+      ctxs: `InferContext` of each chip
+
+    Returns:
+      A list of `(codes, probs, positions)`, one for each chip.
+    """
+    n = len(ctxs)
+    probs = probs.reshape(probs.shape[0], probs.shape[1], probs.shape[-1])[:n]
+    num_classes = NUM_CLASSES + [probs.shape[-1] - 1]
+    lengths = np.array([ctx.length for ctx in ctxs])
+    results = [None] * n
+    for num_only in (False, True):
+      indices = [idx for idx in range(n) if bool(num_onlys[idx]) == num_only]
+      if not indices: continue
+      # chips of one kind usually make up the whole batch, avoid gathering then
+      group = probs if len(indices) == n else probs[indices]
+      decoded = greedy_decode_batch(group, lengths[indices], classes=num_classes if num_only else None)
+      for idx, (codes, code_probs, positions) in zip(indices, decoded):
+        positions = (positions * self.stride + self.stride // 2) / ctxs[idx].ratio
+        results[idx] = (codes, code_probs, positions)
+    return results
+
+  def _set_backend(self, backend, batch_backend=None):
+    """Runs chips on `backend`, and batched tensors of chips on `batch_backend` if given"""
+    self.backend = backend
+    self.req_ids = backend.req_ids
+    self.input_shape = backend.input_shape
+    self.batch_backend = batch_backend
+    if batch_backend is not None:
+      self.batch_size = batch_backend.input_shape[0]
 
   def infer_sync(self, img, num_only=False):
-    raise NotImplementedError
+    ctx = self.infer_async(img)
+    codes, probs, positions = self.get_result(ctx, num_only=num_only)
+    return codes, probs, positions
+
+  def infer_async(self, img, block=True, done=None):
+    """Starts inference of a chip
+
+    Args:
+      img: Image chip
+      block: Whether to wait for an idle infer request
+      done: A callable without arguments called from any thread once the result is ready
+
+    Returns:
+      The `InferContext` to pass to `get_result`, or `None` if no infer request
+      is idle and `block` is False.
+    """
+    req_id = self.req_ids.acquire(block)
+    if req_id is None: return None
+    try:
+      feed, ctx = self.preprocess(img, out=self.backend.input_buffer(req_id))
+      ctx.req_id = req_id
+      ctx.req = self.backend.start(req_id, feed, done=done)
+    except Exception:
+      self.req_ids.release(req_id)
+      raise
+    return ctx
+
+  def get_result(self, ctx, num_only=False):
+    try:
+      logits = self.backend.wait(ctx.req)
+      codes, probs, positions = self.parse_result(logits, num_only, ctx)
+    finally:
+      self.req_ids.release(ctx.req_id)
+    return codes, probs, positions
+
+  def infer_batch(self, imgs, num_onlys):
+    """Runs chips of the same width bucket as batched tensors
+
+    Falls back to in-flight infer requests when there is no batch backend.
+
+    Args:
+      imgs: A list of image chips sharing the same recognition key
+      num_onlys: Whether only numbers should be decoded, one for each chip
+
+    Returns:
+      A list of `(codes, probs, positions)`, one for each chip.
+    """
+    if self.batch_backend is None:
+      results = []
+      inflight = []
+      for img, num_only in zip(imgs, num_onlys):
+        ctx = self.infer_async(img, block=not inflight)
+        if ctx is None:
+          # no idle request, collect the chips in flight before starting more
+          results += [self.get_result(c, n) for c, n in inflight]
+          inflight.clear()
+          ctx = self.infer_async(img)
+        inflight.append((ctx, num_only))
+      results += [self.get_result(c, n) for c, n in inflight]
+      return results
+    results = []
+    for start in range(0, len(imgs), self.batch_size):
+      chunk = imgs[start:start + self.batch_size]
+      req_id = self.batch_backend.req_ids.acquire()
+      try:
+        feed, ctxs = self.preprocess_batch(chunk, out=self.batch_backend.input_buffer(req_id))
+        logits = self.batch_backend.wait(self.batch_backend.start(req_id, feed))
+        results += self.parse_batch(logits, num_onlys[start:start + len(chunk)], ctxs)
+      finally:
+        self.batch_backend.req_ids.release(req_id)
+    return results
@@ -0,0 +1,26 @@
+from .dense8_base import Dense8Base
+from .backends.onnxruntime_backend import ONNXRuntimeBackend, load_session
+
+class Dense8ONNXRuntime(Dense8Base):
+  """
+  ONNX Runtime wrapper for Dense8 inference on the CPU
+
+  Reads `model_path` + .onnx. Chips are batched into tensors of
+  `tensor_batch_size` only if the batch dimension of the model is dynamic.
+  """
+  def __init__(self, model_path, logger, dev='CPU', **kwargs):
+    super().__init__(logger, height=64, **kwargs)
+    if dev != 'CPU':
+      raise ValueError(f'ONNX Runtime only runs on CPU, not on {dev}')
+    session = load_session(model_path + '.onnx', intra_op_threads=kwargs.get('intra_op_threads', 0),
+                           inter_op_threads=kwargs.get('inter_op_threads', 0))
+    options = {
+      "num_requests": kwargs.get('num_requests', 1),
+      "io_binding": kwargs.get('io_binding', True),
+    }
+    backend = ONNXRuntimeBackend(session, **options)
+    batch_backend = None
+    batch_size = kwargs.get('tensor_batch_size', 1)
+    if batch_size > 1:
+      batch_backend = ONNXRuntimeBackend(session, batch_size=batch_size, **options)
+    self._set_backend(backend, batch_backend)
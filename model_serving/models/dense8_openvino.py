@@ -1,5 +1,6 @@
 from openvino.inference_engine import IENetwork
 from .dense8_base import Dense8Base
+from .backends.openvino_backend import OpenVINOBackend
 
 class Dense8OpenVINO(Dense8Base):
   """
@@ -7,32 +8,19 @@ class Dense8OpenVINO(Dense8Base):
   """
   def __init__(self, model_path, ie_core, dev, logger, **kwargs):
     super().__init__(logger, height=64, **kwargs)
+    num_requests = kwargs.get('num_requests', 1)
     if dev == 'CPU':
       net = ie_core.read_network(model=model_path+'.xml', weights=model_path+'.bin')
-      self.exe = ie_core.load_network(net, dev, num_requests=kwargs.get('num_requests', 1))
+      backend = OpenVINOBackend(ie_core.load_network(net, dev, num_requests=num_requests))
     else:
-      self.exe = ie_core.import_network(model_path, dev, num_requests=kwargs.get('num_requests', 1))
-    self.nodes_in = list(self.exe.input_info.keys())
-    self.nodes_out = list(self.exe.outputs.keys())
-    assert len(self.nodes_in) == 1, f'{len(self.nodes_in)} inputs found, 1 expected'
-    assert len(self.nodes_out) == 1, f'{len(self.nodes_out)} outputs found, 1 expected'
-    self.node_image = self.nodes_in[0]
-    self.node_logits = self.nodes_out[0]
-    self.input_shape = self.exe.input_info[self.node_image].tensor_desc.dims
-
-  def infer_sync(self, img, num_only=False):
-    req = self.infer_async(img)
-    req.wait()
-    codes, probs, positions = self.get_result(req, num_only=num_only)
-    return codes, probs, positions
-
-  def infer_async(self, img):
-    feed = self.preprocess(img)
-    req = self.exe.start_async(self.exe.get_idle_request_id(), {self.node_image: feed})
-    return req
-
-  def get_result(self, req, num_only=False):
-    req.wait()
-    logits = req.output_blobs[self.node_logits].buffer
-    codes, probs, positions = self.parse_result(logits, num_only)
-    return codes, probs, positions
+      backend = OpenVINOBackend(ie_core.import_network(model_path, dev, num_requests=num_requests))
+    batch_backend = None
+    batch_size = kwargs.get('tensor_batch_size', 1)
+    if batch_size > 1:
+      if dev == 'CPU':
+        # reshape the network so that chips of the same width bucket share one tensor
+        net.reshape({backend.input_name: [batch_size, *backend.input_shape[1:]]})
+        batch_backend = OpenVINOBackend(ie_core.load_network(net, dev, num_requests=num_requests))
+      else:
+        self.logger.warning(f'Batched tensor inference is not supported on {dev}, fall back to batch size 1')
+    self._set_backend(backend, batch_backend)
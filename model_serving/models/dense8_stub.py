@@ -0,0 +1,47 @@
+import re
+from pathlib import Path
+import numpy as np
+from .dense8_base import Dense8Base
+from .backends.stub_backend import build_stub
+
+# characters of id2char_std.pkl and the void class
+STD_CLASSES = 7550
+
+
+def column_probs(feed, stride, num_classes):
+  """Probabilities of a code at each dark time step, picked by its darkness and position, and of void elsewhere"""
+  n, _, _, w = feed.shape
+  steps = w // stride
+  darkness = 255 - feed.mean(axis=(1, 2)).reshape(n, steps, stride).mean(axis=-1)
+  probs = np.zeros((n, steps, num_classes), dtype=np.float32)
+  # the background of `resize_h` is 200, i.e. a darkness of 55
+  text = darkness > 64
+  probs[..., -1] = np.where(text, 0.1, 1.)
+  batch_idx, step_idx = np.nonzero(text)
+  codes = (darkness[text].astype(np.int64) * 31 + step_idx) % (num_classes - 1)
+  probs[batch_idx, step_idx, codes] = 0.9
+  return probs
+
+
+class Dense8Stub(Dense8Base):
+  """
+  Stand-in for Dense8 that needs neither OpenVINO nor a device, for tests and profiling
+
+  The input width is read from the model name, e.g. crnn1024_fp32_MYRIAD takes
+  64x1024 chips. Outputs are `column_probs` of the input, or outputs recorded in
+  `model_path` + .npz (`python -m benchmarks.ctc_decode --record`) with `recorded`.
+  """
+  def __init__(self, model_path, logger, dev='CPU', num_classes=STD_CLASSES, **kwargs):
+    super().__init__(logger, height=64, **kwargs)
+    match = re.search(r'(\d+)', Path(model_path).name)
+    if match is None:
+      raise ValueError(f'Input width not found in the model name {model_path}, expected e.g. crnn1024')
+    width = int(match[1])
+    output_shape = [1, width // self.stride, num_classes]
+    fn = lambda feed: column_probs(feed, self.stride, num_classes)
+    backend = build_stub([1, 3, self.height, width], output_shape, fn, model_path, **kwargs)
+    batch_backend = None
+    batch_size = kwargs.get('tensor_batch_size', 1)
+    if batch_size > 1:
+      batch_backend = build_stub([batch_size, 3, self.height, width], output_shape, fn, model_path, **kwargs)
+    self._set_backend(backend, batch_backend)
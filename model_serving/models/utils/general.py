@@ -20,27 +20,45 @@ def greedy_decode(x: np.ndarray, length: int):
   :param length: sequence length
   :return: decoded sequence and probability for each char
   """
-  lb_void = x.shape[1] - 1
-  encodes = x.argmax(axis=1)
-  probs = [x[r][i] for r, i in enumerate(encodes)]
-  decodes = []
-  dec_prob = []
-  positions = []
-  prev = -1
-  for i, code in enumerate(encodes[:length]):
-    if code != lb_void:
-      if prev == lb_void or code != prev:
-        decodes.append(code)
-        dec_prob.append(probs[i])
-        positions.append(i)
-      else:
-        if probs[i] > dec_prob[-1]:
-          dec_prob[-1] = probs[i]
-    prev = code
-  decodes = np.array(decodes)
-  dec_prob = np.array(dec_prob)
-  positions = np.array(positions)
-  return decodes, dec_prob, positions
+  return greedy_decode_batch(x[np.newaxis], [length])[0]
+
+def greedy_decode_batch(x: np.ndarray, lengths, classes=None):
+  """
+  Batched CTC greedy decoder, each run of the same label is decoded as one char
+  with the max probability of the run and the position where the run starts
+  :param x: CTC encoded sequences in an array with a shape of [batch, time, classes], last label as void
+  :param lengths: valid length of each sequence
+  :param classes: if given, only these labels are decoded, void included
+  :return: a list of decoded sequence, probability and position for each char, one for each sequence
+  """
+  batch, steps, n_classes = x.shape
+  lb_void = n_classes - 1
+  if classes is None:
+    encodes = x.argmax(axis=2)
+  else:
+    # argmax over the subset only, the full matrix is never copied or masked
+    classes = np.asarray(classes)
+    encodes = classes[x[:, :, classes].argmax(axis=2)]
+  probs = np.take_along_axis(x, encodes[..., np.newaxis], axis=2)[..., 0]
+  valid = np.arange(steps)[np.newaxis] < np.asarray(lengths)[:, np.newaxis]
+  chars = valid & (encodes != lb_void)
+  prev = np.empty_like(encodes)
+  prev[:, 0] = -1
+  prev[:, 1:] = encodes[:, :-1]
+  starts = chars & (encodes != prev)
+
+  # runs are contiguous among valid non-void steps, so their max can be reduced per run start
+  char_idx = np.flatnonzero(chars)
+  run_idx = np.flatnonzero(starts.ravel()[char_idx])
+  start_idx = char_idx[run_idx]
+  if run_idx.size:
+    run_probs = np.maximum.reduceat(probs.ravel()[char_idx], run_idx)
+  else:
+    run_probs = probs.ravel()[:0]
+  codes = encodes.ravel()[start_idx]
+  positions = start_idx % steps
+  splits = np.cumsum(starts.sum(axis=1))[:-1]
+  return list(zip(np.split(codes, splits), np.split(run_probs, splits), np.split(positions, splits)))
 
 def group_lines(texts: list, iou_threshold: float = 0.4):
   grouped = []
@@ -0,0 +1,108 @@
+"""Geometry of rotated text boxes as arrays
+
+Boxes are (N, 4, 2) arrays of corner points. Rotated rectangles are (N, 5)
+arrays of center x, center y, width, height and angle in degrees, the same
+parameters as `cv2.minAreaRect` returns.
+"""
+import numpy as np
+import cv2
+
+
+def min_area_rects(contours):
+  """
+  Min area rectangles of contours
+  :param contours: a list of contours
+  :return: rotated rectangles in an array with a shape of [n, 5]
+  """
+  rects = [(cx, cy, w, h, angle) for (cx, cy), (w, h), angle in map(cv2.minAreaRect, contours)]
+  return np.array(rects, dtype=np.float64).reshape(-1, 5)
+
+def box_points(rects: np.ndarray):
+  """
+  Corner points of rotated rectangles, in the same order as `cv2.boxPoints`
+  :param rects: rotated rectangles in an array with a shape of [n, 5]
+  :return: boxes in an array with a shape of [n, 4, 2]
+  """
+  cx, cy, w, h, angle = rects.T
+  rad = np.deg2rad(angle)
+  b = np.cos(rad) * 0.5
+  a = np.sin(rad) * 0.5
+  pts = np.empty((rects.shape[0], 4, 2), dtype=rects.dtype)
+  pts[:, 0, 0] = cx - a * h - b * w
+  pts[:, 0, 1] = cy + b * h - a * w
+  pts[:, 1, 0] = cx + a * h - b * w
+  pts[:, 1, 1] = cy - b * h - a * w
+  pts[:, 2] = 2 * rects[:, :2] - pts[:, 0]
+  pts[:, 3] = 2 * rects[:, :2] - pts[:, 1]
+  return pts
+
+def order_points(boxes: np.ndarray):
+  """
+  Order corners as top-left, top-right, bottom-right, bottom-left
+  :param boxes: boxes in an array with a shape of [n, 4, 2]
+  :return: boxes with ordered corners
+  """
+  order = np.argsort(boxes[..., 0], axis=1, kind='stable')
+  pts = np.take_along_axis(boxes, order[..., np.newaxis], axis=1)
+  # of the 2 leftmost and the 2 rightmost points, the upper one comes first
+  swap_left = ~(pts[:, 1, 1] > pts[:, 0, 1])
+  swap_right = ~(pts[:, 3, 1] > pts[:, 2, 1])
+  left = np.where(swap_left[:, np.newaxis, np.newaxis], pts[:, [1, 0]], pts[:, [0, 1]])
+  right = np.where(swap_right[:, np.newaxis, np.newaxis], pts[:, [3, 2]], pts[:, [2, 3]])
+  return np.stack([left[:, 0], right[:, 0], right[:, 1], left[:, 1]], axis=1)
+
+def unclip_rects(rects: np.ndarray, unclip_ratio: float):
+  """
+  Expand rotated rectangles by area * unclip_ratio / perimeter on every side,
+  which is the min area rectangle of the rounded offset polygon of each
+  :param rects: rotated rectangles in an array with a shape of [n, 5]
+  :param unclip_ratio: expansion ratio
+  :return: expanded rotated rectangles
+  """
+  w, h = rects[:, 2], rects[:, 3]
+  distance = w * h * unclip_ratio / (2 * (w + h))
+  expanded = rects.copy()
+  expanded[:, 2] += 2 * distance
+  expanded[:, 3] += 2 * distance
+  return expanded
+
+def clip_boxes(boxes: np.ndarray, w: int, h: int):
+  """
+  Round corners to integers and clip them to the image
+  :param boxes: boxes in an array with a shape of [n, 4, 2]
+  :return: clipped boxes
+  """
+  boxes = np.round(boxes)
+  boxes[..., 0] = np.clip(boxes[..., 0], 0, w)
+  boxes[..., 1] = np.clip(boxes[..., 1], 0, h)
+  return boxes
+
+def calc_angle(boxes: np.ndarray):
+  """
+  Mean skew angle in degrees of boxes more than twice as wide as high
+  :param boxes: boxes with ordered corners in an array with a shape of [n, 4, 2]
+  :return: the mean angle, nan if no box is wide enough
+  """
+  boxes = boxes.reshape(-1, 4, 2)
+  hori_len = np.linalg.norm(boxes[:, 0] - boxes[:, 1], axis=1)
+  vert_len = np.linalg.norm(boxes[:, 1] - boxes[:, 2], axis=1)
+  wide = boxes[hori_len > vert_len * 2]
+  dx, dy = ((wide[:, 1] + wide[:, 2]) / 2 - (wide[:, 0] + wide[:, 3]) / 2).T
+  with np.errstate(divide='ignore', invalid='ignore'):
+    angles = np.arctan(dy / dx) / np.pi * 180
+  if angles.size == 0:
+    return np.nan
+  return angles.mean()
+
+def rotate_lines(lines: np.ndarray, angle: float, w: float, h: float):
+  """
+  Rotate box corners around the image center
+  :param lines: boxes in an array with a shape of [n, 4, 2] or [n, 8]
+  :param angle: rotation angle in degrees, same as `cv2.getRotationMatrix2D`
+  :param w: image width
+  :param h: image height
+  :return: rotated boxes in an array with a shape of [n, 4, 2]
+  """
+  m = cv2.getRotationMatrix2D((w//2, h//2), angle, 1)
+  coords = lines.reshape(-1, 4, 2)
+  return coords @ m[:, :2].T + m[:, 2]
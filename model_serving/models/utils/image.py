@@ -1,40 +1,46 @@
 import logging
 import numpy as np
 import cv2
-try:
-  import pyclipper
-  from shapely.geometry import Polygon
-except ModuleNotFoundError:
-  print('Pyclipper and shapely are not installed.')
 
-def resize_ar(img: np.ndarray, w: int, h: int, method: int =cv2.INTER_AREA):
+def resize_ar(img: np.ndarray, w: int, h: int, method: int =cv2.INTER_AREA, out: np.ndarray = None):
   """
   Resize an image and keep aspect ratio
+  :param out: [h, w, 3] array of any dtype to write the padded image into instead of a new uint8 one
   """
   h0, w0 = img.shape[:2]
-  img_pad = np.zeros((h, w, 3), dtype=np.uint8)
   scale = min(h / h0, w / w0)
   h1 = int(h0 * scale)
   w1 = int(w0 * scale)
+  if out is None:
+    img_pad = np.zeros((h, w, 3), dtype=np.uint8)
+  else:
+    # only the padding is cleared, the rest is overwritten
+    img_pad = out
+    img_pad[h1:] = 0
+    img_pad[:h1, w1:] = 0
   img_pad[:h1, :w1] = cv2.resize(img, (w1, h1), method)
   return img_pad, scale
 
-def resize_h(img: np.ndarray, h: int, w: int, logger: logging.Logger):
+def resize_h(img: np.ndarray, h: int, w: int, logger: logging.Logger, out: np.ndarray = None):
   """
   Resize the image to a specified height,
   pad to ensure width is divisible by div
   :param img: original image
   :param h: target height
   :param w: target width
+  :param out: [h, w, 3] array or view of any dtype to write the padded image into instead of a new one,
+    e.g. the transposed view of a CHW input blob
   :return: resized image with padding
   """
   h0, w0 = img.shape[:2]
   w1 = int(h / h0 * w0)
   img_resize = cv2.resize(img, (w1, h), cv2.INTER_AREA)
-  img_pad = np.ones((h, w, 3), dtype=img_resize.dtype) * 200
+  img_pad = np.full((h, w, 3), 200, dtype=img_resize.dtype) if out is None else out
   if img_resize.shape[1] > img_pad.shape[1]:
     logger.warn(f"Resized Image width {w1} > {w}, rightmost part cut off")
     img_resize = img_resize[:, :img_pad.shape[1], :]
+  if out is not None:
+    img_pad[:, img_resize.shape[1]:, :] = 200
   img_pad[:, :img_resize.shape[1], :] = img_resize
   return img_pad, img_resize
 
@@ -73,93 +79,100 @@ def nms(boxes: np.ndarray, scores: np.ndarray, iou_th: float):
   return final_boxes, final_scores
 
 def get_rect(polygons: np.ndarray, min_wh_ratio: float = 0):
+  """
+  Get rectangles from polygons
+  :param polygons: array with a shape of [n, 8], only the first 8 numbers are used if wider
+  :param min_wh_ratio: minimum width-height ratio of a valid rectangle
+  :return: rectangles in an array with a shape of [n, 4]
+  """
   polygons = polygons[:, :8]
   rects = []
   for polygon in polygons:
     pts = polygon.reshape(4, 2)
-    x0 = pts[:, 0].min()
-    x1 = pts[:, 0].max()
-    y0 = pts[:2, 1].mean()
-    y1 = pts[2:, 1].mean()
+    x0, x1 = pts[:, 0].min(), pts[:, 0].max()
+    y0, y1 = pts[:2, 1].mean(), pts[2:, 1].mean()
+    if y1 - y0 < 8 or x1 - x0 < 8: continue
     if (x1 - x0) / (y1 - y0) > min_wh_ratio:
       rects.append([x0, y0, x1, y1])
   rects = np.array(rects)
   return rects
 
 def get_chips(img: np.ndarray, boxes: np.ndarray):
+  """
+  Crop image chips
+  :param img: image to crop chips from
+  :param boxes: non-negative boxes in an array with a shape of [n, 4]
+  :return: a list of chips
+  """
   assert len(boxes.shape) == 2 and boxes.shape[1] == 4
   assert (boxes >= 0).all(), 'expect all coords to be non-negative'
-  chips = np.array([img[b[1]:b[3], b[0]:b[2]]for b in boxes.astype(np.int32)])
+  chips = []
+  for b in boxes.astype(int):
+    x1 = min(max(b[0], 0), img.shape[1] - 2)
+    x2 = max(b[2], x1 + 1)
+    y1 = min(max(b[1], 0), img.shape[0] - 2)
+    y2 = max(b[3], y1 + 1)
+    chips.append(img[y1:y2, x1:x2])
   return chips
 
+def merge(boxes: np.ndarray, viou_threshold: float = 0.6):
+  """
+  Merge overlapping or very close boxes
+  :param boxes: boxes in an array with a shape of [n, 4]
+  :param viou_threshold: vertical IOU threshold to consider two boxes for merging
+  :return: a list of merged boxes
+  """
+  merged_boxes = []
+  skip = [False] * len(boxes)
+  for i in range(len(boxes)):
+    if skip[i]: continue
+    b1 = boxes[i]
+    for j in range(i+1, len(boxes)):
+      if skip[j]: continue
+      b2 = boxes[j]
+      if (b2[0] < b1[0] < b2[2]) or (b1[0] < b2[0] < b1[2]):
+        v_iou = ((min(b1[3], b2[3]) - max(b1[1], b2[1])) /
+                 (max(b1[3], b2[3]) - min(b1[1], b2[1])))
+        if v_iou > viou_threshold:
+          skip[j] = True
+          b1[0] = min(b1[0], b2[0])
+          b1[1] = min(b1[1], b2[1])
+          b1[2] = max(b1[2], b2[2])
+          b1[3] = max(b1[3], b2[3])
+    merged_boxes.append(b1)
+  return merged_boxes
+
+def rotate(img: np.ndarray, angle: float):
+  rot_m = cv2.getRotationMatrix2D((img.shape[1]//2, img.shape[0]//2), angle, 1)
+  out_shape = (img.shape[1], img.shape[0])
+  img = cv2.warpAffine(img, rot_m, out_shape, cv2.INTER_CUBIC)
+  return img
+
+def crop_lines(img: np.ndarray, lines: np.ndarray, angle: float, min_wh_ratio: float = 0.5):
+  """
+  Turn detected text lines into recognition chips,
+  same steps as `InsuranceReader.read_page_sync` does on the client side
+  :param img: image the lines are detected on
+  :param lines: detected lines in an array with a shape of [n, 8]
+  :param angle: detected skew angle
+  :param min_wh_ratio: minimum width-height ratio of a valid box
+  :return: boxes in an array with a shape of [n, 4] and a chip for each box,
+    no boxes are returned when less than 2 lines or boxes are found
+  """
+  if lines.shape[0] < 2:
+    return np.zeros((0, 4), dtype=np.float32), []
+  lines = lines.copy()
+  lines[lines < 0] = 0
+  boxes = np.array(merge(get_rect(lines, min_wh_ratio=min_wh_ratio)))
+  if boxes.shape[0] < 2:
+    return np.zeros((0, 4), dtype=np.float32), []
+  if np.abs(angle) > 0.1:
+    img = rotate(img, angle)
+  chips = get_chips(img, boxes)
+  return boxes.astype(np.float32), chips
+
 def match(img: np.ndarray, target: np.ndarray, method=cv2.TM_CCOEFF_NORMED, blur=5):
   img_blur = cv2.GaussianBlur(img, (blur, blur), 0)
   target_blur = cv2.GaussianBlur(target, (blur, blur), 0)
   res = cv2.matchTemplate(img_blur, target_blur, method)
   return res
-
-def get_min_box(contour):
-    bbox = cv2.minAreaRect(contour)
-    pts = sorted(list(cv2.boxPoints(bbox)), key=lambda x: x[0])
-    if pts[1][1] > pts[0][1]:
-      idx1, idx4 = 0, 1
-    else:
-      idx1, idx4 = 1, 0
-    if pts[3][1] > pts[2][1]:
-      idx2, idx3 = 2, 3
-    else:
-      idx2, idx3 = 3, 2
-    box = np.array(pts)[[idx1, idx2, idx3, idx4], ...]
-    ssize = min(bbox[1])
-    return box, ssize
-
-def get_score(pred, contour):
-    h, w = pred.shape
-    c = contour.copy()
-    xmin = np.clip(np.floor(c[:, 0].min()).astype(np.int), 0, w - 1)
-    xmax = np.clip(np.ceil(c[:, 0].max()).astype(np.int), 0, w - 1)
-    ymin = np.clip(np.floor(c[:, 1].min()).astype(np.int), 0, h - 1)
-    ymax = np.clip(np.ceil(c[:, 1].max()).astype(np.int), 0, h - 1)
-    mask = np.zeros((ymax - ymin + 1, xmax - xmin + 1), dtype=np.uint8)
-    c[:, 0] -= xmin
-    c[:, 1] -= ymin
-    cv2.fillPoly(mask, c.reshape(1, -1, 2).astype(np.int32), 1)
-    score = cv2.mean(pred[ymin: ymax + 1, xmin: xmax + 1], mask)[0]
-    return score
-
-def unclip(box, unclip_ratio):
-    poly = Polygon(box)
-    distance = poly.area * unclip_ratio / poly.length
-    offset = pyclipper.PyclipperOffset()
-    offset.AddPath(box, pyclipper.JT_ROUND, pyclipper.ET_CLOSEDPOLYGON)
-    expanded = np.array(offset.Execute(distance))
-    return expanded
-
-def dist(pt1: np.array, pt2: np.array):
-  """Calculate the distance between 2 points
-  """
-  dist = np.sqrt(np.square(np.abs(pt1 - pt2)).sum())
-  return dist
-
-def calc_angle(lines):
-    angles = []
-    lines = lines.reshape(-1, 8)
-    for line in lines:
-      hori_len = dist(line[:2], line[2:4])
-      vert_len = dist(line[2:4], line[4:6])
-      if hori_len > vert_len * 2:
-        left = (line[:2] + line[6:8]) / 2
-        right = (line[2:4] + line[4:6]) / 2
-        dx, dy = right - left
-        angle = np.arctan(dy / dx) / np.pi * 180
-        angles.append(angle)
-    angle = np.mean(angles)
-    return angle
-
-def rotate_lines(lines, angle, w, h):
-    coords = lines[:, :8]
-    coords = coords.reshape(-1, 2)
-    coords = np.concatenate([coords, np.ones((coords.shape[0], 1))], axis=1)
-    m = cv2.getRotationMatrix2D((w//2, h//2), angle, 1)
-    coords = np.dot(m, coords.transpose()).transpose()
-    return coords
@@ -0,0 +1,178 @@
+"""Health-aware routing of client calls over the model servers of `ip_pool`
+
+Without it, every call walks `ip_pool` in order and checks each server
+before using it, so that a dead local server costs a timeout on every card.
+A `Router` keeps the health of each server instead: the moving average of
+its latency for each network, and a circuit breaker opened by recent
+errors. Calls go straight to the fastest server whose breaker is closed.
+An open breaker keeps its server out of calls for `open_time` seconds,
+then half-opens and lets a single call or probe through, whose result
+closes or opens it again. While every breaker is open, calls fail at once
+instead of waiting for the timeout of a server known to be down. A
+background thread probes every server between calls, so that most failures
+are found and most breakers closed by probes rather than by calls.
+"""
+import collections
+import threading
+import time
+
+from .metrics import REGISTRY
+
+
+CLOSED, HALF_OPEN, OPEN = 'closed', 'half_open', 'open'
+STATES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class Router:
+  """Orders the servers of a client by health and latency
+
+  Args:
+    ips: Servers in order of preference, e.g. `ip_pool` with the local server first
+    logger: A logging.Logger
+    probe: A callable taking an ip and returning whether the server is healthy, `None` to skip the probe
+    alpha: Weight of the latest call in the moving average of the latency
+    failure_threshold: Errors within `error_window` seconds opening the breaker of a server
+    error_window: Seconds errors are counted for
+    open_time: Seconds an open breaker keeps its server out of calls before half-opening
+    probe_interval: Seconds between probes of all servers, no probes if 0
+    registry: The metrics `Registry`
+  """
+  def __init__(self, ips, logger, probe=None, alpha=0.2, failure_threshold=3, error_window=30., open_time=10.,
+               probe_interval=5., registry=REGISTRY):
+    self.ips = list(ips)
+    self.logger = logger
+    self.probe = probe
+    self.alpha = alpha
+    self.failure_threshold = failure_threshold
+    self.error_window = error_window
+    self.open_time = open_time
+    self.probe_interval = probe_interval
+    self.lock = threading.Lock()
+    self.state = {ip: CLOSED for ip in self.ips}
+    self.t_opened = {ip: None for ip in self.ips}
+    # whether the single call or probe of a half-open breaker is running
+    self.trial = {ip: False for ip in self.ips}
+    self.errors = {ip: collections.deque() for ip in self.ips}
+    self.latency = {}
+    self.transitions = registry.counter('model_client_breaker_transitions_total', 'Circuit breaker state changes',
+                                        ['ip', 'state'])
+    self.probes = registry.counter('model_client_probes_total', 'Background probes of a server', ['ip', 'result'])
+    self.latency_gauge = registry.gauge('model_client_server_latency_seconds', 'Moving average of the call latency',
+                                        ['ip', 'network'])
+    state = registry.gauge('model_client_breaker_state', 'Circuit breaker of a server, 0 closed, 1 half open, 2 open',
+                           ['ip'])
+    for ip in self.ips:
+      state.labels(ip).set_function(lambda ip=ip: STATES[self.state[ip]])
+    self.stopped = threading.Event()
+    self.thread = None
+
+  def _set_state(self, ip, state):
+    """Moves the breaker of `ip` to `state`, called with the lock held"""
+    if self.state[ip] == state: return
+    self.state[ip] = state
+    self.trial[ip] = False
+    if state == OPEN: self.t_opened[ip] = time.monotonic()
+    self.transitions.labels(ip, state).inc()
+    self.logger.warning(f'Circuit breaker of model_server @ {ip} {state.replace("_", " ")}')
+
+  def _half_open_expired(self, now):
+    for ip in self.ips:
+      if self.state[ip] == OPEN and now - self.t_opened[ip] >= self.open_time:
+        self._set_state(ip, HALF_OPEN)
+
+  def _rank(self, network):
+    # unmeasured servers first so that each is measured once, then the fastest, in order of preference on ties
+    def key(ip):
+      return self.latency.get((ip, network), 0.), self.ips.index(ip)
+    return key
+
+  def route(self, network):
+    """Servers to try in turn for a call of `network`
+
+    Servers with a closed breaker come first, fastest first, then half-open
+    ones for their trial call. Servers with an open breaker are never
+    called, none are left when all breakers are open. Each server is taken
+    with `begin` before it is called.
+    """
+    with self.lock:
+      self._half_open_expired(time.monotonic())
+      closed = sorted((ip for ip in self.ips if self.state[ip] == CLOSED), key=self._rank(network))
+      half_open = [ip for ip in self.ips if self.state[ip] == HALF_OPEN]
+      return closed + half_open
+
+  def begin(self, ip):
+    """Whether a call may go to `ip` now, taking the trial of a half-open breaker"""
+    with self.lock:
+      if self.state[ip] != HALF_OPEN: return True
+      if self.trial[ip]: return False
+      self.trial[ip] = True
+      return True
+
+  def record(self, ip, network=None, elapsed=None, ok=True):
+    """Result of a call or probe on `ip`, a successful call of `network` updates its latency"""
+    with self.lock:
+      now = time.monotonic()
+      if ok:
+        self.errors[ip].clear()
+        if network is not None and elapsed is not None:
+          latency = self.latency.get((ip, network))
+          self.latency[(ip, network)] = elapsed if latency is None else (1 - self.alpha) * latency + self.alpha * elapsed
+          self.latency_gauge.labels(ip, network).set(self.latency[(ip, network)])
+        self._set_state(ip, CLOSED)
+        return
+      errors = self.errors[ip]
+      errors.append(now)
+      while errors and now - errors[0] > self.error_window:
+        errors.popleft()
+      if self.state[ip] == HALF_OPEN or len(errors) >= self.failure_threshold:
+        self._set_state(ip, OPEN)
+      elif self.state[ip] == OPEN:
+        # a call started before the breaker opened failed, the server stays out for another `open_time`
+        self.t_opened[ip] = now
+
+  def cancel(self, ip):
+    """Gives the trial taken by `begin` back when its call ended without a verdict, e.g. an overload"""
+    with self.lock:
+      self.trial[ip] = False
+
+  def _probe_all(self):
+    for ip in self.ips:
+      with self.lock:
+        self._half_open_expired(time.monotonic())
+        # open breakers wait for `open_time`, a half-open one for its running trial
+        if self.state[ip] == OPEN or self.trial[ip]: continue
+        half_open = self.state[ip] == HALF_OPEN
+        if half_open: self.trial[ip] = True
+      try:
+        ok = self.probe(ip)
+      except Exception as e:
+        self.logger.error(f'Probe of model_server @ {ip} failed: {e}')
+        ok = False
+      if ok is None:
+        # not probed, e.g. restarting
+        if half_open: self.cancel(ip)
+        continue
+      self.probes.labels(ip, 'ok' if ok else 'failed').inc()
+      self.record(ip, ok=ok)
+
+  def _loop(self):
+    while not self.stopped.wait(self.probe_interval):
+      self._probe_all()
+
+  def start(self):
+    """Starts probing the servers in a background thread"""
+    if self.probe is None or not self.probe_interval: return
+    self.thread = threading.Thread(target=self._loop, name='model-client-probe', daemon=True)
+    self.thread.start()
+
+  def stop(self):
+    self.stopped.set()
+
+
+def get_router(config, logger, probe=None):
+  """The router configured by `grpc.routing` over `ip_pool`, `None` if disabled"""
+  routing_config = config['grpc'].get('routing', {})
+  if not routing_config.get('enabled', False): return None
+  ips = [config['grpc']['ip'], *config['grpc']['remote']]
+  options = {k: v for k, v in routing_config.items() if k != 'enabled'}
+  return Router(ips, logger, probe=probe, **options)
@@ -0,0 +1,117 @@
+"""Cross-session micro-batching for text recognition"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+
+class _Job:
+  """A single chip waiting to be recognized"""
+  __slots__ = ('img', 'num_only', 'future', 't_submit')
+
+  def __init__(self, img, num_only):
+    self.img = img
+    self.num_only = num_only
+    self.future = Future()
+    self.t_submit = time.monotonic()
+
+
+class DenseScheduler:
+  """Queues recognition chips per model key and runs them in micro-batches.
+
+  Chips submitted from any RPC or session are pooled by recognition key
+  (192/1024/1408). A batch is dispatched to the device once `max_batch` chips
+  of a key are waiting, or once the oldest waiting chip has been queued for
+  `max_wait` seconds. Each caller gets a `Future` that resolves to its own
+  `(codes, probs, positions)`.
+
+  Args:
+    models: A dict mapping recognition keys to Dense8 models
+    logger: A logging.Logger
+    max_batch: Maximum number of chips in a batch
+    max_wait: Maximum time in seconds a chip waits for its batch to fill up
+  """
+  def __init__(self, models, logger, max_batch=6, max_wait=0.005):
+    self.models = models
+    self.logger = logger
+    self.max_batch = max(int(max_batch), 1)
+    self.max_wait = float(max_wait)
+    self.queues = {k: deque() for k in models}
+    self.cond = threading.Condition()
+    self.running = True
+    self.worker = threading.Thread(target=self._loop, name='dense-scheduler', daemon=True)
+    self.worker.start()
+    self.logger.info(f'Dense scheduler started, max batch: {self.max_batch}, max wait: {self.max_wait}s')
+
+  def submit(self, img, key, num_only=False):
+    """Queues a chip for recognition.
+
+    Args:
+      img: Image chip as an np.ndarray
+      key: Recognition key the chip should be run with
+      num_only: Whether only numbers should be decoded
+
+    Returns:
+      A `concurrent.futures.Future` resolving to `(codes, probs, positions)`
+    """
+    if key not in self.queues:
+      raise KeyError(f'Recognition model {key} is not loaded')
+    job = _Job(img, num_only)
+    with self.cond:
+      if not self.running:
+        raise RuntimeError('Dense scheduler has been closed')
+      self.queues[key].append(job)
+      self.cond.notify()
+    return job.future
+
+  def close(self):
+    """Stops the dispatcher after the queued chips have been processed"""
+    with self.cond:
+      self.running = False
+      self.cond.notify()
+    self.worker.join()
+
+  def _next_batch(self):
+    """Waits for a key whose batch is full or has timed out, then pops it"""
+    with self.cond:
+      while True:
+        now = time.monotonic()
+        ready_key = None
+        t_oldest = None
+        t_wake = None
+        for key, queue in self.queues.items():
+          if not queue: continue
+          t_head = queue[0].t_submit
+          if len(queue) >= self.max_batch or now - t_head >= self.max_wait or not self.running:
+            # serve the key that has waited longest first
+            if t_oldest is None or t_head < t_oldest:
+              ready_key, t_oldest = key, t_head
+          else:
+            t_due = t_head + self.max_wait
+            t_wake = t_due if t_wake is None else min(t_wake, t_due)
+        if ready_key is not None:
+          queue = self.queues[ready_key]
+          n = min(len(queue), self.max_batch)
+          return ready_key, [queue.popleft() for _ in range(n)]
+        if not self.running:
+          return None, []
+        self.cond.wait(None if t_wake is None else max(t_wake - now, 0))
+
+  def _run_batch(self, key, jobs):
+    """Runs a batch of chips of the same key on the device"""
+    model = self.models[key]
+    try:
+      results = model.infer_batch([job.img for job in jobs], [job.num_only for job in jobs])
+    except Exception as e:
+      self.logger.error(f'Failed to run recognition with model {key}: {e}')
+      for job in jobs: job.future.set_exception(e)
+      return
+    for job, res in zip(jobs, results):
+      job.future.set_result(res)
+    self.logger.debug(f'Dense scheduler ran a batch of {len(jobs)} chips with model {key}')
+
+  def _loop(self):
+    while True:
+      key, jobs = self._next_batch()
+      if key is None: break
+      self._run_batch(key, jobs)
@@ -1,16 +1,30 @@
 from concurrent import futures
+import asyncio
 import logging
+import queue
+import threading
+import time
 from pathlib import Path
 import grpc
 import yaml
 import numpy as np
 import cv2
-from openvino.inference_engine import IECore
 
 from . import models
 from . import model_serving_pb2
 from . import model_serving_pb2_grpc
-from .utils import get_logger, decode_img, pad1d, load_conf
+from .utils import get_logger, decode_img, pad1d, load_conf, get_dense_key, get_layout
+from .models.utils.image import crop_lines
+from .models.backends.openvino_backend import OpenVINOBackend
+from .models.backends.stub_backend import StubBackend
+from .scheduler import DenseScheduler
+from .shm import SharedImageReader
+from .health import HealthProber, health_response, start_health_server
+from .channels import server_keepalive_options
+from .metrics import REGISTRY, RpcMetrics, MetricsInterceptor, start_metrics_server
+from .cache import ResultCache, get_cache
+from .balancer import DeviceBalancer, replicas
+from .admission import AdmissionInterceptor, CountingThreadPool, get_admission
 
 
 class ModelServer(model_serving_pb2_grpc.ModelServerServicer):
@@ -22,68 +36,178 @@ class ModelServer(model_serving_pb2_grpc.ModelServerServicer):
     self.logger.info('Starting to init model server...')
     self.ie_core = ie_core
     self.model_folder = Path(config['model_folder'])
-    if not self.model_folder.exists():
+    # stubs only read the folder to replay recorded outputs
+    stubbed = all(config['grpc'][k].endswith('Stub') for k in ('det_model', 'recog_model'))
+    if not self.model_folder.exists() and not stubbed:
       raise ValueError(f"Model folder {str(self.model_folder)} does not exists. Check your model_server_config.yaml.")
-    self._load_det()
-    self._load_recog()
-    self._load_test()
+    self._load_models()
+    self.shm_images = SharedImageReader(self.logger)
+    self.cache = get_cache(config)
+    self.health = HealthProber(self._run_check, interval=config['grpc'].get('health', {}).get('interval', 10),
+                               logger=self.logger)
+    # set by `warm_up`, reported by `Ready` with the warm-up latencies in ms
+    self.ready = threading.Event()
+    self.warm_up_ms = {}
 
-  def _det_params(self):
-    model = self.config["grpc"]["det_model"]
-    model_tag = model.lower().replace("openvino", "").replace("armnn", "")
+  def _devices(self, model_tag):
+    """Devices of a model, `dev` is a name or a list of names"""
     dev = self.config[model_tag]['dev']
+    return [dev] if isinstance(dev, str) else list(dev)
+
+  def _precision(self, model_tag, dev):
     subfolder = self.config[model_tag].get('precision', None)
     if subfolder is None:
-      if dev == 'MYRIAD': subfolder = 'FP16'
-      elif dev == 'CPU': subfolder = 'FP32'
-      else: raise NotImplementedError(f"CTPNP is not implemented for {dev}")
+      # MYRIAD.1.1 is one of several sticks
+      base = dev.split('.')[0]
+      if base == 'MYRIAD': subfolder = 'FP16'
+      elif base == 'CPU': subfolder = 'FP32'
+      else: raise NotImplementedError(f"{model_tag} is not implemented for {dev}")
+    return subfolder
+
+  def _det_tag(self):
+    """Config section of the detection model, the class name without its engine"""
+    model = self.config["grpc"]["det_model"].lower()
+    for engine in ("openvino", "onnxruntime", "armnn", "stub"):
+      model = model.replace(engine, "")
+    return model
+
+  def _det_params(self, dev=None):
+    model = self.config["grpc"]["det_model"]
+    model_tag = self._det_tag()
+    if dev is None: dev = self._devices(model_tag)[0]
+    subfolder = self._precision(model_tag, dev)
     path_portrait = str(self.model_folder / subfolder / self.config[model_tag]['model_path']['portrait'])
     path_landscape = str(self.model_folder / subfolder / self.config[model_tag]['model_path']['landscape'])
     batch_size = self.config[model_tag]['usb_batch_size']
     return model, path_portrait, path_landscape, dev, batch_size
 
-  def _dense8_params(self):
+  def _dense8_params(self, dev=None):
     model = self.config["grpc"]["recog_model"]
-    dev = self.config['dense8']['dev']
-    subfolder = self.config['dense8'].get('precision', None)
-    if subfolder is None:
-      if dev == 'MYRIAD':
-        subfolder = 'FP16'
-      elif dev == 'CPU':
-        subfolder = 'FP32'
-      else:
-        raise NotImplementedError(f"Dense8 is not implemented for {dev}")
+    if dev is None: dev = self._devices('dense8')[0]
+    subfolder = self._precision('dense8', dev)
     paths = self.config["dense8"]["model_list"]
     paths = {k : str(self.model_folder / subfolder / v) for k, v in paths.items()}
     batch_size = self.config['dense8']['usb_batch_size']
     return model, paths, dev, batch_size
 
-  def _load_det(self):
-    self.det = {}
-    model, path_portrait, path_landscape, dev, batch_size = self._det_params()
-    options = {
-      "ie_core": self.ie_core,
-      "dev": dev,
-      "logger": self.logger,
-      "num_requests": batch_size,
-    }
-    self.det['portrait'] = getattr(models, model)(path_portrait, **options)
-    self.det['landscape'] = getattr(models, model)(path_landscape, **options)
-    self.logger.info('Detector models loaded.')
-
-  def _load_recog(self):
-    model, paths, dev, batch_size = self._dense8_params()
-    options = {
-      "ie_core": self.ie_core,
-      "dev": dev,
-      "logger": self.logger,
-      "num_requests": batch_size,
-    }
-    self.recog = {k: getattr(models, model)(p, **options) for k, p in paths.items()}
-    self.logger.info('Recognizer models loaded.')
+  def _set_cache_dir(self, cache_dir):
+    """Lets OpenVINO keep compiled networks in `cache_dir` and import them on the next start"""
+    Path(cache_dir).mkdir(parents=True, exist_ok=True)
+    devs = {dev for tag in ('dbnet', 'dense8', 'check_model') for dev in self._devices(tag)}
+    for dev in sorted(devs):
+      try:
+        self.ie_core.set_config({'CACHE_DIR': str(cache_dir)}, dev)
+      except Exception as e:
+        self.logger.warning(f'Compiled network cache is not available on {dev}: {e}')
+
+  def _timed_load(self, name, fn, *args, **kwargs):
+    t0 = time.perf_counter()
+    res = fn(*args, **kwargs)
+    self.load_times[name] = time.perf_counter() - t0
+    self.logger.info(f'Loaded {name} in {self.load_times[name]:.2f}s')
+    return res
+
+  def _load_models(self):
+    """Loads all models concurrently and logs the load time of each"""
+    cache_dir = self.config.get('cache_dir', None)
+    if cache_dir is not None and self.ie_core is not None: self._set_cache_dir(cache_dir)
+    self.load_times = {}
+    t0 = time.perf_counter()
+    workers = self.config.get('load_workers', 1)
+    with futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix='load') as pool:
+      det = self._load_det(pool)
+      recog = self._load_recog(pool)
+      test = pool.submit(self._timed_load, 'check_model', self._load_test)
+      self.det = {k: self._balanced(f'det/{k}', fs) for k, fs in det.items()}
+      self.logger.info('Detector models loaded.')
+      self.recog = {k: self._balanced(f'recog/{k}', fs) for k, fs in recog.items()}
+      self.logger.info('Recognizer models loaded.')
+      test.result()
+    self._init_scheduler()
+    breakdown = ', '.join(f'{k} {v:.2f}s' for k, v in sorted(self.load_times.items(), key=lambda x: -x[1]))
+    self.logger.info(f'All models loaded in {time.perf_counter() - t0:.2f}s with {workers} workers ({breakdown})')
+
+  def _load_name(self, name, dev, devs):
+    return name if len(devs) == 1 else f'{name}@{dev}'
+
+  def _load_det(self, pool):
+    """Submits loading of detection models, returns futures by layout and device"""
+    model_tag = self._det_tag()
+    devs = self._devices(model_tag)
+    loads = {'portrait': {}, 'landscape': {}}
+    for dev in devs:
+      model, path_portrait, path_landscape, dev, batch_size = self._det_params(dev)
+      options = {
+        "ie_core": self.ie_core,
+        "dev": dev,
+        "logger": self.logger,
+        "num_requests": batch_size,
+        **self.config[model_tag].get('onnxruntime', {}),
+        **self.config[model_tag].get('stub', {}),
+      }
+      paths = {'portrait': path_portrait, 'landscape': path_landscape}
+      for k, p in paths.items():
+        loads[k][dev] = pool.submit(self._timed_load, self._load_name(f'det/{k}', dev, devs),
+                                    getattr(models, model), p, **options)
+    return loads
+
+  def _load_recog(self, pool):
+    """Submits loading of recognition models, returns futures by key and device"""
+    devs = self._devices('dense8')
+    loads = {}
+    for dev in devs:
+      model, paths, dev, batch_size = self._dense8_params(dev)
+      options = {
+        "ie_core": self.ie_core,
+        "dev": dev,
+        "logger": self.logger,
+        "num_requests": batch_size,
+        "tensor_batch_size": self.config['dense8'].get('tensor_batch_size', 1),
+        **self.config['dense8'].get('onnxruntime', {}),
+        **self.config['dense8'].get('stub', {}),
+      }
+      for k, p in paths.items():
+        loads.setdefault(k, {})[dev] = pool.submit(self._timed_load, self._load_name(f'recog/{k}', dev, devs),
+                                                   getattr(models, model), p, **options)
+    return loads
+
+  def _balanced(self, name, loads):
+    """The model loaded on a single device, or a `DeviceBalancer` over all of them"""
+    replicas = {dev: f.result() for dev, f in loads.items()}
+    if len(replicas) == 1: return next(iter(replicas.values()))
+    balancer_config = self.config.get('balancer', {})
+    return DeviceBalancer(replicas, name=name, logger=self.logger,
+                          alpha=balancer_config.get('alpha', 0.2), cooldown=balancer_config.get('cooldown', 30))
+
+  def _init_scheduler(self):
+    batch_size = self.config['dense8']['usb_batch_size']
+    self.scheduler = None
+    scheduler_config = self.config['dense8'].get('scheduler', {})
+    if scheduler_config.get('enabled', False):
+      max_batch = scheduler_config.get('max_batch', batch_size)
+      # a batch never needs more infer requests than a model has
+      capacity = min(m.batch_size if m.batch_backend is not None else m.req_ids.size for m in self.recog.values())
+      if max_batch > capacity:
+        self.logger.warning(f'Dense scheduler max_batch {max_batch} clamped to {capacity} infer requests')
+        max_batch = capacity
+      self.scheduler = DenseScheduler(
+        self.recog,
+        logger=self.logger,
+        max_batch=max_batch,
+        max_wait=scheduler_config.get('max_wait', 0.005),
+      )
 
   def _load_test(self):
     test_config = self.config['check_model']
+    # checks from the RPC and the health prober share the infer requests of the test model
+    self.check_lock = threading.Lock()
+    if test_config.get('stub', False):
+      # the check passes as long as infer requests run
+      self.test_model = StubBackend([1, 8], lambda x: x.copy(), num_requests=test_config['usb_batch_size'])
+      self.test_in = [np.full((1, 8), idx, dtype=np.float32) for idx in range(2)]
+      self.test_ref_out = [x.copy() for x in self.test_in]
+      self.logger.info('Stub test model loaded.')
+      return
     model_folder = Path(test_config['model_folder'])
     stem = str(model_folder / test_config['model'])
     data_folder = Path(test_config['data_folder'])
@@ -91,74 +215,301 @@ class ModelServer(model_serving_pb2_grpc.ModelServerServicer):
     output_paths = [str(data_folder / fname) for fname in test_config['ref_output']]
     if test_config['dev'] == 'CPU':
       net = self.ie_core.read_network(model=stem+'.xml', weights=stem+'.bin')
-      self.test_model = self.ie_core.load_network(net, 'CPU', num_requests=test_config['usb_batch_size'])
+      exe = self.ie_core.load_network(net, 'CPU', num_requests=test_config['usb_batch_size'])
     else:
-      self.test_model = self.ie_core.import_network(stem, test_config['dev'], num_requests=test_config['usb_batch_size'])
+      exe = self.ie_core.import_network(stem, test_config['dev'], num_requests=test_config['usb_batch_size'])
+    self.test_model = OpenVINOBackend(exe)
     self.test_in = [np.load(p) for p in input_paths]
     self.test_ref_out = [np.load(p) for p in output_paths]
-    self.test_in_name = list(self.test_model.input_info.keys())[0]
-    self.test_out_name = list(self.test_model.outputs.keys())[0]
     self.logger.info('Test model and data loaded.')
 
-  def Check(self, request, context):
-    sess_id = request.sess_id
-    self.logger.info('Tests started')
-    reqs = []
-    for idx, (test_in, test_ref_out) in enumerate(zip(self.test_in, self.test_ref_out)):
-      reqs.append(self.test_model.start_async(self.test_model.get_idle_request_id(), {self.test_in_name: test_in}))
+  def _warm_up_inputs(self):
+    """Blank detection images by layout and blank chips by recognition width bucket"""
+    det_imgs = {k: np.zeros((m.input_h, m.input_w, 3), dtype=np.uint8) for k, m in self.det.items()}
+    chips = {k: np.full((64, k, 3), 200, dtype=np.uint8) for k in self.recog}
+    return det_imgs, chips
+
+  @staticmethod
+  def _replicas(name, model):
+    """Replicas of a model by name, with the device of each one if it is balanced"""
+    return {name if dev is None else f'{name}@{dev}': m for dev, m in replicas(model).items()}
+
+  @staticmethod
+  def _recog_warm_up(model, chip):
+    """Runs a recognition model once on every infer request, and on its batch backend if any"""
+    ctxs = []
+    for _ in range(model.req_ids.size):
+      # only the first request may wait, holding some while waiting for more could deadlock with the scheduler
+      ctx = model.infer_async(chip, block=not ctxs)
+      if ctx is None: break
+      ctxs.append(ctx)
+    for ctx in ctxs:
+      model.get_result(ctx)
+    if model.batch_backend is not None:
+      model.infer_batch([chip] * model.batch_size, [False] * model.batch_size)
+
+  def _warm_up_runs(self):
+    """Callables running each model once on every infer request of every device"""
+    det_imgs, chips = self._warm_up_inputs()
+    def det_run(model, layout):
+      for _ in range(model.req_ids.size):
+        model.infer_sync(det_imgs[layout])
+    runs = []
+    for k, model in self.det.items():
+      runs += [(name, lambda m=m, k=k: det_run(m, k)) for name, m in self._replicas(f'det/{k}', model).items()]
+    for k, model in self.recog.items():
+      runs += [(name, lambda m=m, k=k: self._recog_warm_up(m, chips[k]))
+               for name, m in self._replicas(f'recog/{k}', model).items()]
+    runs.append(('check_model', self._run_check))
+    return runs
+
+  def _record_warm_up(self, name, times):
+    first_ms, warm_ms = (t * 1000 for t in times)
+    self.warm_up_ms[name] = (first_ms, warm_ms)
+    self.logger.info(f'Warmed up {name}: {first_ms:.1f}ms, then {warm_ms:.1f}ms')
+
+  def warm_up(self):
+    """Runs every model twice on synthetic inputs, then marks the server ready"""
+    if self.config['grpc'].get('warm_up', True):
+      t0 = time.perf_counter()
+      for name, run in self._warm_up_runs():
+        times = []
+        for _ in range(2):
+          t1 = time.perf_counter()
+          run()
+          times.append(time.perf_counter() - t1)
+        self._record_warm_up(name, times)
+      self.logger.info(f'Warm-up done in {time.perf_counter() - t0:.2f}s')
+    self.ready.set()
+
+  def Ready(self, request, context):
+    models = [model_serving_pb2.ModelWarmup(name=k, first_ms=v[0], warm_ms=v[1]) for k, v in self.warm_up_ms.items()]
+    return model_serving_pb2.ReadyResponse(sess_id=request.sess_id, ready=self.ready.is_set(), models=models)
+
+  def _request_pools(self):
+    """Infer request pools by model name, as `(size, in use, waiting)` callables"""
+    pools = {}
+    for k, model in self.det.items():
+      pools.update({name: m.req_ids for name, m in self._replicas(f'det/{k}', model).items()})
+    for k, model in self.recog.items():
+      for name, m in self._replicas(f'recog/{k}', model).items():
+        pools[name] = m.req_ids
+        if m.batch_backend is not None: pools[f'{name}/batch'] = m.batch_backend.req_ids
+    return {k: (lambda r=r: r.size, lambda r=r: r.in_use, None) for k, r in pools.items()}
+
+  def register_metrics(self, registry=REGISTRY, executor=None):
+    """Adds gauges of infer request pools and queues, read on every scrape
+
+    Args:
+      registry: The metrics `Registry`
+      executor: The `CountingThreadPool` of the server, counting RPCs waiting for a thread
+    """
+    size = registry.gauge('model_server_infer_requests', 'Infer requests of a model', ['model'])
+    in_use = registry.gauge('model_server_infer_requests_in_use', 'Infer requests running', ['model'])
+    depth = registry.gauge('model_server_queue_depth', 'Work waiting for a thread or an infer request', ['queue'])
+    for name, (get_size, get_in_use, get_waiting) in self._request_pools().items():
+      size.labels(name).set_function(get_size)
+      in_use.labels(name).set_function(get_in_use)
+      if get_waiting is not None: depth.labels(name).set_function(get_waiting)
+    if self.scheduler is not None:
+      for key, jobs in self.scheduler.queues.items():
+        depth.labels(f'scheduler/{key}').set_function(lambda q=jobs: len(q))
+    if executor is not None:
+      depth.labels('executor').set_function(lambda: executor.queued)
+
+  def _decode_img(self, pb):
+    """Decodes an `Image` message, logs size and decoding time of compressed ones"""
+    if pb.encoding in ('', 'raw'):
+      return decode_img(pb)
+    t0 = time.perf_counter()
+    img = decode_img(pb)
+    self.logger.debug(f'Decoded {pb.w}x{pb.h} {pb.encoding} image of {len(pb.data) / 1024:.1f}KB '
+                      f'in {(time.perf_counter() - t0) * 1000:.1f}ms')
+    return img
 
-    for idx, (req, test_ref_out) in enumerate(zip(reqs, self.test_ref_out)):
-      req.wait()
-      test_out = req.output_blobs[self.test_out_name].buffer
+  def _check_outputs(self, test_outs):
+    """Compares outputs of the test model against the reference outputs"""
+    status = 'OK'
+    for idx, (test_out, test_ref_out) in enumerate(zip(test_outs, self.test_ref_out)):
       if np.allclose(test_out, test_ref_out):
-        status = 'OK'
         self.logger.info(f'Passed test{idx}')
       else:
         status = 'NG'
         self.logger.error(f'Failed test{idx}')
         break
+    return status
+
+  def _run_check(self):
+    """Runs the test model on all test inputs, returns OK or NG"""
+    with self.check_lock:
+      test_outs = []
+      n = self.test_model.num_requests
+      for start in range(0, len(self.test_in), n):
+        handles = [self.test_model.start(req_id, test_in) for req_id, test_in in enumerate(self.test_in[start:start + n])]
+        test_outs += [self.test_model.wait(handle).copy() for handle in handles]
+    return self._check_outputs(test_outs)
+
+  def Check(self, request, context):
+    sess_id = request.sess_id
+    self.logger.info('Tests started')
+    status = self._run_check()
+    self.health.update(status)
     res = model_serving_pb2.CheckResponse(sess_id=sess_id, status=status)
     self.logger.info(f'Tests done. Result: {status}')
     return res
 
-  def DetInferSync(self, request, context):
-    sess_id = request.sess_id
-    self.logger.info(f'Started {request.layout} detection inference for sess {sess_id}')
-    img = decode_img(request.img)
-    if request.layout in self.det:
-      lines, angle = self.det[request.layout].infer_sync(img, suppress_lines=request.suppress_lines)
-    else:
-      self.logger.error(f"Layout {request.layout} is not supported")
-      lines = []
+  def Health(self, request, context):
+    return health_response(self.health, request)
+
+  def _pb_key(self, kind, pb, *options):
+    """Cache key of an `Image` message, `None` without cache"""
+    if self.cache is None: return None
+    return ResultCache.key(kind, pb.data, (pb.h, pb.w, pb.c), pb.encoding, *options)
+
+  def _array_key(self, kind, img, *options):
+    """Cache key of a decoded image, `None` without cache"""
+    if self.cache is None: return None
+    return ResultCache.array_key(kind, img, *options)
+
+  def _cache_get(self, key):
+    return None if key is None else self.cache.get(key)
+
+  def _cache_put(self, key, value):
+    if key is not None: self.cache.put(key, value)
+
+  def _det(self, img, layout, suppress_lines):
+    if layout not in self.det:
+      self.logger.error(f"Layout {layout} is not supported")
+      return np.zeros((0, 8), dtype=np.float32), 0
+    lines, angle = self.det[layout].infer_sync(img, suppress_lines=suppress_lines)
+    return np.array(lines, dtype=np.float32), angle
+
+  def _det_response(self, sess_id, lines, angle):
     lines = np.array(lines, dtype=np.float32)
     lines_bytes = np.ndarray.tobytes(lines)
     res = model_serving_pb2.DetResponse(sess_id=sess_id, lines=lines_bytes, angle=angle)
+    return res
+
+  def DetInferSync(self, request, context):
+    sess_id = request.sess_id
+    self.logger.info(f'Started {request.layout} detection inference for sess {sess_id}')
+    key = self._pb_key('det', request.img, request.layout, request.suppress_lines)
+    cached = self._cache_get(key)
+    if cached is None:
+      img = self._decode_img(request.img)
+      cached = self._det(img, request.layout, request.suppress_lines)
+      self._cache_put(key, cached)
+    res = self._det_response(sess_id, *cached)
     self.logger.info(f'Finished detection inference for sess {sess_id}')
     return res
 
-  def DenseInferSync(self, request, context):
+  def _path_img(self, request):
+    """Image of a path request, `None` if it cannot be read
+
+    `request.path` names a shared memory segment when `request.h` is set,
+    and an image file otherwise.
+    """
+    try:
+      if request.h > 0:
+        return self.shm_images.get(request.path, (request.h, request.w, request.c))
+      img = cv2.imread(request.path)
+      if img is None: raise FileNotFoundError(request.path)
+      return img[..., ::-1]
+    except (FileNotFoundError, ValueError) as e:
+      self.logger.error(f'Failed to read image from {request.path}: {e}')
+      return None
+
+  def DetInferPathSync(self, request, context):
     sess_id = request.sess_id
-    img = decode_img(request.img)
-    code, prob, position = self.recog[request.key].infer_sync(img, num_only=request.num_only)
+    self.logger.info(f'Started {request.layout} detection inference from path for sess {sess_id}')
+    img = self._path_img(request)
+    if img is None:
+      context.abort(grpc.StatusCode.INVALID_ARGUMENT, f'Cannot read image from {request.path}')
+    key = self._array_key('det', img, request.layout, request.suppress_lines)
+    cached = self._cache_get(key)
+    if cached is None:
+      cached = self._det(img, request.layout, request.suppress_lines)
+      self._cache_put(key, cached)
+    res = self._det_response(sess_id, *cached)
+    self.logger.info(f'Finished detection inference for sess {sess_id}')
+    return res
+
+  def _dense_response(self, sess_id, code, prob, position):
     code_bytes = np.ndarray.tobytes(code.astype(np.float32))
     prob_bytes = np.ndarray.tobytes(prob.astype(np.float32))
     position_bytes = np.ndarray.tobytes(position.astype(np.float32))
     res = model_serving_pb2.DenseResponse(sess_id=sess_id, code=code_bytes, prob=prob_bytes, position=position_bytes)
     return res
 
-  def DenseBatchInferSync(self, request_iterator, context):
-    reqs = []
-    results = []
-    for idx, request in enumerate(request_iterator):
-      sess_id = request.sess_id
-      if idx == 0:
-        self.logger.info(f'Started dense batch inference for sess {sess_id}')
-      img = decode_img(request.img)
-      reqs.append((self.recog[request.key].infer_async(img), request.key, request.num_only))
-      if len(reqs) >= self.config['dense8']['usb_batch_size']:
-        results += [self.recog[key].get_result(req, num_only) for req, key, num_only in reqs]
-        reqs.clear()
-    results += [self.recog[key].get_result(req, num_only) for req, key, num_only in reqs]
+  def _dense(self, img, key, num_only):
+    if self.scheduler is not None:
+      return self.scheduler.submit(img, key, num_only).result()
+    return self.recog[key].infer_sync(img, num_only=num_only)
+
+  def DenseInferSync(self, request, context):
+    sess_id = request.sess_id
+    key = self._pb_key('dense', request.img, request.key, request.num_only)
+    cached = self._cache_get(key)
+    if cached is None:
+      img = self._decode_img(request.img)
+      cached = self._dense(img, request.key, request.num_only)
+      self._cache_put(key, cached)
+    return self._dense_response(sess_id, *cached)
+
+  def DenseInferPathSync(self, request, context):
+    sess_id = request.sess_id
+    img = self._path_img(request)
+    if img is None:
+      context.abort(grpc.StatusCode.INVALID_ARGUMENT, f'Cannot read image from {request.path}')
+    key = self._array_key('dense', img, request.key, request.num_only)
+    cached = self._cache_get(key)
+    if cached is None:
+      cached = self._dense(img, request.key, request.num_only)
+      self._cache_put(key, cached)
+    return self._dense_response(sess_id, *cached)
+
+  def _dense_tensor_batch(self, chips):
+    """Runs chips grouped by recognition key through `infer_batch`, keeps the input order"""
+    results = [None] * len(chips)
+    buckets = {}
+    for idx, (img, key, num_only) in enumerate(chips):
+      buckets.setdefault(key, []).append((idx, img, num_only))
+    for key, bucket in buckets.items():
+      indices, imgs, num_onlys = zip(*bucket)
+      for idx, res in zip(indices, self.recog[key].infer_batch(list(imgs), list(num_onlys))):
+        results[idx] = res
+    return results
+
+  def _dense_chips(self, chips):
+    """Recognizes (img, key, num_only) chips with the scheduler if enabled, keeps the input order"""
+    if self.scheduler is not None:
+      reqs = [self.scheduler.submit(img, key, num_only) for img, key, num_only in chips]
+      return [future.result() for future in reqs]
+    return self._dense_tensor_batch(chips)
+
+  @staticmethod
+  def _compact(codes, probs, positions):
+    """Codes, probs and positions in the smallest dtypes that fit"""
+    codes = codes.astype(np.int64)
+    code_dtype = np.int16 if codes.size == 0 or codes.max() <= np.iinfo(np.int16).max else np.int32
+    positions = np.clip(np.round(positions), 0, np.iinfo(np.uint16).max).astype(np.uint16)
+    return codes.astype(code_dtype), probs.astype(np.float16), positions
+
+  def _ragged_batch_response(self, sess_id, results):
+    """Concatenates results of all chips, split by offsets, in the smallest dtypes that fit"""
+    offsets = np.cumsum([0] + [res[0].shape[0] for res in results]).astype(np.uint32)
+    codes, probs, positions = self._compact(*(np.concatenate([res[i] for res in results]) for i in range(3)))
+    res = model_serving_pb2.DenseBatchResponse(sess_id=sess_id, n=len(results), ragged=True,
+                                               offsets=offsets.tobytes(), code_size=codes.itemsize,
+                                               codes=codes.tobytes(), probs=probs.tobytes(),
+                                               positions=positions.tobytes())
+    return res
+
+  def _dense_batch_response(self, sess_id, results, ragged=False):
+    if not results:
+      return model_serving_pb2.DenseBatchResponse(sess_id=sess_id, n=0)
+    if ragged:
+      return self._ragged_batch_response(sess_id, results)
     max_len = max([res[0].shape[0] for res in results])
     codes = []
     probs = []
@@ -175,31 +526,239 @@ class ModelServer(model_serving_pb2_grpc.ModelServerServicer):
     positions_bytes = np.ndarray.tobytes(positions)
     res = model_serving_pb2.DenseBatchResponse(sess_id=sess_id, n=codes.shape[0], codes=codes_bytes, probs=probs_bytes,
                                                positions=positions_bytes)
+    return res
+
+  @staticmethod
+  def _merge_cached(cached, results, n):
+    """Puts results of cache hits by index between the inferred ones"""
+    inferred = iter(results)
+    return [cached[idx] if idx in cached else next(inferred) for idx in range(n)]
+
+  def DenseBatchInferSync(self, request_iterator, context):
+    reqs = []
+    results = []
+    # results of cache hits by chip index, and keys of the other chips in order
+    cached = {}
+    keys = []
+    n = 0
+    # an empty stream gets an empty response
+    sess_id = ''
+    ragged = False
+    tensor_batch = self.config['dense8'].get('tensor_batch_size', 1) > 1
+    for idx, request in enumerate(request_iterator):
+      sess_id = request.sess_id
+      n += 1
+      if idx == 0:
+        ragged = request.ragged
+        self.logger.info(f'Started dense batch inference for sess {sess_id}')
+      key = self._pb_key('dense', request.img, request.key, request.num_only)
+      hit = self._cache_get(key)
+      if hit is not None:
+        cached[idx] = hit
+        continue
+      keys.append(key)
+      img = self._decode_img(request.img)
+      if self.scheduler is not None:
+        reqs.append(self.scheduler.submit(img, request.key, request.num_only))
+        continue
+      if tensor_batch:
+        reqs.append((img, request.key, request.num_only))
+        continue
+      ctx = self.recog[request.key].infer_async(img, block=not reqs)
+      if ctx is None:
+        # never wait for an idle request while holding others
+        results += [self.recog[key].get_result(req, num_only) for req, key, num_only in reqs]
+        reqs.clear()
+        ctx = self.recog[request.key].infer_async(img)
+      reqs.append((ctx, request.key, request.num_only))
+      if len(reqs) >= self.config['dense8']['usb_batch_size']:
+        results += [self.recog[key].get_result(req, num_only) for req, key, num_only in reqs]
+        reqs.clear()
+    if self.scheduler is not None:
+      results = [future.result() for future in reqs]
+    elif tensor_batch:
+      results = self._dense_tensor_batch(reqs)
+    else:
+      results += [self.recog[key].get_result(req, num_only) for req, key, num_only in reqs]
+    for key, result in zip(keys, results):
+      self._cache_put(key, result)
+    if cached:
+      self.logger.info(f'{len(cached)} of {n} chips found in cache for sess {sess_id}')
+      results = self._merge_cached(cached, results, n)
+    res = self._dense_batch_response(sess_id, results, ragged=ragged)
     self.logger.info(f'Finished dense batch inference for sess {sess_id}')
     return res
 
-def serve():
-  logging.basicConfig()
-  with open('config/model_server_config.yaml') as f:
-    config = yaml.safe_load(f)
-  max_workers = config['grpc'].get('max_workers', 1)
-  options = None
+  def _chip_response(self, request, result):
+    codes, probs, positions = self._compact(*result)
+    return model_serving_pb2.DenseChipResponse(sess_id=request.sess_id, id=request.id, codes=codes.tobytes(),
+                                               probs=probs.tobytes(), positions=positions.tobytes(),
+                                               code_size=codes.itemsize)
+
+  def _start_chip(self, request, done):
+    """Starts recognition of a streamed chip, `done` is called once its result is ready
+
+    Returns:
+      A callable returning the result
+    """
+    key = self._pb_key('dense', request.img, request.key, request.num_only)
+    cached = self._cache_get(key)
+    if cached is not None:
+      done()
+      return lambda: cached
+    img = self._decode_img(request.img)
+    if self.scheduler is not None:
+      future = self.scheduler.submit(img, request.key, request.num_only)
+      future.add_done_callback(lambda _: done())
+      wait = future.result
+    else:
+      model = self.recog[request.key]
+      ctx = model.infer_async(img, done=done)
+      wait = lambda: model.get_result(ctx, request.num_only)
+    def result():
+      res = wait()
+      self._cache_put(key, res)
+      return res
+    return result
+
+  def DenseStreamInfer(self, request_iterator, context):
+    """Streams back the result of each chip in the order they are recognized
+
+    A reader thread starts inference of chips as they arrive, so that the
+    infer requests stay busy while results are sent. Completions of the
+    device are queued with the chips started by the reader, a chip is sent
+    once it has both.
+    """
+    # ('started', index, (request, result)), ('done', index, None), or ('end', chips read, error)
+    events = queue.Queue()
+    def read():
+      n_read = 0
+      try:
+        for request in request_iterator:
+          idx = n_read
+          result = self._start_chip(request, lambda idx=idx: events.put(('done', idx, None)))
+          events.put(('started', idx, (request, result)))
+          n_read += 1
+      except Exception as e:
+        events.put(('end', n_read, e))
+        return
+      events.put(('end', n_read, None))
+    threading.Thread(target=read, name='dense-stream', daemon=True).start()
+    started = {}
+    done = set()
+    n = 0
+    total = None
+    try:
+      while total is None or n < total:
+        event, idx, value = events.get()
+        if event == 'end':
+          total = idx
+          if value is not None: raise value
+          continue
+        if event == 'started':
+          started[idx] = value
+        else:
+          done.add(idx)
+        if idx not in started or idx not in done: continue
+        request, result = started.pop(idx)
+        done.discard(idx)
+        if n == 0: self.logger.info(f'Started dense stream inference for sess {request.sess_id}')
+        n += 1
+        yield self._chip_response(request, result())
+      self.logger.info(f'Finished dense stream inference of {n} chips')
+    finally:
+      # read the results left by a cancelled stream, so that their infer requests are released
+      while total is None:
+        event, idx, value = events.get()
+        if event == 'end': total = idx
+        elif event == 'started': started[idx] = value
+      for _, result in started.values():
+        try:
+          result()
+        except Exception:
+          pass
+
+  def _page_response(self, sess_id, boxes, angle, results, ragged=False):
+    boxes_bytes = np.ndarray.tobytes(boxes.astype(np.float32))
+    texts = self._dense_batch_response(sess_id, results, ragged=ragged)
+    res = model_serving_pb2.PageResponse(sess_id=sess_id, n_lines=boxes.shape[0], boxes=boxes_bytes, angle=angle,
+                                         texts=texts)
+    return res
+
+  def ReadPage(self, request, context):
+    """Detection, box filtering/merging, deskewing, cropping and recognition of a page in one RPC"""
+    sess_id = request.sess_id
+    img = self._decode_img(request.img)
+    layout = request.layout or get_layout(img)
+    self.logger.info(f'Started {layout} page reading for sess {sess_id}')
+    if layout not in self.det:
+      self.logger.error(f"Layout {layout} is not supported")
+      return self._page_response(sess_id, np.zeros((0, 4)), 0, [])
+    lines, angle = self.det[layout].infer_sync(img, suppress_lines=False)
+    lines = np.array(lines, dtype=np.float32).reshape(-1, 8)
+    boxes, chips = crop_lines(img, lines, angle, min_wh_ratio=request.min_wh_ratio)
+    self.logger.info(f'{lines.shape[0]} lines detected, {boxes.shape[0]} boxes to recognize for sess {sess_id}')
+    results = self._dense_chips([(chip, get_dense_key(chip), request.num_only) for chip in chips])
+    res = self._page_response(sess_id, boxes, angle, results, ragged=request.ragged)
+    self.logger.info(f'Finished page reading for sess {sess_id}')
+    return res
+
+def get_server_options(config):
+  """gRPC channel options of the model server"""
+  # clients keep their channels open and ping them while idle
+  options = server_keepalive_options(config['grpc'].get('channel', {}))
   max_msg_len = config['grpc'].get('max_msg_len', None)
   if max_msg_len is not None:
-    options = [
+    options += [
       ('grpc.max_send_message_length', int(max_msg_len * 1024 * 1024)),
       ('grpc.max_receive_message_length', int(max_msg_len * 1024 * 1024)),
     ]
+  return options
+
+def get_ie_core():
+  """An `IECore`, `None` without OpenVINO, which stub and ONNX Runtime models do not need"""
+  try:
+    from openvino.inference_engine import IECore
+  except ModuleNotFoundError:
+    return None
+  return IECore()
+
+def serve():
+  logging.basicConfig()
+  with open('config/model_server_config.yaml') as f:
+    config = yaml.safe_load(f)
+  if config['grpc'].get('mode', 'sync') == 'aio':
+    from .aio_server import serve_aio
+    asyncio.run(serve_aio(config))
+    return
+  max_workers = config['grpc'].get('max_workers', 1)
+  options = get_server_options(config)
   max_concurrent_rpcs = config['grpc'].get('max_concurrent_rpcs', None)
-  server = grpc.server(futures.ThreadPoolExecutor(max_workers=max_workers), options=options,
+  metrics_port = config.get('metrics', {}).get('port', None)
+  executor = CountingThreadPool(max_workers=max_workers)
+  interceptors = []
+  if metrics_port is not None: interceptors.append(MetricsInterceptor(RpcMetrics('model_server')))
+  admission = get_admission(config)
+  if admission is not None: interceptors.append(AdmissionInterceptor(admission, lambda: executor.queued))
+  server = grpc.server(executor, options=options, interceptors=interceptors or None,
                        maximum_concurrent_rpcs=max_concurrent_rpcs)
-  model_servicer = ModelServer(config, IECore())
+  model_servicer = ModelServer(config, get_ie_core())
   model_serving_pb2_grpc.add_ModelServerServicer_to_server(model_servicer, server)
   ip = config['grpc'].get('ip', '127.0.0.1')
   port = config['grpc'].get('port', 50052)
-  model_servicer.logger.info(f'Start server at {ip}:{port}')
   server.add_insecure_port(f'{ip}:{port}')
+  if metrics_port is not None:
+    model_servicer.register_metrics(executor=executor)
+    start_metrics_server(metrics_port, config['metrics'].get('ip', '127.0.0.1'))
+    model_servicer.logger.info(f"Start metrics server at {config['metrics'].get('ip', '127.0.0.1')}:{metrics_port}")
+  # no RPC may take infer requests before warm-up is done with them
+  model_servicer.warm_up()
+  model_servicer.logger.info(f'Start server at {ip}:{port}')
   server.start()
+  model_servicer.health.start()
+  health_server = start_health_server(config, model_servicer.health)
+  if health_server is not None:
+    model_servicer.logger.info(f"Start health server at {ip}:{config['grpc']['health']['port']}")
   server.wait_for_termination()
 
 if __name__ == "__main__":
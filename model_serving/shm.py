@@ -0,0 +1,136 @@
+"""Shared memory image transport between a client and a co-located model server
+
+The client copies a decoded RGB image into a POSIX shared memory segment it
+owns and sends only the segment name and the image shape in a path request.
+The server maps the segment once and reads images from it in place, so that
+neither side serializes multi-megabyte scans into protobuf messages.
+"""
+from collections import OrderedDict
+from contextlib import contextmanager
+from multiprocessing import shared_memory, resource_tracker
+import os
+import secrets
+import threading
+import weakref
+import numpy as np
+
+
+class SharedImageBuffer:
+  """A growable shared memory segment owned by the client
+
+  Each segment gets a unique name, a larger image replaces the segment
+  with a new one. Not thread-safe, use one buffer per thread.
+
+  Args:
+    prefix: Prefix of segment names
+  """
+  def __init__(self, prefix='model_serving'):
+    self.prefix = prefix
+    self.shm = None
+
+  def put(self, img):
+    """Copies an image into the segment and returns the segment name"""
+    img = np.ascontiguousarray(img, dtype=np.uint8)
+    if self.shm is None or self.shm.size < img.nbytes:
+      self.close()
+      name = f'{self.prefix}_{os.getpid()}_{secrets.token_hex(4)}'
+      self.shm = shared_memory.SharedMemory(name=name, create=True, size=img.nbytes)
+    view = np.ndarray(img.shape, dtype=np.uint8, buffer=self.shm.buf)
+    view[...] = img
+    del view
+    return self.shm.name
+
+  def close(self):
+    if self.shm is None: return
+    self.shm.close()
+    self.shm.unlink()
+    self.shm = None
+
+
+class SharedImagePool:
+  """Client side buffers, one for each RPC in flight"""
+  def __init__(self, prefix='model_serving'):
+    self.prefix = prefix
+    self.idle = []
+    self.buffers = []
+    self.lock = threading.Lock()
+
+  @contextmanager
+  def borrow(self):
+    """Lends an idle buffer, which must not be reused until the server replied"""
+    with self.lock:
+      if self.idle:
+        buffer = self.idle.pop()
+      else:
+        buffer = SharedImageBuffer(self.prefix)
+        self.buffers.append(buffer)
+    try:
+      yield buffer
+    finally:
+      with self.lock:
+        self.idle.append(buffer)
+
+  def close(self):
+    """Unlinks all segments"""
+    with self.lock:
+      for buffer in self.buffers:
+        buffer.close()
+
+
+class SharedImageReader:
+  """Server side mappings of client segments, reused across requests
+
+  A segment evicted while requests still view it is closed once the last
+  of its views is gone, closing it earlier would fail with a BufferError.
+
+  Args:
+    logger: A logging.Logger
+    max_segments: Number of segments kept mapped, the least recently used
+      one is released beyond that
+  """
+  def __init__(self, logger, max_segments=8):
+    self.logger = logger
+    self.max_segments = max_segments
+    # segment and the image views handed out from it, by name
+    self.segments = OrderedDict()
+    self.retired = []
+    self.lock = threading.Lock()
+
+  def _attach(self, name):
+    shm = shared_memory.SharedMemory(name=name)
+    # the client owns the segment, do not let the resource tracker unlink it at exit
+    resource_tracker.unregister(shm._name, 'shared_memory')
+    return shm, []
+
+  def _close(self, shm, views):
+    """Closes an evicted segment unless a request still views it, returns whether it is done with"""
+    if any(view() is not None for view in views): return False
+    try:
+      shm.close()
+    except BufferError as e:
+      self.logger.warning(f'Failed to close shared memory {shm.name}: {e}')
+    return True
+
+  def get(self, name, shape):
+    """Returns an image view of a segment
+
+    Raises:
+      FileNotFoundError: The segment does not exist
+      ValueError: The segment is smaller than the image
+    """
+    with self.lock:
+      segment = self.segments.pop(name, None)
+      if segment is None:
+        segment = self._attach(name)
+      self.segments[name] = segment
+      while len(self.segments) > self.max_segments:
+        _, old = self.segments.popitem(last=False)
+        self.retired.append(old)
+      self.retired = [old for old in self.retired if not self._close(*old)]
+      shm, views = segment
+      if int(np.prod(shape)) > shm.size:
+        raise ValueError(f'Shared memory {name} has {shm.size} bytes, {shape} requested')
+      img = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+      views[:] = [view for view in views if view() is not None]
+      views.append(weakref.ref(img))
+    return img
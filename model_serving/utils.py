@@ -3,6 +3,7 @@ import sys
 from datetime import datetime
 import yaml
 import numpy as np
+import cv2
 
 
 def get_logger(config):
@@ -27,10 +28,47 @@ def get_logger(config):
     logger.addHandler(file_handler)
   return logger
 
+# file extension and quality flag of each compressed encoding
+ENCODINGS = {
+  'jpg': ('.jpg', cv2.IMWRITE_JPEG_QUALITY),
+  'png': ('.png', cv2.IMWRITE_PNG_COMPRESSION),
+  'webp': ('.webp', cv2.IMWRITE_WEBP_QUALITY),
+}
+
+def encode_img(img, encoding='raw', quality=90):
+  """Encodes an RGB image for an `Image` message
+
+  `quality` is the JPEG/WebP quality (0-100). PNG is lossless, `quality`
+  picks its compression level instead, from 0 (smallest, level 9) to 100
+  (fastest, level 0), so that 90 is the fast level 1.
+  """
+  if encoding in ('', 'raw'):
+    return img.tobytes()
+  if not 0 <= quality <= 100:
+    raise ValueError(f'Quality must be within 0-100, got {quality}')
+  ext, flag = ENCODINGS[encoding]
+  if encoding == 'png': quality = round((100 - quality) * 9 / 100)
+  if img.shape[2] == 3: img = cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
+  ok, buf = cv2.imencode(ext, img, [flag, int(quality)])
+  if not ok:
+    raise ValueError(f'Failed to encode image as {encoding}')
+  return buf.tobytes()
+
 def decode_img(pb):
-  img = np.frombuffer(pb.data, np.uint8)
-  img = img.reshape(pb.h, pb.w, pb.c)
-  return img
+  if pb.encoding in ('', 'raw'):
+    img = np.frombuffer(pb.data, np.uint8)
+    img = img.reshape(pb.h, pb.w, pb.c)
+    return img
+  flag = cv2.IMREAD_COLOR if pb.c == 3 else cv2.IMREAD_UNCHANGED
+  # a new array per image: cv2.imdecode cannot decode into a given buffer,
+  # and the image is used by the request after the decoding thread moved on
+  img = cv2.imdecode(np.frombuffer(pb.data, np.uint8), flag)
+  if img is None:
+    raise ValueError(f'Failed to decode {pb.encoding} image')
+  if pb.c == 3:
+    # convert in place, the decoded buffer is the only copy of the image
+    img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB, dst=img)
+  return img.reshape(pb.h, pb.w, pb.c)
 
 def get_timestamp():
   timestamp = datetime.now().strftime('%Y_%m_%d_%H_%M_%S')
@@ -101,12 +101,21 @@ class InsuranceReader:
         returned by ocr_sync. Information extraction will be skipped if
         there is no corresponding analyzer for a syukbn.
     logger: A logging.Logger
+    fused: Whether to read pages with a single ReadPage RPC, which runs text
+        detection, box merging, deskewing, cropping and recognition on the
+        model server instead of sending every chip back to it
+    stream: Whether to recognize chips with a streaming RPC and decode each
+        result as soon as it arrives, only used when `fused` is False
   """
   def __init__(self,
                model_server: Any,
                analyzers: dict,
-               logger: logging.Logger):
+               logger: logging.Logger,
+               fused: bool = False,
+               stream: bool = False):
     self.model_server = model_server
+    self.fused = fused
+    self.stream = stream
     self.logger = logger
     self.root_folder = Path(__file__).resolve().parent.parent
     with open(str(self.root_folder / 'id2char_std.pkl'), 'rb') as f:
@@ -128,28 +137,14 @@ class InsuranceReader:
     if hknjanum is None: hknjanum = ""
     return hknjanum
 
-  def read_page_sync(self, img: np.ndarray, layout: str = None) -> list:
-    """Reads text from an image and group results in textlines.
-
-    Args:
-      img: Image to run OCR on
-      layout: Layout (portrait/landscape) based on which a text detection
-          model is chosen
+  def _read_page_unfused(self, img: np.ndarray, layout: str):
+    """Detects text, then sends cropped chips back for recognition.
 
     Returns:
-      OCR results in a list. Each element contains bounding box and recognized
-      text for a line.
+      Recognition results with the recognized boxes under `boxes`, an error
+      dict, or the same empty result as `read_page_sync` when less than 2
+      text boxes are detected.
     """
-    recog_results = []
-
-    # check layout
-    if img.shape[0] > img.shape[1]:
-      self.is_portrait = True
-      layout = 'portrait'
-    else:
-      self.is_portrait = False
-      layout = 'landscape'
-
     # detect text
     det_res = self.model_server.infer_sync(
         sess_id=self.sess_id, network='Det',
@@ -166,7 +161,7 @@ class InsuranceReader:
     # abort if less than 2 text boxes are detected
     if lines.shape[0] < 2:
       self.logger.info(f'{lines.shape[0]} text boxes detected')
-      return np.array([]), recog_results
+      return np.array([]), []
 
     # filter out invalid boxes
     lines[lines < 0] = 0
@@ -180,7 +175,7 @@ class InsuranceReader:
     text_boxes = np.array(text_boxes)
     if text_boxes.shape[0] < 2:
       self.logger.info(f'{lines.shape[0]} text boxes detected')
-      return np.array([]), recog_results
+      return np.array([]), []
 
     # rotate when the detected angle is larger than 0.1 degree
     if 'angle' in det_res and np.abs(det_res['angle']) > 0.1:
@@ -190,6 +185,18 @@ class InsuranceReader:
 
     # text recognition
     chips = get_chips(img, text_boxes)
+    if self.stream:
+      results = [None] * len(chips)
+      for idx, res in self.model_server.infer_stream_sync(
+          sess_id=self.sess_id,
+          network='Dense',
+          imgs=chips,
+          num_onlys=[False]*len(chips),
+          check_local=False
+      ):
+        if idx is None: return res
+        results[idx] = self._decode_chip(res['code'], res['prob'], res['position'], text_boxes[idx])
+      return {'results': [r for r in results if r is not None]}
     recog_res_dict = self.model_server.infer_batch_sync(
         sess_id=self.sess_id,
         network='Dense',
@@ -197,24 +204,79 @@ class InsuranceReader:
         num_onlys=[False]*len(chips),
         check_local=False
     )
-    if 'codes' not in recog_res_dict: return recog_res_dict
+    if 'codes' in recog_res_dict: recog_res_dict['boxes'] = text_boxes
+    return recog_res_dict
+
+  def _decode_chip(self, codes, probs, positions, box):
+    """Text of a chip from its recognition result, `None` if nothing is read"""
+    if codes.size == 0:
+      return None
+    indices = probs > self.pth
+    probs = probs[indices]
+    positions = positions[indices]
+    codes = codes[indices]
+    text = "".join([self.id2char[c] for c in codes])
+    if not text:
+      return None
+    return [text, probs, positions, box]
+
+  def read_page_sync(self, img: np.ndarray, layout: str = None) -> list:
+    """Reads text from an image and group results in textlines.
+
+    Args:
+      img: Image to run OCR on
+      layout: Layout (portrait/landscape) based on which a text detection
+          model is chosen
+
+    Returns:
+      OCR results in a list. Each element contains bounding box and recognized
+      text for a line.
+    """
+    recog_results = []
+
+    # check layout
+    if img.shape[0] > img.shape[1]:
+      self.is_portrait = True
+      layout = 'portrait'
+    else:
+      self.is_portrait = False
+      layout = 'landscape'
+
+    if self.fused:
+      recog_res_dict = self.model_server.infer_sync(
+          sess_id=self.sess_id, network='Page',
+          img=img,
+          layout=layout,
+          num_only=False,
+          min_wh_ratio=self.min_wh_ratio,
+          check_local=False
+      )
+      if 'codes' not in recog_res_dict: return recog_res_dict
+      text_boxes = recog_res_dict['boxes']
+      self.logger.debug(f'Detected text boxes: {recog_res_dict["n_lines"]}, '
+                        f'after wh ratio filter: {len(text_boxes)}, min wh ratio: {self.min_wh_ratio}')
+      # abort if less than 2 text boxes are detected
+      if text_boxes.shape[0] < 2:
+        self.logger.info(f'{recog_res_dict["n_lines"]} text boxes detected')
+        return np.array([]), recog_results
+      if np.abs(recog_res_dict['angle']) > 0.1:
+        img = rotate(img, recog_res_dict['angle'])
+      self.img = img
+    else:
+      recog_res_dict = self._read_page_unfused(img, layout)
+      if not isinstance(recog_res_dict, dict): return recog_res_dict
+      # chips already decoded while streaming
+      if 'results' in recog_res_dict: return group_lines(recog_res_dict['results'])
+      if 'codes' not in recog_res_dict: return recog_res_dict
+      text_boxes = recog_res_dict['boxes']
+
     for idx, (box, codes) in enumerate(zip(
         text_boxes,
         recog_res_dict["codes"]
     )):
-      probs, positions = (
-          recog_res_dict["probs"][idx],
-          recog_res_dict["positions"][idx],
-      )
-      if codes.size == 0:
-        continue
-      indices = probs > self.pth
-      probs = probs[indices]
-      positions = positions[indices]
-      codes = codes[indices]
-      text = "".join([self.id2char[c] for c in codes])
-      if text:
-        recog_results.append([text, probs, positions, box])
+      res = self._decode_chip(codes, recog_res_dict["probs"][idx], recog_res_dict["positions"][idx], box)
+      if res is not None:
+        recog_results.append(res)
 
     # group text areas in lines
     texts = group_lines(recog_results)
@@ -1,18 +1,31 @@
+import atexit
 import time
 import yaml
 import grpc
+from model_serving.metrics import REGISTRY
+from model_serving.channels import ChannelPool, channel_options
 from .utils import get_timestamp
 from . import scanner_pb2
 from . import scanner_pb2_grpc
 
 class ScannerClient:
-  def __init__(self, docker_manager, logger):
+  """A scanner client, whose channel to the scanner is kept open between scans
+
+  Args:
+    docker_manager: Runs and restarts the scanner container
+    logger: A logging.Logger
+    registry: The metrics `Registry` of the channel metrics, e.g. the one served by the process
+  """
+  def __init__(self, docker_manager, logger, registry=REGISTRY):
     with open('config/scanner_config.yaml') as f:
       self.config = yaml.safe_load(f)
     with open('config/scanner_err.yaml') as f:
       self.err = yaml.safe_load(f)
     self.logger = logger
     self.docker_manager = docker_manager
+    self.channels = ChannelPool('scanner_client', options=channel_options(self.config['grpc'].get('channel', {})),
+                                registry=registry)
+    atexit.register(self.channels.close)
     self.docker_manager.run_if_not_yet(cooldown=self.config['grpc'].get('cooldown', 1), **self.config['docker'])
 
   def scan(self, img_path=None, sess_id=None):
@@ -23,20 +36,19 @@ class ScannerClient:
     if sess_id is None:
       sess_id = get_timestamp()
     for trial_idx in range(self.config['grpc']['max_trials']):
-      with grpc.insecure_channel(f'{ip}:{port}') as channel:
-        stub = scanner_pb2_grpc.ScannerStub(channel)
-        try:
-          if img_path is None:
-            req = scanner_pb2.ScanRequest(sess_id=sess_id)
-            res = stub.Scan(req, timeout=timeout)
-          else:
-            req = scanner_pb2.ReadRequest(sess_id=sess_id, img_path=img_path)
-            res = stub.Read(req, timeout=timeout)
-          img_path = res.img_path
-          err = res.err
-        except grpc._channel._InactiveRpcError as e:
-          img_path = None
-          err = self.err['scan_err']
+      stub = self.channels.stub(f'{ip}:{port}', scanner_pb2_grpc.ScannerStub)
+      try:
+        if img_path is None:
+          req = scanner_pb2.ScanRequest(sess_id=sess_id)
+          res = stub.Scan(req, timeout=timeout)
+        else:
+          req = scanner_pb2.ReadRequest(sess_id=sess_id, img_path=img_path)
+          res = stub.Read(req, timeout=timeout)
+        img_path = res.img_path
+        err = res.err
+      except grpc._channel._InactiveRpcError as e:
+        img_path = None
+        err = self.err['scan_err']
       if img_path is None:
         self.logger.warning(f"Scanner failed: {trial_idx + 1}")
         self.restart()
@@ -10,6 +10,8 @@ import numpy as np
 import cv2
 from google.protobuf.struct_pb2 import Struct
 
+from model_serving.metrics import RpcMetrics, MetricsInterceptor, start_metrics_server
+from model_serving.channels import server_keepalive_options
 from . import scanner_pb2
 from . import scanner_pb2_grpc
 from .x50 import X50
@@ -76,13 +78,18 @@ def serve():
     config = yaml.safe_load(f)
   max_workers = config['grpc'].get('max_workers', 1)
   max_concurrent_rpcs = config['grpc'].get('max_concurrent_rpcs', None)
-  server = grpc.server(futures.ThreadPoolExecutor(max_workers=max_workers),
-                       maximum_concurrent_rpcs=max_concurrent_rpcs)
+  metrics_port = config.get('metrics', {}).get('port', None)
+  interceptors = [MetricsInterceptor(RpcMetrics('scanner'))] if metrics_port is not None else None
+  server = grpc.server(futures.ThreadPoolExecutor(max_workers=max_workers), interceptors=interceptors,
+                       maximum_concurrent_rpcs=max_concurrent_rpcs,
+                       options=server_keepalive_options(config['grpc'].get('channel', {})))
   scanner_pb2_grpc.add_ScannerServicer_to_server(Scanner(config), server)
   ip = config['grpc'].get('ip', '127.0.0.1')
   port = config['grpc'].get('port', 50051)
   server.add_insecure_port(f'{ip}:{port}')
   server.start()
+  if metrics_port is not None:
+    start_metrics_server(metrics_port, config['metrics'].get('ip', '127.0.0.1'))
   server.wait_for_termination()
 
 if __name__ == "__main__":
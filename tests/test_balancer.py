@@ -0,0 +1,67 @@
+import logging
+import unittest
+
+from model_serving.balancer import DeviceBalancer
+from model_serving.metrics import Registry
+
+
+class ReqIds:
+  def __init__(self, size):
+    self.size = size
+
+
+class Ctx:
+  pass
+
+
+class Replica:
+  """A model wrapper with `idle` infer requests, `error` raised by each call if set"""
+  def __init__(self, idle=1, error=None):
+    self.req_ids = ReqIds(1)
+    self.idle = idle
+    self.error = error
+    self.calls = []
+
+  def infer_async(self, img, block=True, done=None):
+    self.calls.append(block)
+    if self.error is not None: raise self.error
+    if not self.idle and not block: return None
+    return Ctx()
+
+
+def balancer(**replicas):
+  return DeviceBalancer(replicas, 'test', logging.getLogger('test'), registry=Registry())
+
+
+class InferAsyncTest(unittest.TestCase):
+  def test_best_busy_tries_next(self):
+    b = balancer(MYRIAD=Replica(idle=0), CPU=Replica())
+    ctx = b.infer_async(None)
+    self.assertEqual(ctx.device, 'CPU')
+    self.assertEqual(b.replicas['MYRIAD'].calls, [False])
+    self.assertEqual(b.in_flight, {'MYRIAD': 0, 'CPU': 1})
+
+  def test_all_busy(self):
+    b = balancer(MYRIAD=Replica(idle=0), CPU=Replica(idle=0))
+    self.assertIsNone(b.infer_async(None, block=False))
+    self.assertEqual(b.in_flight, {'MYRIAD': 0, 'CPU': 0})
+    # blocks on the best device once all were tried
+    ctx = b.infer_async(None)
+    self.assertEqual(ctx.device, 'MYRIAD')
+    self.assertEqual(b.replicas['MYRIAD'].calls, [False, False, True])
+
+  def test_failed_device_skipped(self):
+    b = balancer(MYRIAD=Replica(error=RuntimeError('lost')), CPU=Replica(idle=0))
+    ctx = b.infer_async(None)
+    self.assertEqual(ctx.device, 'CPU')
+    self.assertEqual(b.replicas['MYRIAD'].calls, [False])
+    self.assertEqual(b.replicas['CPU'].calls, [False, True])
+
+  def test_all_failed(self):
+    b = balancer(MYRIAD=Replica(error=RuntimeError('lost')), CPU=Replica(error=RuntimeError('lost')))
+    with self.assertRaises(RuntimeError):
+      b.infer_async(None)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,43 @@
+import unittest
+
+import numpy as np
+
+from model_serving.models.utils import image
+from ocr2.utils import image as ocr2_image
+
+
+def polygon(x0, y0, x1, y1):
+  return [x0, y0, x1, y0, x1, y1, x0, y1]
+
+
+class GetRectTest(unittest.TestCase):
+  def test_small_boxes_dropped(self):
+    polygons = np.array([polygon(0, 0, 100, 20), polygon(0, 30, 100, 37), polygon(0, 40, 7, 60)], dtype=np.float32)
+    np.testing.assert_array_equal(image.get_rect(polygons), [[0, 0, 100, 20]])
+
+  def test_min_wh_ratio(self):
+    polygons = np.array([polygon(0, 0, 100, 20), polygon(0, 30, 10, 60)], dtype=np.float32)
+    np.testing.assert_array_equal(image.get_rect(polygons, min_wh_ratio=0.5), [[0, 0, 100, 20]])
+
+  def test_shared_with_ocr2(self):
+    for name in ('get_rect', 'get_chips', 'merge', 'rotate'):
+      self.assertIs(getattr(ocr2_image, name), getattr(image, name))
+
+
+class CropLinesTest(unittest.TestCase):
+  def test_chips(self):
+    img = np.zeros((100, 200, 3), dtype=np.uint8)
+    lines = np.array([polygon(10, 10, 110, 30), polygon(10, 50, 150, 70), polygon(0, 80, 5, 82)], dtype=np.float32)
+    boxes, chips = image.crop_lines(img, lines, angle=0.)
+    np.testing.assert_array_equal(boxes, [[10, 10, 110, 30], [10, 50, 150, 70]])
+    self.assertEqual([c.shape for c in chips], [(20, 100, 3), (20, 140, 3)])
+
+  def test_too_few_lines(self):
+    boxes, chips = image.crop_lines(np.zeros((100, 200, 3), dtype=np.uint8),
+                                    np.array([polygon(10, 10, 110, 30)], dtype=np.float32), angle=0.)
+    self.assertEqual(boxes.shape, (0, 4))
+    self.assertEqual(chips, [])
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,96 @@
+import logging
+import unittest
+from unittest import mock
+
+from model_serving.client import ModelServerClient
+from model_serving.metrics import Registry
+from model_serving.routing import CLOSED, HALF_OPEN, OPEN, Router
+
+
+ERR = {'ocr_err': {'Result': 'NG', 'Code': 'ocr_err'}}
+
+
+def router(ips, **kwargs):
+  return Router(ips, logging.getLogger('test'), registry=Registry(), **kwargs)
+
+
+def client(router):
+  """A client over `router` without a docker manager, config files or channels"""
+  c = ModelServerClient.__new__(ModelServerClient)
+  c.config = {'grpc': {'port': 50051, 'timeout': {}}}
+  c.err = ERR
+  c.logger = logging.getLogger('test')
+  c.ip_pool = list(router.ips)
+  c.t_restart = None
+  c.router = router
+  c.channels = mock.Mock()
+  return c
+
+
+class RouteTest(unittest.TestCase):
+  def test_closed_before_half_open(self):
+    r = router(['a', 'b'])
+    r.state['a'] = HALF_OPEN
+    self.assertEqual(r.route('Det'), ['b', 'a'])
+
+  def test_all_open(self):
+    r = router(['a', 'b'], failure_threshold=1)
+    r.record('a', ok=False)
+    r.record('b', ok=False)
+    self.assertEqual(r.state, {'a': OPEN, 'b': OPEN})
+    self.assertEqual(r.route('Det'), [])
+
+  def test_half_open_after_open_time(self):
+    r = router(['a'], failure_threshold=1, open_time=0.)
+    r.record('a', ok=False)
+    self.assertEqual(r.route('Det'), ['a'])
+    self.assertEqual(r.state['a'], HALF_OPEN)
+    self.assertTrue(r.begin('a'))
+    self.assertFalse(r.begin('a'))
+    r.record('a', ok=True)
+    self.assertEqual(r.state['a'], CLOSED)
+
+
+class SkippedRoutesTest(unittest.TestCase):
+  def half_open_client(self):
+    r = router(['a'])
+    r.state['a'] = HALF_OPEN
+    # the probe holds the trial
+    r.trial['a'] = True
+    return client(r)
+
+  def test_infer_sync(self):
+    c = self.half_open_client()
+    self.assertEqual(c.infer_sync('s', 'Det', None), ERR['ocr_err'])
+    self.assertEqual(c.infer_sync('s', 'Check', None), {'Result': 'NG'})
+    c.channels.stub.assert_not_called()
+
+  def test_infer_batch_sync(self):
+    c = self.half_open_client()
+    self.assertEqual(c.infer_batch_sync('s', 'Dense', []), ERR['ocr_err'])
+    c.channels.stub.assert_not_called()
+
+  def test_all_open(self):
+    r = router(['a', 'b'], failure_threshold=1)
+    r.record('a', ok=False)
+    r.record('b', ok=False)
+    c = client(r)
+    self.assertEqual(c.infer_sync('s', 'Det', None), ERR['ocr_err'])
+    c.channels.stub.assert_not_called()
+
+
+class ProbeTest(unittest.TestCase):
+  def test_failed_half_open_probe_restarts(self):
+    r = router(['a', 'b'], failure_threshold=1)
+    c = client(r)
+    c._check_health = mock.Mock(return_value={'Result': 'NG'})
+    c.restart_if_local = mock.Mock()
+    self.assertFalse(c._probe('a'))
+    c.restart_if_local.assert_not_called()
+    r.state['a'] = HALF_OPEN
+    self.assertFalse(c._probe('a'))
+    c.restart_if_local.assert_called_once_with('a')
+
+
+if __name__ == '__main__':
+  unittest.main()
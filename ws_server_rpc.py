@@ -8,6 +8,7 @@ from utils import get_logger, get_timestamp, handle_err, handle_res
 from docker_manager import DockerManager
 from scanner import ScannerClient
 from model_serving.client import ModelServerClient
+from model_serving.metrics import REGISTRY, RpcMetrics, start_metrics_server
 from ocr2 import InsuranceReader
 from ocr2.info_extractor import MainAnalyzer
 from ocr2.info_extractor import MainAnalyzer,KouhiAnalyzer,KoureiAnalyzer
@@ -27,10 +28,17 @@ with open('config/api_err.yaml') as f:
   err = yaml.safe_load(f)
 
 docker_manager = DockerManager(logger=logger)
-scanner = ScannerClient(docker_manager=docker_manager,logger=logger)
+# channel metrics of the scanner client are served with the others
+scanner = ScannerClient(docker_manager=docker_manager,logger=logger, registry=REGISTRY)
 model_server = ModelServerClient(docker_manager=docker_manager, logger=logger)
 analyzers = {"主保険": MainAnalyzer(),"公費":KouhiAnalyzer(),'高齢受給者':KoureiAnalyzer(),'限度額認証':KoureiAnalyzer()}
-reader = InsuranceReader(model_server=model_server, analyzers=analyzers, logger=logger)
+reader = InsuranceReader(model_server=model_server, analyzers=analyzers, logger=logger,
+                         fused=model_server.config['grpc'].get('fused_read_page', False),
+                         stream=model_server.config['grpc'].get('stream_recognition', False))
+
+# request types by priority, a message may hold more than one
+ACTIONS = ['Restart', 'Test', 'Scan', 'Insurance', 'Patient']
+ws_metrics = RpcMetrics('ws')
 
 def validate_json(msg):
   if 'Scan' in msg or 'Patient' in msg or 'Insurance' in msg or 'MyNumber' in msg or 'Test' in msg or 'Restart' in msg:
@@ -47,128 +55,162 @@ def scan(img_path, sess_id, err_save_path):
     err_str = None
   return img_path, err_str
 
-async def serve_ocr(websocket, path):
-  """
-  Provide OCR service via websocket
-  """
-  async for data in websocket:
-    sess_id = get_timestamp()
-    test_save_path = data_folder / (sess_id + '_test.json')
-    scan_save_path = data_folder / (sess_id + '_scan.json')
-    info_save_path = data_folder / (sess_id + '_info.json')
-    err_save_path = data_folder / (sess_id + '_err.json')
-    restart_save_path = data_folder / (sess_id + '_restart.json')
-    logger.info(f'Session ID: {sess_id}')
-    logger.info(f'Websocket Received: {str(data)}')
-
-    if not isinstance(data, str):
-      err_str = handle_err(err['non-text'], err_save_path, logger)
-      await websocket.send(err_str)
-      continue
+def n_bytes(msg):
+  return len(msg.encode('utf-8')) if isinstance(msg, str) else len(msg)
 
-    try:
-      json_req = json.loads(data)
-    except json.JSONDecodeError:
-      err_str = handle_err(err['non-json'], err_save_path, logger)
-      await websocket.send(err_str)
-      continue
+def get_action(data):
+  """Request type of a websocket message, used as the metrics label"""
+  try:
+    msg = json.loads(data)
+  except (TypeError, json.JSONDecodeError):
+    return 'Invalid'
+  if not isinstance(msg, dict): return 'Invalid'
+  return next((k for k in ACTIONS if k in msg), 'Invalid')
 
-    if not validate_json(json_req):
+async def handle_message(send, data):
+  """
+  Handle a websocket message
+
+  Args:
+    send: Coroutine function sending a response, with `failed` set for error responses
+    data: The message
+  """
+  sess_id = get_timestamp()
+  test_save_path = data_folder / (sess_id + '_test.json')
+  scan_save_path = data_folder / (sess_id + '_scan.json')
+  info_save_path = data_folder / (sess_id + '_info.json')
+  err_save_path = data_folder / (sess_id + '_err.json')
+  restart_save_path = data_folder / (sess_id + '_restart.json')
+  logger.info(f'Session ID: {sess_id}')
+  logger.info(f'Websocket Received: {str(data)}')
+
+  if not isinstance(data, str):
+    err_str = handle_err(err['non-text'], err_save_path, logger)
+    await send(err_str, failed=True)
+    return
+
+  try:
+    json_req = json.loads(data)
+  except json.JSONDecodeError:
+    err_str = handle_err(err['non-json'], err_save_path, logger)
+    await send(err_str, failed=True)
+    return
+
+  if not validate_json(json_req):
+    err_str = handle_err(err['invalid-json'], err_save_path, logger)
+    await send(err_str, failed=True)
+    return
+
+  if 'Restart' in json_req:
+    model_server.restart()
+    res_json = {"Cooldown": model_server.config["grpc"]["restart_cooldown"]}
+    res_str = handle_res(res_json, restart_save_path, logger)
+    await send(res_str)
+
+  if 'Test' in json_req:
+    if json_req['Test'] == 'Accelerator':
+      res = model_server.infer_sync(sess_id=sess_id, network='Check', img=None)
+      res_str = handle_res(res, test_save_path, logger)
+      await send(res_str)
+      return
+    else:
       err_str = handle_err(err['invalid-json'], err_save_path, logger)
-      await websocket.send(err_str)
-      continue
-
-    if 'Restart' in json_req:
-      model_server.restart()
-      res_json = {"Cooldown": model_server.config["grpc"]["restart_cooldown"]}
-      res_str = handle_res(res_json, restart_save_path, logger)
-      await websocket.send(res_str)
-
-    if 'Test' in json_req:
-      if json_req['Test'] == 'Accelerator':
-        res = model_server.infer_sync(sess_id=sess_id, network='Check', img=None)
-        res_str = handle_res(res, test_save_path, logger)
-        await websocket.send(res_str)
-        continue
+      await send(err_str, failed=True)
+      return
+
+  if 'Scan' in json_req:
+    if json_req['Scan'] in ['Insurance', 'MyNumber', 'Picture']:
+      # insurance ocr
+      logger.info(f'{json_req["Scan"]} scan started')
+      img_path, err_str = scan(img_path=None, sess_id=sess_id, err_save_path=err_save_path)
+      if img_path is None:
+        await send(err_str, failed=True)
+        return
+      logger.info(f'{json_req["Scan"]} scan done')
+      if json_req['Scan'] == 'Picture':
+        res_json = {"ImagePath": img_path}
+        res_str = handle_res(res_json, scan_save_path, logger)
+        await send(res_str)
+        return
       else:
-        err_str = handle_err(err['invalid-json'], err_save_path, logger)
-        await websocket.send(err_str)
-        continue
-
-    if 'Scan' in json_req:
-      if json_req['Scan'] in ['Insurance', 'MyNumber', 'Picture']:
-        # insurance ocr
-        logger.info(f'{json_req["Scan"]} scan started')
-        img_path, err_str = scan(img_path=None, sess_id=sess_id, err_save_path=err_save_path)
-        if img_path is None:
-          await websocket.send(err_str)
-          continue
-        logger.info(f'{json_req["Scan"]} scan done')
-        if json_req['Scan'] == 'Picture':
-          res_json = {"ImagePath": img_path}
-          res_str = handle_res(res_json, scan_save_path, logger)
-          await websocket.send(res_str)
-          continue
-        else:
-          my_number = json_req['Scan'] == 'MyNumber'
+        my_number = json_req['Scan'] == 'MyNumber'
+    else:
+      # read local image file
+      logger.info('Picture read started')
+      img_path, err_str = scan(img_path=json_req['Scan'], sess_id=sess_id, err_save_path=err_save_path)
+      if img_path is None:
+        await send(err_str, failed=True)
+        return
+      logger.info('Picture read done')
+      if 'Hint' in json_req:
+        my_number = json_req['Hint'] == 'MyNumber'
       else:
-        # read local image file
-        logger.info('Picture read started')
-        img_path, err_str = scan(img_path=json_req['Scan'], sess_id=sess_id, err_save_path=err_save_path)
-        if img_path is None:
-          await websocket.send(err_str)
-          continue
-        logger.info('Picture read done')
-        if 'Hint' in json_req:
-          my_number = json_req['Hint'] == 'MyNumber'
-        else:
-          my_number = False
-
-      tag = 'MyNumber' if my_number else 'Insurance'
-      logger.info(f'{tag} OCR started')
-      try:
-        img = cv2.imread(img_path)[..., ::-1]
-      except Exception as e:
-        logger.error('Error during reading local image' + str(e))
-        err_str = handle_err(err['read-err'], err_save_path, logger)
-        await websocket.send(err_str)
-        continue
-      try:
-        syukbn = reader.ocr_sync(sess_id=sess_id, img=img)
-      except Exception as e:
-        logger.error('Error during reading local image' + str(e))
-        err_str = handle_err(err['ocr-err'], err_save_path, logger)
-        await websocket.send(err_str)
-        continue
-      if isinstance(syukbn, dict):
-        err_str = handle_err(syukbn, err_save_path, logger)
-        await websocket.send(err_str)
+        my_number = False
+
+    tag = 'MyNumber' if my_number else 'Insurance'
+    logger.info(f'{tag} OCR started')
+    try:
+      img = cv2.imread(img_path)[..., ::-1]
+    except Exception as e:
+      logger.error('Error during reading local image' + str(e))
+      err_str = handle_err(err['read-err'], err_save_path, logger)
+      await send(err_str, failed=True)
+      return
+    try:
+      syukbn = reader.ocr_sync(sess_id=sess_id, img=img)
+    except Exception as e:
+      logger.error('Error during reading local image' + str(e))
+      err_str = handle_err(err['ocr-err'], err_save_path, logger)
+      await send(err_str, failed=True)
+      return
+    if isinstance(syukbn, dict):
+      err_str = handle_err(syukbn, err_save_path, logger)
+      await send(err_str, failed=True)
+      return
+    logger.info(f'{tag} OCR done')
+    res = {"Category": "NA", "SyuKbn": syukbn, "ImagePath": img_path}
+    res_str = handle_res(res, scan_save_path, logger)
+    if hasattr(reader, 'texts'):
+      logger.debug('texts:')
+      for l in reader.texts:
+        logger.debug(l[-1])
+    await send(res_str)
+
+  if 'Insurance' in json_req or 'Patient' in json_req:
+    res_json = {}
+    for meta_k, meta_v in json_req.items():
+      if meta_k != 'Insurance' and meta_k != 'Patient':
+        res_json[meta_k] = json_req[meta_k]
         continue
-      logger.info(f'{tag} OCR done')
-      res = {"Category": "NA", "SyuKbn": syukbn, "ImagePath": img_path}
-      res_str = handle_res(res, scan_save_path, logger)
-      if hasattr(reader, 'texts'):
-        logger.debug('texts:')
-        for l in reader.texts:
-          logger.debug(l[-1])
-      await websocket.send(res_str)
-
-    if 'Insurance' in json_req or 'Patient' in json_req:
-      res_json = {}
-      for meta_k, meta_v in json_req.items():
-        if meta_k != 'Insurance' and meta_k != 'Patient':
-          res_json[meta_k] = json_req[meta_k]
-          continue
-        res_json[meta_k] = {}
-        for field in meta_v:
-          if field == 'SyuKbn':
-            res_json[meta_k][field] = json_req[meta_k][field]
-          else:
-            res_json[meta_k][field] = reader.extract_info(field)
-          if not isinstance(res_json[meta_k][field], dict):
-            res_json[meta_k][field] = {'text': res_json[meta_k][field], 'confidence': 1.0}
-      res_str = handle_res(res_json, info_save_path, logger)
-      await websocket.send(res_str)
+      res_json[meta_k] = {}
+      for field in meta_v:
+        if field == 'SyuKbn':
+          res_json[meta_k][field] = json_req[meta_k][field]
+        else:
+          res_json[meta_k][field] = reader.extract_info(field)
+        if not isinstance(res_json[meta_k][field], dict):
+          res_json[meta_k][field] = {'text': res_json[meta_k][field], 'confidence': 1.0}
+    res_str = handle_res(res_json, info_save_path, logger)
+    await send(res_str)
+
+
+async def serve_ocr(websocket, path):
+  """
+  Provide OCR service via websocket
+  """
+  async for data in websocket:
+    action = get_action(data)
+    ws_metrics.bytes_in.labels(action).inc(n_bytes(data))
+    # whether each response sent for the message is an error
+    responses = []
+    async def send(msg, failed=False):
+      ws_metrics.bytes_out.labels(action).inc(n_bytes(msg))
+      responses.append(failed)
+      await websocket.send(msg)
+    with ws_metrics.track(action):
+      await handle_message(send, data)
+      # answered with an error, or not answered at all
+      if not responses or any(responses): ws_metrics.errors.labels(action).inc()
 
 
 # start server(s)
@@ -176,5 +218,10 @@ ocr_ip = config['websocket']['ocr']['ip']
 ocr_port = config['websocket']['ocr']['port']
 logger.info(f'Start OCR server on {ocr_ip}:{ocr_port}')
 ocr_server = websockets.serve(serve_ocr, ocr_ip, ocr_port)
+metrics_port = config.get('metrics', {}).get('port', None)
+if metrics_port is not None:
+  metrics_ip = config['metrics'].get('ip', '127.0.0.1')
+  logger.info(f'Start metrics server on {metrics_ip}:{metrics_port}')
+  start_metrics_server(metrics_port, metrics_ip)
 asyncio.get_event_loop().run_until_complete(ocr_server)
 asyncio.get_event_loop().run_forever()